@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_storage(django_test_environment):
+    """Свои кэш и каталог метрик на прогон, как в core.testing.TestRunner."""
+    from core.testing import IsolatedStorage
+    storage = IsolatedStorage()
+    storage.enable()
+    yield
+    storage.disable()
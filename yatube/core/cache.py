@@ -0,0 +1,66 @@
+import os
+import tempfile
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Кэши, которые каждый процесс держит у себя
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+class FileCache(FileBasedCache):
+    """Файловый кэш с атомарным add, общий для процессов одной машины.
+
+    FileBasedCache.add проверяет ключ и записывает его двумя шагами, и
+    два воркера могут одновременно «захватить» один ключ. Здесь файл
+    ключа создается через os.link, который не заменяет существующий.
+
+    add не чистит каталог: через него пишутся короткие замки и ячейки
+    лимитов запросов, а обход каталога на каждый запрос дорог. Место
+    освобождает set.
+    """
+
+    # MAX_ENTRIES по умолчанию: 300 файлов мало для страниц лент и лимитов
+    max_entries = 10000
+
+    def __init__(self, dir, params):
+        options = {
+            'MAX_ENTRIES': self.max_entries, **params.get('OPTIONS', {})}
+        super().__init__(dir, dict(params, OPTIONS=options))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            while True:
+                try:
+                    os.link(tmp_path, fname)
+                    return True
+                except FileExistsError:
+                    # has_key удаляет истекший файл, тогда пробуем снова
+                    if self.has_key(key, version):
+                        return False
+        finally:
+            os.remove(tmp_path)
+
+
+def unwrap(backend):
+    """Кэш под оберткой core.metrics.InstrumentedCache."""
+    while hasattr(backend, 'wrapped'):
+        backend = backend.wrapped
+    return backend
+
+
+def is_shared(alias='default'):
+    """Видят ли записи кэша alias все воркеры.
+
+    Кэш в памяти процесса (LocMemCache) у каждого воркера свой: на нем
+    нельзя сбросить чужой кэш, поделиться замком или счетчиком.
+    """
+    return not isinstance(unwrap(caches[alias]), PROCESS_LOCAL_BACKENDS)
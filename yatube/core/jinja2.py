@@ -0,0 +1,47 @@
+import logging
+
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.shortcuts import get_thumbnail
+
+from posts.images import post_image
+
+logger = logging.getLogger('sorl.thumbnail')
+
+
+def url(viewname, *args, **kwargs):
+    """Аналог тега {% url %}."""
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def thumbnail(file_, geometry, **options):
+    """Аналог тега {% thumbnail ... as im %}: None, если картинки нет."""
+    if not file_:
+        return None
+    try:
+        return get_thumbnail(file_, geometry, **options)
+    except Exception:
+        # Как и тег sorl, не роняем страницу из-за битой картинки
+        if sorl_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Thumbnail function failed')
+        return None
+
+
+def environment(**options):
+    """Окружение Jinja2 с фильтрами и функциями шаблонов Django."""
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+        'thumbnail': thumbnail,
+        'post_image': post_image,
+    })
+    env.filters.update({
+        'date': defaultfilters.date,
+        'linebreaks': defaultfilters.linebreaks_filter,
+    })
+    return env
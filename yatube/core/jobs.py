@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(name, args=(), kwargs=None, priority=0, run_at=None,
+            max_attempts=None):
+    """Ставит в очередь вызов функции с путем импорта name."""
+    return Job.objects.create(
+        name=name,
+        args=json.dumps(list(args)),
+        kwargs=json.dumps(kwargs or {}),
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def job(func=None, priority=0):
+    """Декоратор: добавляет функции метод delay() для запуска в фоне.
+
+    Аргументы задачи сохраняются в JSON, поэтому передавать стоит id,
+    а не объекты моделей.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @wraps(func)
+        def delay(*args, **kwargs):
+            return enqueue(name, args, kwargs, priority=priority)
+
+        func.delay = delay
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+@job
+def noop(*args, **kwargs):
+    """Пустая задача для замеров пропускной способности."""
+
+
+def claim_jobs(worker_id, limit=1):
+    """Забирает до limit готовых задач для обработчика worker_id.
+
+    Там, где база умеет SELECT ... FOR UPDATE SKIP LOCKED, обработчики
+    пропускают строки, уже взятые другими. В SQLite запись и так идет по
+    очереди, поэтому хватает одного UPDATE по подзапросу с LIMIT.
+    """
+    now = timezone.now()
+    ready = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).order_by('-priority', 'run_at', 'pk')
+    claimed = {
+        'status': Job.RUNNING,
+        'locked_by': worker_id,
+        'locked_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pks = list(
+                ready.select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:limit])
+            Job.objects.filter(pk__in=pks).update(**claimed)
+    else:
+        Job.objects.filter(
+            pk__in=ready.values('pk')[:limit], status=Job.QUEUED
+        ).update(**claimed)
+    return list(
+        Job.objects.filter(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now
+        ).order_by('-priority', 'run_at', 'pk')
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def run_job(job):
+    """Выполняет задачу; успешная удаляется, упавшая ждет повтора."""
+    try:
+        func = import_string(job.name)
+        func(*json.loads(job.args), **json.loads(job.kwargs))
+    except Exception as error:
+        logger.exception('Задача %s упала', job)
+        job.last_error = repr(error)
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+        job.locked_by = ''
+        job.save(update_fields=(
+            'status', 'run_at', 'locked_by', 'last_error'))
+        return False
+    job.delete()
+    return True
+
+
+def requeue_stale(lease=None):
+    """Возвращает в очередь задачи обработчиков, которые не ответили.
+
+    Попытка засчитывается при взятии задачи, поэтому задача, которая
+    каждый раз роняет обработчик, после max_attempts попыток получает
+    статус FAILED, а не возвращается в очередь снова.
+    """
+    deadline = timezone.now() - timedelta(
+        seconds=lease or settings.JOBS_LEASE)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=deadline)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='',
+        last_error='Обработчик не ответил за время аренды задачи')
+    if failed:
+        logger.warning('Задач с ошибкой после зависания: %s', failed)
+    return stale.update(status=Job.QUEUED, locked_by='')
+
+
+def extend_lease(worker_id):
+    """Продлевает аренду задач, которые держит обработчик worker_id."""
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_by=worker_id
+    ).update(locked_at=timezone.now())
+
+
+class Worker:
+    """Цикл обработчика: забирает задачи пачками и выполняет их.
+
+    Пока обработчик работает, отдельный поток раз в треть JOBS_LEASE
+    продлевает аренду взятых задач, чтобы долгую задачу не вернули
+    в очередь и не выполнили дважды.
+    """
+
+    def __init__(self, batch_size=1, poll_interval=None, burst=False):
+        self.worker_id = (
+            f'{socket.gethostname()[:30]}:{os.getpid()}:'
+            f'{uuid.uuid4().hex[:8]}'
+        )
+        self.batch_size = batch_size
+        self.poll_interval = (
+            settings.JOBS_POLL_INTERVAL if poll_interval is None
+            else poll_interval)
+        self.burst = burst
+        self.stopping = False
+        self.done = 0
+        self.failed = 0
+        # claim_jobs находит взятые задачи по locked_at: продление аренды
+        # не должно вклиниться между UPDATE и выборкой
+        self._claim_lock = threading.Lock()
+        self._finished = threading.Event()
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def heartbeat(self):
+        interval = settings.JOBS_LEASE / 3
+        try:
+            while not self._finished.wait(interval):
+                with self._claim_lock:
+                    extend_lease(self.worker_id)
+        finally:
+            connections.close_all()
+
+    def run(self):
+        heartbeat = threading.Thread(
+            target=self.heartbeat, name='jobs-heartbeat', daemon=True)
+        heartbeat.start()
+        try:
+            return self.process()
+        finally:
+            self._finished.set()
+            heartbeat.join()
+
+    def process(self):
+        while not self.stopping:
+            with self._claim_lock:
+                jobs = claim_jobs(self.worker_id, self.batch_size)
+            if not jobs:
+                if self.burst:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            for claimed in jobs:
+                if run_job(claimed):
+                    self.done += 1
+                else:
+                    self.failed += 1
+        return self.done, self.failed
@@ -0,0 +1,166 @@
+import base64
+import json
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_message(message):
+    """Переводит EmailMessage в JSON для хранения в очереди."""
+    attachments = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError(
+                'Очередь писем поддерживает только вложения-кортежи.')
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append(
+            (filename, base64.b64encode(content).decode(), mimetype))
+    return json.dumps({
+        'subject': message.subject,
+        'body': message.body,
+        'content_subtype': message.content_subtype,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': attachments,
+    })
+
+
+def deserialize_message(data, connection=None):
+    """Восстанавливает письмо из JSON очереди."""
+    data = json.loads(data)
+    message = EmailMultiAlternatives(
+        subject=data['subject'],
+        body=data['body'],
+        from_email=data['from_email'],
+        to=data['to'],
+        cc=data['cc'],
+        bcc=data['bcc'],
+        reply_to=data['reply_to'],
+        headers=data['headers'],
+        alternatives=[tuple(item) for item in data['alternatives']],
+        connection=connection,
+    )
+    message.content_subtype = data['content_subtype']
+    for filename, content, mimetype in data['attachments']:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Складывает письма в таблицу очереди вместо отправки.
+
+    Запрос ждет только INSERT в текущей транзакции, а доставляет письма
+    команда send_outbox через OUTBOX_DELIVERY_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        emails = [
+            OutgoingEmail(
+                subject=message.subject[:255],
+                recipients=', '.join(message.recipients()),
+                message=serialize_message(message),
+            )
+            for message in email_messages
+            if message.recipients()
+        ]
+        OutgoingEmail.objects.bulk_create(emails)
+        return len(emails)
+
+
+def retry_delay(attempts):
+    """Экспоненциальная пауза перед следующей попыткой."""
+    return timedelta(seconds=min(
+        settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.OUTBOX_RETRY_MAX_DELAY,
+    ))
+
+
+def claim_due(batch_size):
+    """Забирает пачку писем, которым пора уходить, под метку обработчика.
+
+    Метка и сдвиг next_attempt_at ставятся одним UPDATE, поэтому
+    параллельные обработчики не отправят одно письмо дважды.
+    """
+    now = timezone.now()
+    due = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+    pks = list(
+        due.order_by('next_attempt_at').values_list('pk', flat=True)[
+            :batch_size])
+    if not pks:
+        return []
+    claim = uuid.uuid4().hex
+    due.filter(pk__in=pks).update(
+        claim=claim,
+        next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE),
+    )
+    return list(OutgoingEmail.objects.filter(claim=claim).order_by('pk'))
+
+
+def mark_sent(email):
+    email.status = OutgoingEmail.SENT
+    email.attempts += 1
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    email.save(update_fields=('status', 'attempts', 'sent_at', 'last_error'))
+
+
+def mark_failed(email, error):
+    email.attempts += 1
+    email.last_error = repr(error)
+    if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.FAILED
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=(
+        'status', 'attempts', 'last_error', 'next_attempt_at'))
+
+
+def deliver_outbox(batch_size=None):
+    """Отправляет пачку писем через одно соединение.
+
+    Возвращает пару (отправлено, с ошибкой).
+    """
+    emails = claim_due(batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+    connection = get_connection(settings.OUTBOX_DELIVERY_BACKEND)
+    try:
+        connection.open()
+    except Exception as error:
+        logger.warning('Почтовый сервер недоступен: %r', error)
+        for email in emails:
+            mark_failed(email, error)
+        return 0, len(emails)
+    sent = failed = 0
+    try:
+        for email in emails:
+            try:
+                connection.send_messages(
+                    [deserialize_message(email.message, connection)])
+            except Exception as error:
+                logger.warning('Письмо %s не отправлено: %r', email.pk, error)
+                mark_failed(email, error)
+                failed += 1
+            else:
+                mark_sent(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
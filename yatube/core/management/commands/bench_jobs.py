@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        'Ставит в очередь пустые задачи и замеряет, сколько задач в секунду '
+        'выполняют обработчики run_workers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jobs', type=int, default=1000,
+            help='Сколько задач поставить в очередь.')
+        parser.add_argument(
+            '--processes', type=int, default=2,
+            help='Число процессов-обработчиков.')
+        parser.add_argument(
+            '--batch-size', type=int, default=10,
+            help='Сколько задач обработчик забирает за раз.')
+
+    def handle(self, *args, **options):
+        Job.objects.bulk_create(
+            [
+                Job(name='core.jobs.noop',
+                    max_attempts=settings.JOBS_MAX_ATTEMPTS)
+                for _ in range(options['jobs'])
+            ],
+            batch_size=500,
+        )
+        start = time.perf_counter()
+        call_command(
+            'run_workers',
+            processes=options['processes'],
+            batch_size=options['batch_size'],
+            burst=True,
+            stdout=self.stdout,
+        )
+        seconds = time.perf_counter() - start
+        left = Job.objects.filter(name='core.jobs.noop').count()
+        done = options['jobs'] - left
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено {done} задач за {seconds:.2f} с: '
+            f'{done / seconds:.0f} задач/с, осталось в очереди {left}'))
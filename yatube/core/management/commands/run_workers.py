@@ -0,0 +1,94 @@
+import multiprocessing
+import signal
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import Worker, requeue_stale
+
+
+def worker_main(batch_size, burst):
+    """Точка входа дочернего процесса."""
+    django.setup()
+    worker = Worker(batch_size=batch_size, burst=burst)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker.run()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает обработчики фоновых задач из очереди core.Job '
+        'в нескольких процессах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=multiprocessing.cpu_count(),
+            help='Число процессов; 0 — обрабатывать в текущем процессе.')
+        parser.add_argument(
+            '--batch-size', type=int, default=10,
+            help='Сколько задач обработчик забирает за раз.')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершиться, когда очередь опустеет.')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(
+                f'Возвращено в очередь зависших задач: {requeued}')
+        if options['processes'] == 0:
+            worker = Worker(
+                batch_size=options['batch_size'], burst=options['burst'])
+            signal.signal(signal.SIGTERM, worker.stop)
+            done, failed = worker.run()
+            self.stdout.write(self.style.SUCCESS(
+                f'Выполнено: {done}, с ошибкой: {failed}'))
+            return
+        self.run_processes(options)
+
+    def run_processes(self, options):
+        # Соединение с базой нельзя делить между процессами
+        connections.close_all()
+        worker_args = (options['batch_size'], options['burst'])
+        stopping = []
+
+        def stop(*args):
+            stopping.append(True)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        processes = [
+            self.start(worker_args) for _ in range(options['processes'])
+        ]
+        last_requeue = time.monotonic()
+        while processes and not stopping:
+            time.sleep(1)
+            alive = []
+            for process in processes:
+                if process.is_alive():
+                    alive.append(process)
+                elif process.exitcode != 0 and not options['burst']:
+                    self.stderr.write(
+                        f'Обработчик {process.pid} завершился с кодом '
+                        f'{process.exitcode}, перезапускаем')
+                    alive.append(self.start(worker_args))
+            processes = alive
+            if time.monotonic() - last_requeue >= settings.JOBS_LEASE:
+                requeue_stale()
+                last_requeue = time.monotonic()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Обработчики остановлены.'))
+
+    def start(self, worker_args):
+        process = multiprocessing.Process(target=worker_main, args=worker_args)
+        process.start()
+        return process
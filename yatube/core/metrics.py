@@ -0,0 +1,395 @@
+import gc
+import glob
+import hmac
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+import weakref
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.backends.signals import connection_created
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+
+from . import network
+
+# Имя метрики: (тип, описание)
+METRICS = {
+    'process_resident_memory_bytes': (
+        'gauge', 'Resident memory size in bytes.'),
+    'process_cpu_seconds_total': (
+        'counter', 'Total user and system CPU time spent in seconds.'),
+    'process_open_fds': ('gauge', 'Number of open file descriptors.'),
+    'process_threads': ('gauge', 'Number of Python threads.'),
+    'process_start_time_seconds': (
+        'gauge', 'Start time of the process since unix epoch in seconds.'),
+    'python_gc_collections_total': (
+        'counter', 'Garbage collections by generation.'),
+    'python_gc_pause_seconds_total': (
+        'counter', 'Time spent in garbage collection by generation.'),
+    'python_gc_pause_seconds_max': (
+        'gauge', 'Longest garbage collection pause by generation.'),
+    'django_db_connections_open': (
+        'gauge', 'Open database connections by alias.'),
+    'django_cache_requests_total': (
+        'counter', 'Cache lookups by cache alias and result.'),
+    'sorl_kvstore_requests_total': (
+        'counter', 'sorl-thumbnail KV store lookups by result.'),
+    'http_responses_compressed_total': (
+        'counter', 'Responses compressed by CompressionMiddleware.'),
+    'http_compression_bytes_total': (
+        'counter', 'Response bytes before and after compression.'),
+    'http_compression_cache_hits_total': (
+        'counter', 'Compressed bodies served from the in-process cache.'),
+    'http_compression_cpu_seconds_total': (
+        'counter', 'CPU time spent compressing responses.'),
+    'http_requests_total': (
+        'counter', 'Handled requests by status class.'),
+    'http_request_duration_seconds_total': (
+        'counter', 'Total time spent handling requests.'),
+    'http_requests_throttled_total': (
+        'counter', 'Requests rejected by rate limits and load shedding.'),
+}
+
+STARTED = time.time()
+
+
+class LabeledCounter:
+    """Потокобезопасные счетчики по наборам меток."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = Counter()
+
+    def add(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+cache_requests = LabeledCounter()
+kvstore_requests = LabeledCounter()
+http_requests = LabeledCounter()
+http_duration = LabeledCounter()
+throttled_requests = LabeledCounter()
+
+
+class GCStats:
+    """Число и длительность сборок мусора из gc.callbacks."""
+
+    def __init__(self):
+        self._started = None
+        self.collections = Counter()
+        self.pause_total = Counter()
+        self.pause_max = Counter()
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self._started = time.perf_counter()
+            return
+        if self._started is None:
+            return
+        pause = time.perf_counter() - self._started
+        self._started = None
+        generation = info['generation']
+        self.collections[generation] += 1
+        self.pause_total[generation] += pause
+        self.pause_max[generation] = max(self.pause_max[generation], pause)
+
+
+gc_stats = GCStats()
+
+# Обертки соединений всех потоков; закрытые и удаленные отпадают сами
+_database_wrappers = weakref.WeakSet()
+
+
+def _track_connection(sender, connection, **kwargs):
+    _database_wrappers.add(connection)
+
+
+def install():
+    """Подключает сбор метрик сборщика мусора и соединений с базой."""
+    if gc_stats not in gc.callbacks:
+        gc.callbacks.append(gc_stats)
+    connection_created.connect(
+        _track_connection, dispatch_uid='core.metrics.track_connection')
+
+
+class InstrumentedCache:
+    """Обертка над кэшем CACHES[LOCATION], которая считает попадания get.
+
+    Бэкенд может быть любым: остальные вызовы передаются обернутому
+    кэшу как есть. В метке cache — имя обернутого кэша.
+    """
+
+    _missing = object()
+
+    def __init__(self, location, params):
+        self.label = location
+
+    @property
+    def wrapped(self):
+        return caches[self.label]
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def __contains__(self, key):
+        return self.has_key(key)
+
+    def _count(self, hit):
+        cache_requests.add((self.label, 'hit' if hit else 'miss'))
+
+    def get(self, key, default=None, version=None):
+        value = self.wrapped.get(key, self._missing, version)
+        self._count(value is not self._missing)
+        return default if value is self._missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.wrapped.get_many(keys, version)
+        for key in keys:
+            self._count(key in found)
+        return found
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        # Как в BaseCache, но повторное чтение после add не считается
+        value = self.get(key, version=version)
+        if value is None:
+            if callable(default):
+                default = default()
+            if default is not None:
+                self.wrapped.add(key, default, timeout, version)
+                return self.wrapped.get(key, default, version)
+        return value
+
+
+class InstrumentedKVStore(KVStore):
+    """KV-хранилище sorl, которое считает найденные и пропущенные ключи."""
+
+    def _get_raw(self, key):
+        value = super()._get_raw(key)
+        kvstore_requests.add(('hit' if value is not None else 'miss',))
+        return value
+
+
+def _process_samples():
+    samples = []
+    try:
+        with open('/proc/self/statm') as statm:
+            rss = int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # Не Linux: максимальный RSS за время жизни процесса
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    samples.append(('process_resident_memory_bytes', {}, rss))
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    samples.append((
+        'process_cpu_seconds_total', {}, usage.ru_utime + usage.ru_stime))
+    try:
+        samples.append(
+            ('process_open_fds', {}, len(os.listdir('/proc/self/fd'))))
+    except OSError:
+        pass
+    samples.append(('process_threads', {}, threading.active_count()))
+    samples.append(('process_start_time_seconds', {}, STARTED))
+    return samples
+
+
+def _gc_samples():
+    samples = []
+    for generation in range(3):
+        labels = {'generation': str(generation)}
+        samples.extend([
+            ('python_gc_collections_total', labels,
+             gc_stats.collections[generation]),
+            ('python_gc_pause_seconds_total', labels,
+             gc_stats.pause_total[generation]),
+            ('python_gc_pause_seconds_max', labels,
+             gc_stats.pause_max[generation]),
+        ])
+    return samples
+
+
+def _database_samples():
+    open_connections = Counter(
+        wrapper.alias for wrapper in list(_database_wrappers)
+        if wrapper.connection is not None
+    )
+    return [
+        ('django_db_connections_open', {'alias': alias}, count)
+        for alias, count in sorted(open_connections.items())
+    ]
+
+
+def _counter_samples():
+    samples = [
+        ('django_cache_requests_total', {'cache': cache, 'result': result},
+         value)
+        for (cache, result), value in cache_requests.items()
+    ]
+    samples.extend(
+        ('sorl_kvstore_requests_total', {'result': result}, value)
+        for (result,), value in kvstore_requests.items()
+    )
+    samples.extend(
+        ('http_requests_total', {'status': status}, value)
+        for (status,), value in http_requests.items()
+    )
+    samples.extend(
+        ('http_request_duration_seconds_total', {}, value)
+        for _, value in http_duration.items()
+    )
+    samples.extend(
+        ('http_requests_throttled_total', {'class': name, 'reason': reason},
+         value)
+        for (name, reason), value in throttled_requests.items()
+    )
+    return samples
+
+
+def _compression_samples():
+    from core.middleware.compression import stats
+    values = stats.snapshot()
+    return [
+        ('http_responses_compressed_total', {}, values['compressed']),
+        ('http_compression_bytes_total', {'stage': 'in'},
+         values['bytes_in']),
+        ('http_compression_bytes_total', {'stage': 'out'},
+         values['bytes_out']),
+        ('http_compression_cache_hits_total', {}, values['cache_hits']),
+        ('http_compression_cpu_seconds_total', {},
+         values['cpu_seconds']),
+    ]
+
+
+def collect():
+    """Метрики этого процесса: список (имя, метки, значение)."""
+    return (
+        _process_samples() + _gc_samples() + _database_samples()
+        + _counter_samples() + _compression_samples()
+    )
+
+
+def metrics_dir():
+    return settings.METRICS_DIR
+
+
+_last_write = 0.0
+_write_lock = threading.Lock()
+
+
+def write_snapshot(force=False):
+    """Сохраняет метрики процесса в общий каталог, не чаще интервала."""
+    global _last_write
+    now = time.monotonic()
+    if not force and now - _last_write < settings.METRICS_WRITE_INTERVAL:
+        return
+    with _write_lock:
+        _last_write = now
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as temp_file:
+            json.dump(collect(), temp_file)
+        os.replace(temp_path, path)
+
+
+def _worker_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshots():
+    """Метрики всех живых воркеров: {pid: список образцов}.
+
+    Файлы умерших воркеров и давно не обновлявшиеся файлы удаляются.
+    """
+    snapshots = {}
+    stale_before = time.time() - settings.METRICS_STALE_AFTER
+    for path in glob.glob(os.path.join(metrics_dir(), '*.json')):
+        pid = os.path.splitext(os.path.basename(path))[0]
+        try:
+            if (
+                os.path.getmtime(path) < stale_before
+                or not _worker_alive(int(pid))
+            ):
+                os.remove(path)
+                continue
+            with open(path) as snapshot:
+                snapshots[pid] = json.load(snapshot)
+        except (OSError, ValueError):
+            # Файл удалил или переписывает другой воркер
+            continue
+    return snapshots
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    items = ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for name, value in sorted(labels.items())
+    )
+    return '{' + items + '}'
+
+
+def render():
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    write_snapshot(force=True)
+    by_name = {}
+    for pid, samples in sorted(read_snapshots().items()):
+        for name, labels, value in samples:
+            by_name.setdefault(name, []).append(
+                (dict(labels, worker=pid), value))
+    lines = []
+    for name, (metric_type, description) in METRICS.items():
+        if name not in by_name:
+            continue
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for labels, value in by_name[name]:
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def is_allowed(request):
+    """Можно ли отдать метрики: по METRICS_TOKEN или из своих сетей.
+
+    Если токен задан, нужен заголовок Authorization: Bearer <токен>.
+    Без токена адрес клиента должен входить в METRICS_ALLOWED_NETWORKS,
+    а запрос, пересланный не доверенным прокси, отклоняется: за
+    локальным прокси у всех запросов адрес 127.0.0.1.
+    """
+    if settings.METRICS_TOKEN:
+        # Заголовок сервер декодирует как latin-1, а compare_digest не
+        # сравнивает строки с не-ASCII символами: сравниваем байты
+        return hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(
+                'latin-1', 'replace'),
+            f'Bearer {settings.METRICS_TOKEN}'.encode(),
+        )
+    if not network.from_trusted_proxy(request) and any(
+        header in request.META for header in network.FORWARDED_HEADERS
+    ):
+        return False
+    return network.in_networks(
+        network.client_address(request), settings.METRICS_ALLOWED_NETWORKS)
@@ -0,0 +1,181 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    # Без пакета Brotli ответы сжимаются только gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+def brotli_compress(content):
+    return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_LEVEL)
+
+
+COMPRESSORS = OrderedDict([('br', brotli_compress), ('gzip', compress_string)])
+
+
+class CompressionStats:
+    """Счетчики сжатия ответов в этом процессе."""
+
+    FIELDS = (
+        'responses', 'compressed', 'cache_hits', 'bytes_in', 'bytes_out',
+        'cpu_seconds',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._values = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                self._values[name] += value
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self._values)
+        values['bytes_saved'] = values['bytes_in'] - values['bytes_out']
+        return values
+
+
+class CompressedCache:
+    """LRU-кэш сжатых тел ответов, ограниченный суммарным размером."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+stats = CompressionStats()
+compressed_cache = CompressedCache(settings.COMPRESSION_CACHE_BYTES)
+
+
+def accepted_encoding(request):
+    """Лучшее из поддерживаемых сжатий, которое принимает клиент."""
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        token, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(token.strip().lower())
+    for encoding in COMPRESSORS:
+        if encoding == 'br' and brotli is None:
+            continue
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Сжимает ответы brotli или gzip и переиспользует уже сжатые тела.
+
+    Одинаковые страницы (например, ленты для гостей) сжимаются один раз:
+    результат кладется в кэш по хешу тела. Короткие, потоковые и уже
+    сжатые ответы, а также картинки и прочие двоичные типы не трогаем.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request)
+        if encoding is None:
+            return response
+        self.compress(response, encoding)
+        return response
+
+    def is_compressible(self, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return False
+        if len(response.content) < settings.COMPRESSION_MIN_LENGTH:
+            return False
+        content_type = response.get('Content-Type', '').lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def compress(self, response, encoding):
+        content = response.content
+        started = time.thread_time()
+        key = (encoding, hashlib.sha1(content).digest())
+        compressed = compressed_cache.get(key)
+        cache_hit = compressed is not None
+        if not cache_hit:
+            compressed = COMPRESSORS[encoding](content)
+            compressed_cache.set(key, compressed)
+        cpu_seconds = time.thread_time() - started
+        stats.add(responses=1, cpu_seconds=cpu_seconds)
+        source = 'hit' if cache_hit else 'miss'
+        response['Server-Timing'] = (
+            f'compress;dur={cpu_seconds * 1000:.2f};'
+            f'desc="{encoding} {source}"'
+        )
+        if len(compressed) >= len(content):
+            return
+        stats.add(
+            compressed=1,
+            cache_hits=int(cache_hit),
+            bytes_in=len(content),
+            bytes_out=len(compressed),
+        )
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # Сжатое тело отличается побайтно, поэтому сильный ETag ослабляем
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
@@ -0,0 +1,22 @@
+import time
+
+from core import metrics
+
+
+class MetricsMiddleware:
+    """Считает ответы и время обработки и сбрасывает метрики в файл.
+
+    Файл процесса переписывается не чаще METRICS_WRITE_INTERVAL секунд,
+    поэтому на обычный запрос приходятся лишь два счетчика.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        metrics.http_requests.add((f'{response.status_code // 100}xx',))
+        metrics.http_duration.add((), time.perf_counter() - started)
+        metrics.write_snapshot()
+        return response
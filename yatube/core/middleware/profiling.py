@@ -0,0 +1,120 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.html import escape
+
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+class QueryCounter:
+    """execute_wrapper: считает SQL-запросы во всех базах."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def profile_wanted(request):
+    """Просит ли запрос профилирование: ?profile=1 или X-Profile: 1."""
+    return (
+        request.GET.get(PROFILE_PARAM) == '1'
+        or request.META.get(PROFILE_HEADER) == '1'
+    )
+
+
+def profile_filename(request):
+    path = re.sub(r'[^\w-]+', '-', request.path).strip('-') or 'index'
+    return f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{path}.pstats'
+
+
+def prune_profiles(directory, keep):
+    """Удаляет самые старые профили, оставляя keep последних."""
+    entries = [
+        entry for entry in os.scandir(directory)
+        if entry.name.endswith('.pstats') and entry.is_file()
+    ]
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[keep:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            # Профиль уже удалил другой воркер
+            pass
+
+
+def summarize(profile, limit):
+    stream = io.StringIO()
+    stats = pstats.Stats(profile, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос сотрудника через cProfile по его просьбе.
+
+    Результат сохраняется в PROFILING_DIR как .pstats (открывается
+    pstats, snakeviz или speedscope), хранятся PROFILING_KEEP последних.
+    Сводка с числом SQL-запросов дописывается в конец HTML-страницы и в
+    заголовки ответа. Обычные запросы проверяют только параметр и
+    заголовок и не трогают сессию.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profile_wanted(request) or not request.user.is_staff:
+            return self.get_response(request)
+        profile = cProfile.Profile()
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+        duration = time.perf_counter() - started
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILING_DIR, profile_filename(request))
+        profile.dump_stats(path)
+        prune_profiles(settings.PROFILING_DIR, settings.PROFILING_KEEP)
+        response['X-Profile-File'] = os.path.basename(path)
+        response['X-Profile-Queries'] = str(queries.count)
+        response['Server-Timing'] = f'profile;dur={duration * 1000:.1f}'
+        summary = (
+            f'Время: {duration * 1000:.1f} мс, SQL-запросов: '
+            f'{queries.count}, профиль: {path}\n\n'
+            + summarize(profile, settings.PROFILING_TOP)
+        )
+        self.append_summary(response, summary)
+        return response
+
+    def append_summary(self, response, summary):
+        content_type = response.get('Content-Type', '')
+        if response.streaming or not content_type.startswith('text/html'):
+            return
+        block = (
+            '<pre class="profile-summary" style="white-space: pre; '
+            f'font-size: 12px">{escape(summary)}</pre>'
+        ).encode(response.charset)
+        content = response.content
+        position = content.rfind(b'</body>')
+        if position == -1:
+            position = len(content)
+        response.content = content[:position] + block + content[position:]
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
@@ -0,0 +1,144 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+THIS_FILE = os.path.abspath(__file__)
+
+
+class SlowQueryLog:
+    """Последние медленные запросы этого процесса в кольцевом буфере."""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=size)
+
+    def add(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_BUFFER_SIZE)
+
+
+def _template_location(frame):
+    """Место в шаблоне, если кадр рендерит узел Django или шаблон Jinja."""
+    node = frame.f_locals.get('self')
+    if frame.f_code.co_name == 'render_annotated' and isinstance(node, Node):
+        origin = getattr(node, 'origin', None)
+        token = getattr(node, 'token', None)
+        if origin is None or token is None:
+            return None
+        return f'{origin.template_name}:{token.lineno} {token.contents}'
+    template = frame.f_globals.get('__jinja_template__')
+    if template is not None:
+        lineno = template.get_corresponding_lineno(frame.f_lineno)
+        return f'{template.name}:{lineno}'
+    return None
+
+
+def _code_location(frame):
+    """Кадр кода проекта; Django, библиотеки и этот модуль пропускаются."""
+    filename = os.path.abspath(frame.f_code.co_filename)
+    if filename == THIS_FILE or 'site-packages' in filename:
+        return None
+    if not filename.startswith(settings.BASE_DIR):
+        return None
+    path = os.path.relpath(filename, settings.BASE_DIR)
+    return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+
+def query_origin(depth):
+    """Укороченный стек запроса, от ближайшего кадра к внешним.
+
+    Узлы шаблонов показываются как «шаблон:строка тег», код проекта —
+    как «файл:строка in функция»; повторы подряд не пишутся.
+    """
+    stack = []
+    frame = sys._getframe(1)
+    while frame is not None and len(stack) < depth:
+        location = _template_location(frame) or _code_location(frame)
+        if location and (not stack or stack[-1] != location):
+            stack.append(location)
+        frame = frame.f_back
+    return stack
+
+
+class SlowQueryRecorder:
+    """execute_wrapper: замеряет запросы и сохраняет медленные из выборки."""
+
+    def __init__(self, request):
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if (
+                duration >= settings.SLOW_QUERY_THRESHOLD
+                and random.random() < settings.SLOW_QUERY_SAMPLE_RATE
+            ):
+                self.record(sql, duration, context)
+
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else None
+
+    def record(self, sql, duration, context):
+        record = {
+            'time': time.time(),
+            'duration': duration,
+            'sql': sql,
+            'database': context['connection'].alias,
+            'view': self.view_name(),
+            'path': self.request.path,
+            'stack': query_origin(settings.SLOW_QUERY_STACK_DEPTH),
+        }
+        slow_query_log.add(record)
+        logger.warning(
+            'Медленный запрос %.1f мс, %s (%s): %s\n%s',
+            duration * 1000, record['view'], record['path'], sql,
+            '\n'.join(f'  {location}' for location in record['stack']),
+        )
+
+
+class SlowQueryMiddleware:
+    """Пишет медленные SQL-запросы запроса в буфер и в журнал.
+
+    Запрос считается медленным от SLOW_QUERY_THRESHOLD секунд; из них
+    сохраняется доля SLOW_QUERY_SAMPLE_RATE. Стек показывает, какой узел
+    шаблона или строка кода выполнили запрос: ленивые QuerySet часто
+    срабатывают глубоко внутри шаблона.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD is None:
+            return self.get_response(request)
+        recorder = SlowQueryRecorder(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.get_response(request)
@@ -0,0 +1,137 @@
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+from .. import metrics
+from ..network import client_address
+
+# Ленты, у которых глубокие ?page= дороги: OFFSET и подсчет архива
+FEED_VIEWS = {
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:tag_posts',
+    'posts:popular',
+}
+
+
+def request_class(request):
+    """Класс дорогого запроса или None для обычных запросов.
+
+    POST на адреса из THROTTLE_VIEW_CLASSES получают их класс, страницы
+    лент глубже THROTTLE_DEEP_PAGE — класс deep_page.
+    """
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    if match.view_name in FEED_VIEWS:
+        page = request.GET.get('page', '')
+        if page == 'last' or (
+            page.isdigit() and int(page) > settings.THROTTLE_DEEP_PAGE
+        ):
+            return 'deep_page'
+        return None
+    if request.method == 'POST':
+        return settings.THROTTLE_VIEW_CLASSES.get(match.view_name)
+    return None
+
+
+def rate_limit_delay(key, rate, burst):
+    """Сколько секунд ждать клиенту; 0 — запрос разрешен.
+
+    Маркерное ведро на ячейках времени длиной 1 / rate: запрос занимает
+    свободную ячейку из burst ближайших, начиная с текущей, и ячейка
+    освобождается, когда ее время прошло. Ячейки занимаются через
+    cache.add, поэтому два воркера не займут одну и ту же, а лимит
+    общий для всех воркеров, если общий кэш (core.cache.is_shared).
+
+    Под key хранится последняя занятая ячейка: поиск начинается за
+    ней, а отказ при полном ведре стоит одного чтения из кэша.
+    """
+    interval = 1 / rate
+    now = time.time()
+    current = int(now // interval)
+    last = cache.get(key)
+    start = current if last is None else max(current, last + 1)
+    for cell in range(start, current + burst):
+        timeout = max(1, math.ceil((cell + 1) * interval - now))
+        if cache.add(f'{key}:{cell}', True, timeout):
+            cache.set(key, cell, math.ceil(burst * interval) + 1)
+            return 0
+    # Ячейка освободится, когда текущей станет first_free - burst + 1
+    first_free = max(start, current + burst)
+    return (first_free - burst + 1) * interval - now
+
+
+class InFlight:
+    """Число обрабатываемых запросов каждого класса в этом процессе."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def enter(self, name, limit):
+        with self._lock:
+            if self._counts[name] >= limit:
+                return False
+            self._counts[name] += 1
+            return True
+
+    def leave(self, name):
+        with self._lock:
+            self._counts[name] -= 1
+
+
+in_flight = InFlight()
+
+
+class ThrottlingMiddleware:
+    """Ограничивает дорогие запросы до обращения к сессии и базе.
+
+    Клиент с исчерпанным ведром своего класса получает 429, а запрос
+    сверх THROTTLE_LIMITS[класс]['concurrency'] одновременных в
+    воркере — 503; оба ответа с Retry-After. Клиент определяется по
+    адресу с учетом TRUSTED_PROXIES. Обычные запросы только
+    сопоставляются с адресами.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        name = request_class(request)
+        limits = settings.THROTTLE_LIMITS.get(name)
+        if limits is None:
+            return self.get_response(request)
+        # Сначала дешевая проверка в памяти, чтобы отброшенный запрос
+        # не тратил запас клиента
+        if not in_flight.enter(name, limits['concurrency']):
+            return self.reject(
+                name, 'shed', 503, settings.THROTTLE_SHED_RETRY_AFTER)
+        client = client_address(request)
+        delay = rate_limit_delay(
+            f'throttle:{name}:{client}', limits['rate'], limits['burst'])
+        if delay:
+            in_flight.leave(name)
+            return self.reject(name, 'rate', 429, delay)
+        try:
+            return self.get_response(request)
+        finally:
+            in_flight.leave(name)
+
+    def reject(self, name, reason, status, retry_after):
+        metrics.throttled_requests.add((name, reason))
+        response = HttpResponse(
+            'Слишком много запросов, попробуйте позже.\n',
+            status=status,
+            content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = str(math.ceil(retry_after))
+        return response
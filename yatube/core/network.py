@@ -0,0 +1,45 @@
+import ipaddress
+
+from django.conf import settings
+
+# Заголовки, которые добавляют обратные прокси
+FORWARDED_HEADERS = (
+    'HTTP_X_FORWARDED_FOR',
+    'HTTP_X_REAL_IP',
+    'HTTP_FORWARDED',
+)
+
+
+def in_networks(address, networks):
+    """Входит ли адрес в одну из сетей; неверный адрес — нет."""
+    try:
+        ip = ipaddress.ip_address(address.strip())
+    except ValueError:
+        return False
+    return any(ip in ipaddress.ip_network(network) for network in networks)
+
+
+def from_trusted_proxy(request):
+    """Пришел ли запрос от прокси из TRUSTED_PROXIES."""
+    return in_networks(
+        request.META.get('REMOTE_ADDR', ''), settings.TRUSTED_PROXIES)
+
+
+def client_address(request):
+    """Адрес клиента с учетом доверенных обратных прокси.
+
+    От прокси из TRUSTED_PROXIES берется X-Forwarded-For: первый справа
+    адрес, который сам не доверенный прокси. Левее него клиент мог
+    вписать что угодно. Заголовки от остальных адресов не учитываются.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    if not from_trusted_proxy(request):
+        return address
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    if not forwarded:
+        return address
+    for hop in reversed(forwarded.split(',')):
+        address = hop.strip()
+        if not in_networks(address, settings.TRUSTED_PROXIES):
+            break
+    return address
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class IsolatedStorage:
+    """Кэш shared и каталог метрик во временном каталоге прогона тестов.
+
+    Иначе cache.clear() в тестах стирал бы кэш запущенного сайта, тесты
+    читали бы чужие страницы, а файлы метрик оставались бы после прогона.
+    """
+
+    def enable(self):
+        self.directory = tempfile.mkdtemp(prefix='yatube-tests-')
+        caches = dict(settings.CACHES)
+        caches['shared'] = {
+            'BACKEND': 'core.cache.FileCache',
+            'LOCATION': os.path.join(self.directory, 'cache'),
+        }
+        self._override = override_settings(
+            CACHES=caches,
+            METRICS_DIR=os.path.join(self.directory, 'metrics'),
+        )
+        self._override.enable()
+
+    def disable(self):
+        self._override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner с отдельными кэшем и метриками (IsolatedStorage)."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.storage = IsolatedStorage()
+        self.storage.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.storage.disable()
+        super().teardown_test_environment(**kwargs)
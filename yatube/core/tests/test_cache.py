@@ -0,0 +1,51 @@
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import FileCache, is_shared
+
+
+class FileCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = FileCache(self.directory, {})
+
+    def test_add(self):
+        """add не заменяет живой ключ, но занимает истекший."""
+        self.assertTrue(self.cache.add('key', 1, 10))
+        self.assertFalse(self.cache.add('key', 2, 10))
+        self.assertEqual(self.cache.get('key'), 1)
+        with mock.patch('time.time', return_value=2e9):
+            self.assertTrue(self.cache.add('key', 3, 10))
+            self.assertEqual(self.cache.get('key'), 3)
+
+    def test_concurrent_add(self):
+        """Из одновременных add ключ достается одному."""
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.cache.add('key', 1, 10)))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+
+    def test_is_shared(self):
+        """Кэш в памяти процесса общим не считается."""
+        self.assertTrue(is_shared())
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with override_settings(CACHES={
+            'default': {
+                'BACKEND': 'core.metrics.InstrumentedCache',
+                'LOCATION': 'local',
+            },
+            'local': local,
+        }):
+            self.assertFalse(is_shared())
@@ -0,0 +1,59 @@
+import gzip
+from unittest import skipIf
+
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..middleware.compression import brotli, compressed_cache, stats
+
+
+class CompressionMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Annushka')
+        Post.objects.create(text='Масло уже разлито. ' * 50, author=cls.user)
+
+    def setUp(self):
+        compressed_cache.clear()
+        stats.reset()
+
+    def test_gzip_response(self):
+        """Страница сжимается gzip, если клиент его принимает."""
+        plain = self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    @skipIf(brotli is None, 'пакет Brotli не установлен')
+    def test_brotli_is_preferred(self):
+        """Brotli выбирается, когда клиент принимает и его, и gzip."""
+        response = self.client.get(
+            reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        response = self.client.get(
+            reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_identical_pages_are_compressed_once(self):
+        """Повторная одинаковая страница берется из кэша сжатых тел."""
+        for _ in range(3):
+            response = self.client.get(
+                reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertIn('gzip hit', response['Server-Timing'])
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['compressed'], 3)
+        self.assertEqual(snapshot['cache_hits'], 2)
+        self.assertGreater(snapshot['bytes_saved'], 0)
+
+    def test_small_responses_are_skipped(self):
+        """Короткие ответы не сжимаются."""
+        response = self.client.get(
+            reverse('posts:post_create'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(stats.snapshot()['responses'], 0)
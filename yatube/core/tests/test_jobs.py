@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..jobs import (
+    claim_jobs, enqueue, extend_lease, job, requeue_stale, run_job,
+)
+from ..models import Job
+
+calls = []
+
+
+@job
+def remember(value):
+    calls.append(value)
+
+
+def explode():
+    raise ValueError('Сломалось')
+
+
+@override_settings(JOBS_MAX_ATTEMPTS=2, JOBS_RETRY_DELAY=30)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_and_priority_order(self):
+        """Задачи с большим приоритетом выполняются первыми."""
+        remember.delay('обычная')
+        enqueue(f'{__name__}.remember', ['срочная'], priority=10)
+        call_command('run_workers', processes=0, burst=True, stdout=StringIO())
+        self.assertEqual(calls, ['срочная', 'обычная'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_claim_does_not_take_claimed_jobs(self):
+        """Задачу забирает только один обработчик."""
+        for value in range(3):
+            remember.delay(value)
+        first = claim_jobs('first', limit=2)
+        second = claim_jobs('second', limit=2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse(
+            {item.pk for item in first} & {item.pk for item in second})
+
+    def test_future_job_waits(self):
+        """Отложенная задача не выполняется раньше срока."""
+        enqueue(
+            f'{__name__}.remember', ['потом'],
+            run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(claim_jobs('worker'), [])
+
+    def test_failed_job_retries_then_fails(self):
+        """Упавшая задача повторяется с паузой, затем помечается ошибкой."""
+        enqueue(f'{__name__}.explode')
+        claimed, = claim_jobs('worker')
+        self.assertFalse(run_job(claimed))
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, Job.QUEUED)
+        self.assertGreater(claimed.run_at, timezone.now())
+        self.assertIn('Сломалось', claimed.last_error)
+        Job.objects.update(run_at=timezone.now())
+        claimed, = claim_jobs('worker')
+        self.assertFalse(run_job(claimed))
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, Job.FAILED)
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_requeue_stale(self):
+        """Задачи зависшего обработчика возвращаются в очередь."""
+        remember.delay('зависла')
+        claim_jobs('worker')
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(lease=60), 1)
+        self.assertEqual(Job.objects.get().status, Job.QUEUED)
+
+    def test_stale_job_fails_after_max_attempts(self):
+        """Задача, каждый раз роняющая обработчик, не крутится вечно."""
+        remember.delay('роняет')
+        for _ in range(2):
+            claim_jobs('worker')
+            Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+            requeue_stale(lease=60)
+        stale = Job.objects.get()
+        self.assertEqual(stale.status, Job.FAILED)
+        self.assertEqual(stale.attempts, 2)
+        self.assertEqual(claim_jobs('worker'), [])
+
+    def test_extend_lease(self):
+        """Аренда долгой задачи продлевается, и ее не забирают повторно."""
+        remember.delay('долгая')
+        claim_jobs('worker')
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(extend_lease('other'), 0)
+        self.assertEqual(extend_lease('worker'), 1)
+        self.assertEqual(requeue_stale(lease=60), 0)
+        self.assertEqual(Job.objects.get().status, Job.RUNNING)
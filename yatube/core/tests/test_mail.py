@@ -0,0 +1,95 @@
+import socket
+from datetime import timedelta
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import User
+
+from ..mail import deliver_outbox
+from ..models import OutgoingEmail
+from .smtp_server import LocalSMTPServer
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.OutboxBackend',
+    OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+    EMAIL_HOST='127.0.0.1',
+    EMAIL_TIMEOUT=5,
+)
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='Margarita',
+            email='margarita@yatube.ru',
+            password='azazello-cream',
+        )
+
+    def setUp(self):
+        self.server = LocalSMTPServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+        smtp_settings = override_settings(EMAIL_PORT=self.server.port)
+        smtp_settings.enable()
+        self.addCleanup(smtp_settings.disable)
+
+    def test_request_does_not_wait_for_smtp(self):
+        """Запрос сброса пароля только ставит письмо в очередь."""
+        self.client.post(
+            reverse('password_reset'), {'email': self.user.email})
+        self.assertEqual(self.server.connections, 0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.recipients, self.user.email)
+        self.assertEqual(deliver_outbox(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.SENT)
+        sender, recipients, data = self.server.messages[0]
+        self.assertEqual(recipients, [f'<{self.user.email}>'])
+        self.assertIn(b'Content-Type: text/plain', data)
+
+    def test_batch_reuses_connection(self):
+        """Пачка писем уходит через одно соединение."""
+        for number in range(3):
+            mail.send_mail(
+                f'Письмо {number}', 'Текст', 'yatube@yatube.ru',
+                [f'reader{number}@yatube.ru'],
+            )
+        self.assertEqual(deliver_outbox(batch_size=10), (3, 0))
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.server.messages), 3)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        """Недоставленное письмо повторяется позже, пока есть попытки."""
+        mail.send_mail(
+            'Тема', 'Текст', 'yatube@yatube.ru', ['reader@yatube.ru'])
+        with override_settings(EMAIL_PORT=free_port()):
+            self.assertEqual(deliver_outbox(), (0, 1))
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(
+            (email.status, email.attempts), (OutgoingEmail.PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(deliver_outbox(), (0, 0))
+        OutgoingEmail.objects.update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(deliver_outbox(), (1, 0))
+        self.assertEqual(len(self.server.messages), 1)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=1)
+    def test_message_fails_after_last_attempt(self):
+        """После последней попытки письмо помечается неотправленным."""
+        mail.send_mail(
+            'Тема', 'Текст', 'yatube@yatube.ru', ['reader@yatube.ru'])
+        with override_settings(EMAIL_PORT=free_port()):
+            deliver_outbox()
+        self.assertEqual(
+            OutgoingEmail.objects.get().status, OutgoingEmail.FAILED)
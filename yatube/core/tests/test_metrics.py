@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import metrics
+
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        metrics.cache_requests.reset()
+        metrics.kvstore_requests.reset()
+
+    def scrape(self, **extra):
+        return self.client.get(reverse('metrics'), **extra)
+
+    def test_metrics_in_prometheus_format(self):
+        """Метрики процесса, базы и кэшей отдаются в формате Prometheus."""
+        cache.get('missing')
+        cache.set('present', 1)
+        cache.get('present')
+        metrics.InstrumentedKVStore()._get_raw('sorl-thumbnail||missing')
+        self.client.get(reverse('posts:index'))
+        response = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        worker = f'worker="{os.getpid()}"'
+        self.assertIn('# TYPE process_resident_memory_bytes gauge', text)
+        self.assertIn(f'process_resident_memory_bytes{{{worker}}}', text)
+        self.assertIn(
+            'django_cache_requests_total{cache="shared",result="hit",'
+            f'{worker}}} 1', text)
+        self.assertIn(
+            'django_cache_requests_total{cache="shared",result="miss",'
+            f'{worker}}}', text)
+        self.assertIn(
+            f'sorl_kvstore_requests_total{{result="miss",{worker}}} 1', text)
+        self.assertIn(
+            f'django_db_connections_open{{alias="default",{worker}}}', text)
+        self.assertIn('http_compression_bytes_total{stage="in"', text)
+        self.assertIn('python_gc_collections_total{generation="0"', text)
+
+    def test_workers_are_aggregated(self):
+        """Файлы других живых воркеров попадают в ответ, брошенные — нет."""
+        parent = os.getppid()
+        with open(os.path.join(METRICS_DIR, f'{parent}.json'), 'w') as file_:
+            json.dump([['http_requests_total', {'status': '2xx'}, 7]], file_)
+        stale = os.path.join(METRICS_DIR, '999999999.json')
+        with open(stale, 'w') as file_:
+            json.dump([['http_requests_total', {'status': '2xx'}, 3]], file_)
+        old = time.time() - 3600
+        os.utime(stale, (old, old))
+        text = self.scrape().content.decode()
+        self.assertIn(
+            f'http_requests_total{{status="2xx",worker="{parent}"}} 7', text)
+        self.assertNotIn('worker="999999999"', text)
+        self.assertFalse(os.path.exists(stale))
+
+    def test_external_addresses_are_rejected(self):
+        """Снаружи внутренних сетей метрики недоступны."""
+        response = self.scrape(REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 404)
+        response = self.scrape(REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, 200)
+
+    def test_forwarded_requests(self):
+        """За прокси решает адрес клиента из X-Forwarded-For."""
+        forwarded = {
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_X_FORWARDED_FOR': '10.0.0.5, 203.0.113.7',
+        }
+        self.assertEqual(self.scrape(**forwarded).status_code, 404)
+        with self.settings(TRUSTED_PROXIES=['127.0.0.1/32']):
+            self.assertEqual(self.scrape(**forwarded).status_code, 404)
+            response = self.scrape(
+                REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='10.0.0.5')
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        """С токеном метрики отдаются только по нему."""
+        self.assertEqual(self.scrape().status_code, 404)
+        response = self.scrape(
+            REMOTE_ADDR='203.0.113.7', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer s\xe9cret')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,82 @@
+import os
+import pstats
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+PROFILING_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILING_DIR=PROFILING_DIR)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='Woland', is_staff=True)
+        cls.user = User.objects.create_user(username='Annushka')
+        Post.objects.create(text='Масло уже разлито', author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+        self.url = reverse('posts:profile', kwargs={'username': 'Annushka'})
+
+    def test_staff_request_is_profiled(self):
+        """Сотрудник получает сводку профиля и файл .pstats."""
+        response = self.staff_client.get(self.url, {'profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        path = os.path.join(PROFILING_DIR, response['X-Profile-File'])
+        self.assertTrue(path.endswith('.pstats'))
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+        self.assertGreater(int(response['X-Profile-Queries']), 0)
+        content = response.content.decode()
+        self.assertIn('class="profile-summary"', content)
+        self.assertIn(
+            f'SQL-запросов: {response["X-Profile-Queries"]}', content)
+        self.assertLess(
+            content.index('profile-summary'), content.index('</body>'))
+
+    @override_settings(PROFILING_KEEP=2)
+    def test_old_profiles_are_pruned(self):
+        """В каталоге остаются только PROFILING_KEEP последних профилей."""
+        for name in os.listdir(PROFILING_DIR):
+            os.remove(os.path.join(PROFILING_DIR, name))
+        for number in range(3):
+            path = os.path.join(PROFILING_DIR, f'old-{number}.pstats')
+            open(path, 'w').close()
+            os.utime(path, (number, number))
+        response = self.staff_client.get(self.url, {'profile': '1'})
+        self.assertEqual(
+            sorted(os.listdir(PROFILING_DIR)),
+            sorted(['old-2.pstats', response['X-Profile-File']]),
+        )
+
+    def test_header_enables_profiling(self):
+        """Профилирование включается и заголовком X-Profile."""
+        response = self.staff_client.get(self.url, HTTP_X_PROFILE='1')
+        self.assertTrue(response.has_header('X-Profile-File'))
+
+    def test_other_requests_are_not_profiled(self):
+        """Без просьбы и для не сотрудников профилировщик не запускается."""
+        with mock.patch('cProfile.Profile') as profile:
+            for client, params in (
+                (self.staff_client, {}),
+                (self.user_client, {'profile': '1'}),
+                (Client(), {'profile': '1'}),
+            ):
+                response = client.get(self.url, params)
+                self.assertFalse(response.has_header('X-Profile-File'))
+                self.assertNotIn(b'profile-summary', response.content)
+        profile.assert_not_called()
@@ -0,0 +1,164 @@
+import json
+import os
+import re
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import about.urls
+import posts.urls
+import users.urls
+from posts.counters import ViewCounter
+from posts.existence import group_slugs, post_ids, usernames
+from posts.likes import like_post
+from posts.models import Group, Post, User
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'query_plans.json')
+
+# Переписать эталон: UPDATE_QUERY_PLANS=1 python manage.py test core
+UPDATE_BASELINE = bool(os.environ.get('UPDATE_QUERY_PLANS'))
+
+# Полный обход таблицы; обход по индексу пишется как SCAN ... USING INDEX
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+# Адрес: (аргументы, метод, клиент)
+URL_CASES = {
+    'posts:index': ({}, 'get', 'guest'),
+    'posts:index_feed': ({}, 'get', 'guest'),
+    'posts:group_list': ({'slug': 'kitchen'}, 'get', 'guest'),
+    'posts:group_feed': ({'slug': 'kitchen'}, 'get', 'guest'),
+    'posts:profile': ({'username': 'Annushka'}, 'get', 'guest'),
+    'posts:profile_feed': ({'username': 'Annushka'}, 'get', 'guest'),
+    'posts:tag_posts': ({'name': 'масло'}, 'get', 'guest'),
+    'posts:popular': ({}, 'get', 'guest'),
+    'posts:post_detail': ({'post_id': 'post'}, 'get', 'reader'),
+    'posts:post_like': ({'post_id': 'post'}, 'post', 'reader'),
+    'posts:post_unlike': ({'post_id': 'post'}, 'post', 'reader'),
+    'posts:post_create': ({}, 'get', 'author'),
+    'posts:post_edit': ({'post_id': 'post'}, 'get', 'author'),
+    'users:signup': ({}, 'get', 'guest'),
+    'users:username_check': ({}, 'get', 'guest'),
+    'users:login': ({}, 'get', 'guest'),
+    'users:logout': ({}, 'get', 'reader'),
+    'about:author': ({}, 'get', 'guest'),
+    'about:tech': ({}, 'get', 'guest'),
+}
+
+
+def url_names():
+    return {
+        f'{module.app_name}:{pattern.name}'
+        for module in (posts.urls, users.urls, about.urls)
+        for pattern in module.urlpatterns
+    }
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_summary(queries):
+    """Число запросов, полные обходы таблиц и временные B-деревья."""
+    full_scans = set()
+    temp_b_trees = 0
+    for query in queries:
+        sql = query['sql']
+        if not sql.startswith(EXPLAINED_STATEMENTS):
+            continue
+        for detail in explain(sql):
+            match = FULL_SCAN_RE.match(detail)
+            if match:
+                full_scans.add(match.group(1))
+            if 'TEMP B-TREE' in detail:
+                temp_b_trees += 1
+    return {
+        'queries': len(queries),
+        'full_scans': sorted(full_scans),
+        'temp_b_trees': temp_b_trees,
+    }
+
+
+@skipUnless(connection.vendor == 'sqlite', 'планы снимаются для SQLite')
+class QueryPlanTests(TestCase):
+    """Планы запросов всех страниц сверяются с query_plans.json.
+
+    Тест падает, если у страницы стало больше запросов, появился полный
+    обход таблицы или сортировка во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Annushka')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Кухня', slug='kitchen', description='Тестовое описание')
+        for number in range(25):
+            Post.objects.create(
+                text=f'Пост {number} про #масло',
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+            )
+        cls.post = Post.objects.first()
+        like_post(cls.reader, cls.post.pk)
+
+    def setUp(self):
+        patcher = mock.patch('posts.views.view_counter', ViewCounter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Фильтры существования собираются раз в час, а не в каждом запросе
+        for existence in (usernames, group_slugs, post_ids):
+            existence.rebuild()
+        self.clients = {'guest': Client()}
+        for key, user in (('reader', self.reader), ('author', self.author)):
+            self.clients[key] = Client()
+            self.clients[key].force_login(user)
+
+    def capture(self, name):
+        kwargs, method, client = URL_CASES[name]
+        kwargs = {
+            key: self.post.pk if value == 'post' else value
+            for key, value in kwargs.items()
+        }
+        url = reverse(name, kwargs=kwargs)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.clients[client], method)(url)
+        self.assertLess(response.status_code, 400, name)
+        return plan_summary(queries)
+
+    def test_every_url_has_a_case(self):
+        """Для каждого адреса приложений описан запрос."""
+        self.assertEqual(set(URL_CASES), url_names())
+
+    def test_query_plans_match_baseline(self):
+        """Запросы страниц не хуже эталона."""
+        plans = {name: self.capture(name) for name in sorted(URL_CASES)}
+        if UPDATE_BASELINE:
+            with open(BASELINE_PATH, 'w', encoding='utf-8') as file_:
+                json.dump(plans, file_, ensure_ascii=False, indent=2,
+                          sort_keys=True)
+                file_.write('\n')
+            self.skipTest('эталон планов перезаписан')
+        with open(BASELINE_PATH, encoding='utf-8') as file_:
+            baseline = json.load(file_)
+        for name, plan in plans.items():
+            with self.subTest(url=name):
+                self.assertIn(name, baseline, 'нет эталона для адреса')
+                expected = baseline[name]
+                self.assertLessEqual(
+                    plan['queries'], expected['queries'], 'больше запросов')
+                self.assertEqual(
+                    set(plan['full_scans']) - set(expected['full_scans']),
+                    set(), 'новые полные обходы таблиц')
+                self.assertLessEqual(
+                    plan['temp_b_trees'], expected['temp_b_trees'],
+                    'новые сортировки во временном B-дереве')
@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, Tag, User
+
+from ..middleware.slow_queries import SlowQueryLog, slow_query_log
+
+LOGGER = 'core.middleware.slow_queries'
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_SAMPLE_RATE=1.0)
+class SlowQueryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Annushka')
+        Post.objects.create(text='Разлила #масло', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        slow_query_log.clear()
+
+    def trending_record(self):
+        table = Tag._meta.db_table
+        return next(
+            record for record in slow_query_log.records()
+            if f'FROM "{table}"' in record['sql']
+            and 'ORDER BY' in record['sql']
+        )
+
+    def test_template_query_points_to_template(self):
+        """Запрос из ленивого QuerySet указывает на строку шаблона."""
+        with self.assertLogs(LOGGER, 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        record = self.trending_record()
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['database'], 'default')
+        self.assertEqual(
+            record['stack'][0],
+            'includes/trending_tags.html:1 if trending_tags')
+        self.assertIn(
+            "posts/index.html:8 include 'includes/trending_tags.html'",
+            record['stack'])
+        self.assertTrue(any(
+            location.startswith('posts/views.py:')
+            and location.endswith(' in index')
+            for location in record['stack']
+        ))
+        self.assertTrue(any(
+            'includes/trending_tags.html:1' in line for line in logs.output))
+
+    @override_settings(POSTS_TEMPLATE_ENGINE='jinja2')
+    def test_jinja_template_line(self):
+        """Для шаблонов Jinja указывается строка исходного шаблона."""
+        with self.assertLogs(LOGGER, 'WARNING'):
+            self.client.get(reverse('posts:index'))
+        record = self.trending_record()
+        self.assertEqual(
+            record['stack'][0], 'includes/trending_tags.html:1')
+
+    def test_view_query_points_to_view(self):
+        """Запрос из кода view указывает на строку view."""
+        with self.assertLogs(LOGGER, 'WARNING'):
+            self.client.get(
+                reverse('posts:tag_posts', kwargs={'name': 'масло'}))
+        record = next(
+            record for record in slow_query_log.records()
+            if record['sql'].startswith('SELECT')
+            and '"posts_tag"."name" =' in record['sql']
+        )
+        self.assertTrue(
+            record['stack'][0].startswith('posts/views.py:'), record)
+        self.assertTrue(record['stack'][0].endswith(' in tag_posts'))
+
+    @override_settings(SLOW_QUERY_THRESHOLD=60)
+    def test_fast_queries_are_not_recorded(self):
+        """Быстрые запросы не попадают в журнал."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(slow_query_log.records(), [])
+
+    def test_buffer_keeps_latest_records(self):
+        """Буфер хранит только последние записи."""
+        buffer = SlowQueryLog(2)
+        for number in range(3):
+            buffer.add({'sql': str(number)})
+        self.assertEqual(
+            [record['sql'] for record in buffer.records()], ['1', '2'])
@@ -0,0 +1,144 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from .. import metrics
+from ..middleware.throttling import in_flight, rate_limit_delay
+
+LIMITS = {
+    'auth': {'rate': 1 / 60, 'burst': 2, 'concurrency': 4},
+    'write': {'rate': 1, 'burst': 10, 'concurrency': 1},
+    'deep_page': {'rate': 1, 'burst': 1, 'concurrency': 4},
+}
+
+
+@override_settings(THROTTLE_LIMITS=LIMITS, THROTTLE_DEEP_PAGE=2)
+class ThrottlingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Annushka')
+        for number in range(35):
+            Post.objects.create(text=f'Пост {number}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        metrics.throttled_requests.reset()
+
+    def login(self, address='192.0.2.1'):
+        return self.client.post(
+            reverse('users:login'),
+            {'username': 'Annushka', 'password': 'wrong'},
+            REMOTE_ADDR=address,
+        )
+
+    def test_rate_limit(self):
+        """Сверх запаса клиент получает 429 с Retry-After без запросов."""
+        for _ in range(2):
+            self.assertEqual(self.login().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(1, 61))
+        self.assertEqual(self.login('192.0.2.2').status_code, 200)
+        self.assertEqual(
+            metrics.throttled_requests.items(), [(('auth', 'rate'), 1)])
+
+    def test_bucket_refills(self):
+        """Ведро пополняется со временем."""
+        with mock.patch('time.time', return_value=1000.0):
+            self.assertEqual(rate_limit_delay('bucket', 1, 2), 0)
+            self.assertEqual(rate_limit_delay('bucket', 1, 2), 0)
+            self.assertEqual(rate_limit_delay('bucket', 1, 2), 1)
+        with mock.patch('time.time', return_value=1001.0):
+            self.assertEqual(rate_limit_delay('bucket', 1, 2), 0)
+
+    def test_shed_requests_keep_tokens(self):
+        """Запрос, отброшенный по concurrency, не тратит запас клиента."""
+        self.assertTrue(in_flight.enter('auth', 4))
+        try:
+            for _ in range(3):
+                in_flight.enter('auth', 4)
+            self.assertEqual(self.login().status_code, 503)
+        finally:
+            for _ in range(4):
+                in_flight.leave('auth')
+        for _ in range(2):
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_full_bucket_costs_one_read(self):
+        """Отказ при полном ведре не пишет в кэш."""
+        for _ in range(2):
+            rate_limit_delay('cheap', 1 / 60, 2)
+        with mock.patch.object(cache, 'add') as add:
+            self.assertGreater(rate_limit_delay('cheap', 1 / 60, 2), 0)
+        add.assert_not_called()
+
+    def test_concurrent_requests(self):
+        """Одновременные запросы не делят одну единицу запаса."""
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(rate_limit_delay('race', 1, 3)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(0), 3)
+
+    @override_settings(TRUSTED_PROXIES=['127.0.0.1/32'])
+    def test_clients_behind_proxy(self):
+        """За доверенным прокси клиенты различаются по X-Forwarded-For."""
+        def login(address):
+            return self.client.post(
+                reverse('users:login'),
+                {'username': 'Annushka', 'password': 'wrong'},
+                REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR=address,
+            )
+
+        for _ in range(2):
+            self.assertEqual(login('192.0.2.1').status_code, 200)
+        self.assertEqual(login('192.0.2.1').status_code, 429)
+        self.assertEqual(login('192.0.2.2').status_code, 200)
+        # Подделанный адрес левее настоящего не помогает
+        self.assertEqual(
+            login('192.0.2.9, 192.0.2.1').status_code, 429)
+
+    def test_safe_requests_are_not_limited(self):
+        """GET форм и первые страницы лент не ограничиваются."""
+        for _ in range(5):
+            self.assertEqual(
+                self.client.get(reverse('users:login')).status_code, 200)
+            self.assertEqual(
+                self.client.get(reverse('posts:index'), {'page': 2})
+                .status_code, 200)
+
+    def test_deep_pages(self):
+        """Глубокие страницы лент — отдельный класс."""
+        url = reverse('posts:index')
+        self.assertEqual(self.client.get(url, {'page': 3}).status_code, 200)
+        response = self.client.get(url, {'page': 'last'})
+        self.assertEqual(response.status_code, 429)
+
+    def test_concurrency_shedding(self):
+        """Сверх лимита одновременных запросов класса — 503."""
+        self.client.force_login(self.user)
+        self.assertTrue(in_flight.enter('write', 1))
+        try:
+            with self.assertNumQueries(0):
+                response = self.client.post(
+                    reverse('posts:post_create'), {'text': 'Текст'})
+        finally:
+            in_flight.leave('write')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Текст'})
+        self.assertEqual(response.status_code, 302)
@@ -1,6 +1,23 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
+from django.template.response import TemplateResponse
 
-from .models import Group, Post
+from . import moderation
+from .models import Group, Post, Tag, User
+from .sharding import post_shards
+from .utils import EstimatedCountPaginator
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        required=False,
+        label='Группа',
+        empty_label='без группы',
+    )
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -12,10 +29,124 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    actions = ('delete_posts', 'delete_by_author', 'move_to_group')
+    action_form = PostActionForm
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Стандартное удаление грузит в память каждый объект
+        actions.pop('delete_selected', None)
+        return actions
+
+    def confirm_deletion(self, request, action, queryset, authors=None):
+        """Страница подтверждения, как у delete_selected.
+
+        Объекты в память не загружаются: показывается только число
+        постов во всех базах и авторы, чьи посты будут удалены целиком.
+        Выбор (включая «выбрать все» и фильтры списка) передается дальше
+        скрытыми полями формы.
+        """
+        opts = self.model._meta
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Вы уверены?',
+            'opts': opts,
+            'action': action,
+            'action_title': getattr(self, action).short_description,
+            'count': sum(
+                queryset.using(alias).count() for alias in post_shards()),
+            'authors': authors,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'media': self.media,
+        }
+        request.current_app = self.admin_site.name
+        return TemplateResponse(
+            request, 'admin/posts/post/bulk_delete_confirmation.html', context)
+
+    def delete_posts(self, request, queryset):
+        if not request.POST.get('post'):
+            return self.confirm_deletion(request, 'delete_posts', queryset)
+        result = moderation.delete_posts(queryset)
+        self.message_user(request, str(result))
+    delete_posts.short_description = 'Удалить выбранные посты'
+    delete_posts.allowed_permissions = ('delete',)
+
+    def delete_by_author(self, request, queryset):
+        author_ids = set()
+        for alias in post_shards():
+            author_ids.update(
+                queryset.using(alias).values_list('author_id', flat=True))
+        if not request.POST.get('post'):
+            return self.confirm_deletion(
+                request, 'delete_by_author',
+                Post.objects.filter(author_id__in=author_ids),
+                authors=User.objects.filter(pk__in=author_ids)
+                .order_by('username'),
+            )
+        result = moderation.delete_by_authors(author_ids)
+        self.message_user(request, str(result))
+    delete_by_author.short_description = (
+        'Удалить все посты авторов выбранных постов')
+    delete_by_author.allowed_permissions = ('delete',)
+
+    def move_to_group(self, request, queryset):
+        field = self.action_form.base_fields['group']
+        try:
+            group = field.clean(request.POST.get('group'))
+        except ValidationError:
+            self.message_user(
+                request, 'Выберите существующую группу', messages.ERROR)
+            return
+        result = moderation.move_to_group(queryset, group)
+        self.message_user(request, str(result))
+    move_to_group.short_description = 'Перенести выбранные посты в группу'
+    move_to_group.allowed_permissions = ('change',)
+
+    def is_changelist(self, request):
+        opts = self.model._meta
+        match = getattr(request, 'resolver_match', None)
+        return match is not None and match.url_name == (
+            f'{opts.app_label}_{opts.model_name}_changelist')
+
+    def get_autocomplete_fields(self, request):
+        # В списке постов группа редактируется обычным <select>
+        if self.is_changelist(request):
+            return ()
+        return super().get_autocomplete_fields(request)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs)
+        if db_field.name == 'group' and self.is_changelist(request):
+            # Список групп читается один раз и копируется во все строки,
+            # а не запрашивается заново для каждой формы
+            formfield.choices = list(formfield.choices)
+        return formfield
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'score')
+    search_fields = ('name',)
+    ordering = ('-score',)
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Tag, TagAdmin)
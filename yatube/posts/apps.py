@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'Посты'
+
+    def ready(self):
+        from . import cascades, existence, feed_cache, likes
+        existence.install()
+        feed_cache.install()
+        likes.install()
+        cascades.install()
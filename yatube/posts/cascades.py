@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.utils.text import capfirst
+
+from .likes import recount_likes
+from .models import ArchivedPost, Group, Like, Post, PostTag, Tag
+from .sharding import post_shards
+from .signals import posts_bulk_changed
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def delete_author_rows(alias, user_ids):
+    """Удаляет в базе alias посты, архив и лайки удаленных пользователей.
+
+    Счетчики постов, которые эти пользователи лайкали, пересчитываются.
+    Возвращает число удаленных постов.
+    """
+    likes = Like.objects.using(alias).filter(user_id__in=user_ids)
+    liked_post_ids = list(
+        likes.values_list('post_id', flat=True).distinct())
+    likes.delete()
+    posts = Post.objects.using(alias).filter(author_id__in=user_ids)
+    group_ids = set(posts.values_list('group_id', flat=True))
+    deleted = posts.count()
+    posts.delete()
+    ArchivedPost.objects.using(alias).filter(author_id__in=user_ids).delete()
+    if liked_post_ids:
+        recount_likes(liked_post_ids, alias)
+    if deleted:
+        group_ids.discard(None)
+        posts_bulk_changed.send(
+            sender=Post, author_ids=set(user_ids), group_ids=group_ids)
+    return deleted
+
+
+def clear_group_rows(alias, group_ids):
+    """Убирает удаленные группы у постов и архива в базе alias."""
+    changed = 0
+    for model in (Post, ArchivedPost):
+        changed += model.objects.using(alias).filter(
+            group_id__in=group_ids).update(group=None)
+    return changed
+
+
+def delete_tag_rows(alias, tag_ids):
+    """Удаляет связи постов с удаленными тегами в базе alias."""
+    _, deleted = PostTag.objects.using(alias).filter(
+        tag_id__in=tag_ids).delete()
+    return deleted.get(PostTag._meta.label, 0)
+
+
+# Модель в default -> что сделать с ее строками в других базах постов
+CASCADES = {
+    User: delete_author_rows,
+    Group: clear_group_rows,
+    Tag: delete_tag_rows,
+}
+
+
+def _deleted(sender, instance, using, **kwargs):
+    # ORM повторяет каскад только в базе удаляемого объекта, остальные
+    # базы постов дочищаются после коммита
+    cascade = CASCADES[sender]
+    pk = instance.pk
+
+    def run():
+        for alias in post_shards():
+            if alias != using:
+                cascade(alias, [pk])
+
+    transaction.on_commit(run, using=using)
+
+
+def missing_ids(model, ids):
+    """Какие из ids больше не существуют в default."""
+    ids = set(ids)
+    return ids - set(
+        model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+# (модель в базе постов, поле ссылки, модель в default, что сделать)
+ORPHAN_CHECKS = (
+    (Post, 'author_id', User, delete_author_rows),
+    (ArchivedPost, 'author_id', User, delete_author_rows),
+    (Like, 'user_id', User, delete_author_rows),
+    (Post, 'group_id', Group, clear_group_rows),
+    (ArchivedPost, 'group_id', Group, clear_group_rows),
+    (PostTag, 'tag_id', Tag, delete_tag_rows),
+)
+
+
+def delete_orphans(batch_size=BATCH_SIZE):
+    """Дочищает строки баз постов, которые ссылаются на удаленные объекты.
+
+    Нужна, если каскад после коммита не выполнился (например, процесс
+    упал). Ссылки проверяются пачками различных значений, без JOIN между
+    базами. Возвращает {модель в default: сколько ссылок на нее убрано}.
+    """
+    stats = dict.fromkeys(
+        (capfirst(model._meta.verbose_name_plural) for model in CASCADES), 0)
+    for alias in post_shards():
+        for model, field, parent, cascade in ORPHAN_CHECKS:
+            values = (
+                model.objects.using(alias).exclude(**{field: None})
+                .values_list(field, flat=True).distinct().order_by(field)
+            )
+            last = None
+            while True:
+                # По ключу, а не курсором: найденные строки тут же удаляются
+                page = values if last is None else values.filter(
+                    **{f'{field}__gt': last})
+                batch = list(page[:batch_size])
+                if not batch:
+                    break
+                last = batch[-1]
+                missing = missing_ids(parent, batch)
+                if missing:
+                    cascade(alias, sorted(missing))
+                    name = capfirst(parent._meta.verbose_name_plural)
+                    stats[name] += len(missing)
+    return stats
+
+
+def install():
+    """Подключает каскад удаления пользователей, групп и тегов по базам."""
+    for model in CASCADES:
+        post_delete.connect(
+            _deleted, sender=model,
+            dispatch_uid=f'posts.cascades.{model._meta.label_lower}',
+        )
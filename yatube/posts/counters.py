@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from .models import Post
+from .sharding import is_sharded, post_shards
+
+logger = logging.getLogger(__name__)
+
+# Ограничение SQLite на число параметров в одном запросе
+FLUSH_CHUNK_SIZE = 500
+
+
+class ViewCounter:
+    """Копит просмотры постов в памяти процесса и пишет их в базу пачкой.
+
+    Запись идет не чаще раза в POST_VIEWS_FLUSH_INTERVAL секунд и при
+    выходе из процесса сервера (см. wsgi.py), поэтому при падении теряется
+    не больше интервала.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+
+    def incr(self, post_id, amount=1):
+        with self._lock:
+            self._pending[post_id] += amount
+            due = (
+                time.monotonic() - self._last_flush
+                >= settings.POST_VIEWS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def pending(self, post_id):
+        """Просмотры поста, еще не записанные в базу."""
+        return self._pending.get(post_id, 0)
+
+    def flush(self):
+        """Записывает накопленные просмотры и возвращает их число."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        # Посты с одинаковым приростом обновляются одним UPDATE
+        by_amount = defaultdict(list)
+        for post_id, amount in pending.items():
+            by_amount[amount].append(post_id)
+        written = set()
+        failed = False
+        for using in post_shards():
+            try:
+                with transaction.atomic(using=using):
+                    written |= self._write(using, by_amount)
+            except DatabaseError:
+                logger.warning(
+                    'Не удалось записать просмотры в %s', using,
+                    exc_info=True)
+                failed = True
+        if failed:
+            # База занята: вернем незаписанные просмотры в буфер
+            with self._lock:
+                self._pending.update({
+                    post_id: amount for post_id, amount in pending.items()
+                    if post_id not in written
+                })
+        return sum(pending[post_id] for post_id in written)
+
+    def _write(self, using, by_amount):
+        """Пишет просмотры в одну базу и возвращает id записанных постов.
+
+        Если база одна, посты не ищутся: считаются записанными все.
+        """
+        written = set()
+        for amount, post_ids in by_amount.items():
+            for start in range(0, len(post_ids), FLUSH_CHUNK_SIZE):
+                chunk = post_ids[start:start + FLUSH_CHUNK_SIZE]
+                posts = Post.objects.using(using).filter(pk__in=chunk)
+                if is_sharded():
+                    chunk = list(posts.values_list('pk', flat=True))
+                    if not chunk:
+                        continue
+                    posts = Post.objects.using(using).filter(pk__in=chunk)
+                posts.update(views=F('views') + amount)
+                written.update(chunk)
+        return written
+
+
+view_counter = ViewCounter()
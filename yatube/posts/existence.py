@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models.signals import post_save
+from django.http import Http404
+
+from core.cache import is_shared
+
+from .models import ArchivedPost, Group, Post
+from .sharding import post_shards
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+class BloomFilter:
+    """Множество без удаления: «нет» всегда верно, «есть» — с ошибкой.
+
+    Размер и число хешей считаются по емкости и доле ложных «есть».
+    Позиции битов — двойное хеширование одного дайджеста blake2b.
+    """
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [
+            (first + number * step) % self.size
+            for number in range(self.hashes)
+        ]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class ExistenceFilter:
+    """Отказ без запроса к базе для ключей, которых точно нет.
+
+    Фильтр Блума каждого процесса собирается из таблицы в фоне
+    (refresh_in_background) раз в EXISTENCE_FILTER_MAX_AGE секунд.
+    Ключи, созданные после сборки, процесс-создатель добавляет в свой
+    фильтр, а для остальных воркеров оставляет метку в кэше на две
+    сборки. Ложные «есть» и удаленные объекты проверяются в базе, и
+    промах запоминается в кэше на EXISTENCE_NEGATIVE_TIMEOUT секунд.
+
+    Метки работают, только если кэш общий для воркеров (core.cache);
+    с кэшем в памяти процесса, как и до первой сборки, все ключи
+    проверяются в базе.
+    """
+
+    def __init__(self, name, load_keys):
+        self.name = name
+        self.load_keys = load_keys
+        self._bloom = None
+        self._built_at = 0.0
+
+    def _cache_key(self, kind, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return f'existence:{self.name}:{kind}:{digest}'
+
+    def _current(self):
+        """Фильтр или None, если он не собран или старше двух сборок.
+
+        Метки новых ключей живут две сборки, поэтому более старому
+        фильтру верить нельзя.
+        """
+        age = time.monotonic() - self._built_at
+        if age > 2 * settings.EXISTENCE_FILTER_MAX_AGE:
+            return None
+        return self._bloom
+
+    def rebuild(self):
+        """Собирает фильтр заново по ключам из базы."""
+        # Время до чтения: ключи, созданные во время сборки, есть в метках
+        started = time.monotonic()
+        keys = [str(key) for key in self.load_keys()]
+        # Запас емкости под ключи, созданные до следующей сборки
+        bloom = BloomFilter(
+            2 * len(keys) + 1000, settings.EXISTENCE_FILTER_ERROR_RATE)
+        for key in keys:
+            bloom.add(key)
+        self._bloom = bloom
+        self._built_at = started
+
+    def add(self, key):
+        """Отмечает созданный ключ для этого процесса и для остальных."""
+        key = str(key)
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(key)
+        cache.set(
+            self._cache_key('added', key), True,
+            2 * settings.EXISTENCE_FILTER_MAX_AGE,
+        )
+        self.forget_missing(key)
+
+    def forget_missing(self, key):
+        cache.delete(self._cache_key('missing', str(key)))
+
+    def missing(self, key):
+        """Запоминает, что ключа нет в базе."""
+        if not is_shared():
+            return
+        cache.set(
+            self._cache_key('missing', str(key)), True,
+            settings.EXISTENCE_NEGATIVE_TIMEOUT,
+        )
+
+    def might_exist(self, key):
+        """False, если ключа точно нет; True — нужно спросить базу."""
+        if not is_shared():
+            return True
+        key = str(key)
+        bloom = self._current()
+        if bloom is None or key in bloom:
+            return cache.get(self._cache_key('missing', key)) is None
+        return cache.get(self._cache_key('added', key)) is not None
+
+    def get_or_404(self, key, find, *args, **kwargs):
+        """find(*args, **kwargs), если ключ может существовать, иначе 404.
+
+        Http404 из find запоминается как промах.
+        """
+        if not self.might_exist(key):
+            raise Http404
+        try:
+            return find(*args, **kwargs)
+        except Http404:
+            self.missing(key)
+            raise
+
+
+def _usernames():
+    return User.objects.values_list('username', flat=True).iterator()
+
+
+def _group_slugs():
+    return Group.objects.values_list('slug', flat=True).iterator()
+
+
+def _post_ids():
+    # Архивные посты сохраняют id и открываются по тому же адресу
+    for alias in post_shards():
+        for model in (Post, ArchivedPost):
+            yield from model.objects.using(alias).values_list(
+                'pk', flat=True).iterator()
+
+
+usernames = ExistenceFilter('usernames', _usernames)
+group_slugs = ExistenceFilter('group_slugs', _group_slugs)
+post_ids = ExistenceFilter('post_ids', _post_ids)
+
+
+def _track(existence, field, only_created=False):
+    def receiver(sender, instance, created, using, **kwargs):
+        if only_created and not created:
+            return
+        key = getattr(instance, field)
+        existence.add(key)
+        # Чужой запрос мог запомнить промах до коммита
+        transaction.on_commit(
+            lambda: existence.forget_missing(key), using=using)
+    return receiver
+
+
+_receivers = [
+    (User, _track(usernames, 'username')),
+    (Group, _track(group_slugs, 'slug')),
+    (Post, _track(post_ids, 'pk', only_created=True)),
+]
+
+
+def install():
+    """Подключает пополнение фильтров при сохранении объектов."""
+    for model, receiver in _receivers:
+        post_save.connect(
+            receiver, sender=model, weak=False,
+            dispatch_uid=f'posts.existence.{model._meta.label_lower}',
+        )
+
+
+def refresh_in_background():
+    """Собирает фильтры при старте воркера и раз в MAX_AGE, не в запросах."""
+    def run():
+        while True:
+            for existence in (usernames, group_slugs, post_ids):
+                try:
+                    existence.rebuild()
+                except Exception:
+                    logger.exception(
+                        'Фильтр существования %s не собран', existence.name)
+                finally:
+                    connections.close_all()
+            time.sleep(settings.EXISTENCE_FILTER_MAX_AGE)
+
+    threading.Thread(
+        target=run, name='existence-filters', daemon=True).start()
@@ -0,0 +1,188 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+
+from core.cache import is_shared
+
+from . import holes
+from .models import ArchivedPost, Group, Post
+from .signals import posts_bulk_changed
+
+GENERATION_KEY = 'posts:feed:generation'
+
+# Ключи, которые сейчас вычисляются в этом процессе: ключ -> Event
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def bump_generation(**kwargs):
+    """Делает закэшированные страницы лент устаревшими.
+
+    Другие воркеры увидят новое поколение, только если кэш общий;
+    иначе их страницы устареют за FEED_CACHE_TIMEOUT.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def _bump_now_and_on_commit(sender, using=None, **kwargs):
+    bump_generation()
+    # Запрос, успевший до коммита, мог закэшировать старую ленту
+    transaction.on_commit(bump_generation, using=using)
+
+
+def install():
+    """Подключает сброс кэша лент при изменении постов и групп."""
+    for model in (Post, ArchivedPost, Group):
+        for signal in (post_save, post_delete):
+            signal.connect(
+                _bump_now_and_on_commit, sender=model,
+                dispatch_uid=f'posts.feed_cache.{model._meta.label_lower}',
+            )
+    posts_bulk_changed.connect(
+        bump_generation, dispatch_uid='posts.feed_cache.bulk_changed')
+
+
+def page_key(request):
+    """Ключ страницы ленты: поколение, движок шаблонов, адрес и ?page=.
+
+    Другие параметры запроса лентам не нужны и в ключ не входят, иначе
+    случайными параметрами можно было бы обойти кэш.
+    """
+    generation = cache.get_or_set(GENERATION_KEY, 1, None)
+    address = f'{request.path}?page={request.GET.get("page", "")}'
+    digest = hashlib.blake2b(address.encode(), digest_size=16).hexdigest()
+    return (
+        f'posts:feed:{generation}:{settings.POSTS_TEMPLATE_ENGINE}:{digest}')
+
+
+def single_flight(key, compute, timeout):
+    """Значение из кэша, а при промахе — результат одного вычисления.
+
+    compute сам кладет значение в кэш и возвращает его. Другие потоки
+    процесса ждут вычисляющего на Event, другие воркеры — опрашивают
+    кэш, пока держится замок cache.add; с кэшем в памяти процесса
+    (core.cache.is_shared) замок виден только своему воркеру. Если за
+    timeout значения не появилось, ожидающий вычисляет его сам.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    with _flights_lock:
+        event = _flights.get(key)
+        leader = event is None
+        if leader:
+            event = _flights[key] = threading.Event()
+    if not leader:
+        event.wait(timeout)
+        value = cache.get(key)
+        return value if value is not None else compute()
+    try:
+        return _compute_once(key, compute, timeout)
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        event.set()
+
+
+def _compute_once(key, compute, timeout):
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, True, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(settings.FEED_CACHE_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+            if cache.get(lock_key) is None:
+                break
+        return compute()
+    try:
+        return compute()
+    finally:
+        cache.delete(lock_key)
+
+
+def _cacheable(response):
+    # Ответ с cookie (например, CSRF) нельзя отдавать другим посетителям
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+@contextmanager
+def _as_guest(request, hole_punch=False):
+    """Рендер от имени гостя; с hole_punch — с метками вместо фрагментов."""
+    user = request.user
+    request.user = AnonymousUser()
+    request.hole_punch = hole_punch
+    try:
+        yield
+    finally:
+        request.user = user
+        request.hole_punch = False
+
+
+def cache_feed_page(view):
+    """Кэширует страницы ленты до изменения постов, общие для всех.
+
+    Страница рендерится от имени гостя, а меню пользователя и кнопки
+    лайков оставляются метками (posts.holes). При отдаче метки
+    заполняются фрагментами для текущего пользователя; для гостей
+    заполненная страница хранится в кэше рядом с общей.
+
+    Один и тот же холодный адрес рендерится одним запросом, остальные
+    ждут его результат (single_flight).
+
+    Пока кэш не общий (core.cache.is_shared), сброс по поколению не
+    доходит до других воркеров, и автор мог бы не увидеть свой пост.
+    Поэтому пользователям страница тогда рендерится заново.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET' or (
+            request.user.is_authenticated and not is_shared()
+        ):
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        rendered = []
+
+        def render():
+            with _as_guest(request, hole_punch=True):
+                response = view(request, *args, **kwargs)
+            rendered.append(response)
+            if not _cacheable(response):
+                return None
+            content = response.content.decode(response.charset)
+            with _as_guest(request):
+                guest_content = holes.fill(request, content)
+            page = (content, guest_content, response['Content-Type'])
+            cache.set(key, page, settings.FEED_CACHE_TIMEOUT)
+            return page
+
+        page = single_flight(key, render, settings.FEED_CACHE_LOCK_TIMEOUT)
+        if page is None:
+            response = rendered[0]
+            response.content = holes.fill(
+                request, response.content.decode(response.charset))
+            return response
+        content, guest_content, content_type = page
+        if request.user.is_authenticated:
+            content = holes.fill(request, content)
+        else:
+            content = guest_content
+        return HttpResponse(content, content_type=content_type)
+    return wrapper
@@ -0,0 +1,80 @@
+import re
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.template import engines
+
+from .likes import like_counts, liked_post_ids
+
+# Место для фрагмента пользователя в общей странице из кэша:
+# <!--hole:имя:аргумент:...-->
+HOLE_RE = re.compile(r'<!--hole:(\w+)((?::[\w.-]+)*)-->')
+
+
+def _render(request, template_name, context):
+    template = engines[settings.POSTS_TEMPLATE_ENGINE].get_template(
+        template_name)
+    return template.render(context, request)
+
+
+def _fill_user_nav(request, holes):
+    html = _render(request, 'includes/user_nav.html', {})
+    return {args: html for args in holes}
+
+
+def _fill_likes(request, holes):
+    """Кнопки лайков: состояние пользователя и свежие счетчики.
+
+    Гостю хватает счетчика из самой метки, пользователю нужны два
+    запроса на базу постов: счетчики и его лайки.
+    """
+    post_ids_by_db = {}
+    for using, post_id, _ in holes:
+        post_ids_by_db.setdefault(using, []).append(int(post_id))
+    counts = {}
+    liked = set()
+    if request.user.is_authenticated:
+        for using, post_ids in post_ids_by_db.items():
+            counts.update(like_counts(post_ids, using))
+            liked |= liked_post_ids(request.user, post_ids, using)
+    fragments = {}
+    for args in holes:
+        _, post_id, likes_total = args
+        post_id = int(post_id)
+        post = SimpleNamespace(
+            id=post_id,
+            pk=post_id,
+            is_archived=False,
+            is_liked=post_id in liked,
+            likes_total=counts.get(post_id, int(likes_total)),
+        )
+        fragments[args] = _render(
+            request, 'includes/like.html', {'post': post})
+    return fragments
+
+
+FILLERS = {
+    'user_nav': _fill_user_nav,
+    'like': _fill_likes,
+}
+
+
+def _hole(match):
+    return match.group(1), tuple(match.group(2).split(':')[1:])
+
+
+def fill(request, content):
+    """Заполняет места страницы фрагментами для пользователя запроса.
+
+    Каждый вид фрагментов заполняется одним вызовом, чтобы лайки всех
+    постов страницы читались общими запросами.
+    """
+    holes = {}
+    for match in HOLE_RE.finditer(content):
+        name, args = _hole(match)
+        holes.setdefault(name, set()).add(args)
+    fragments = {}
+    for name, hole_args in holes.items():
+        for args, html in FILLERS[name](request, hole_args).items():
+            fragments[name, args] = html
+    return HOLE_RE.sub(lambda match: fragments[_hole(match)], content)
@@ -0,0 +1,194 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+from PIL import Image, features
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.shortcuts import get_thumbnail
+
+from core.jobs import job
+
+from .imaging import crop_to_ratio, frame_height, load_image
+from .models import Post
+from .sharding import first_in_shards
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIRECTORY = 'variants'
+
+# Тот же кадр, что и у прежней миниатюры 960x339
+FALLBACK_GEOMETRY = '960x339'
+
+FORMATS = (
+    # (расширение, формат Pillow, MIME-тип, параметры сохранения)
+    ('jpg', 'JPEG', 'image/jpeg', {'quality': 80, 'progressive': True}),
+    ('webp', 'WEBP', 'image/webp', {'quality': 75, 'method': 4}),
+)
+
+
+def available_formats():
+    """Форматы вариантов; WebP — если Pillow собран с его поддержкой."""
+    return [
+        item for item in FORMATS
+        if item[1] != 'WEBP' or features.check('webp')
+    ]
+
+
+def variant_name(source_name, width, extension):
+    """Имя варианта картинки: выводится из имени исходника без запросов."""
+    base = posixpath.splitext(source_name)[0]
+    return posixpath.join(VARIANTS_DIRECTORY, base, f'{width}.{extension}')
+
+
+def variant_widths(source_width):
+    """Ширины вариантов не больше исходной; самая узкая есть всегда."""
+    widths = settings.POST_IMAGE_WIDTHS
+    return [width for width in widths if width <= source_width] or [
+        widths[0]]
+
+
+def open_source(file_):
+    """Открывает исходник картинки из хранилища."""
+    file_.open('rb')
+    try:
+        return load_image(file_)
+    finally:
+        file_.close()
+
+
+def render_variant(image, width, image_format, options):
+    """Кодирует вариант нужной ширины и возвращает его байты."""
+    resized = image.resize((width, frame_height(width)), Image.LANCZOS)
+    buffer = BytesIO()
+    resized.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def build_variants(source_name, image):
+    """Сохраняет варианты картинки всех ширин и форматов.
+
+    Имена детерминированы, поэтому готовые варианты не пересоздаются.
+    Возвращает список ширин.
+    """
+    image = crop_to_ratio(image)
+    widths = variant_widths(image.width)
+    for width in widths:
+        for extension, image_format, _, options in available_formats():
+            name = variant_name(source_name, width, extension)
+            if default_storage.exists(name):
+                continue
+            data = render_variant(image, width, image_format, options)
+            saved_name = default_storage.save(name, ContentFile(data))
+            if saved_name != name:
+                # Тот же вариант параллельно сохранил другой обработчик
+                default_storage.delete(saved_name)
+    return widths
+
+
+def delete_variants(source_name):
+    """Удаляет все варианты картинки."""
+    for width in settings.POST_IMAGE_WIDTHS:
+        for extension, *_ in FORMATS:
+            default_storage.delete(variant_name(source_name, width, extension))
+
+
+@job
+def generate_image_variants(post_id):
+    """Фоновая задача: готовит варианты картинки поста.
+
+    Заодно заполняет заглушку у постов, сохраненных до нее.
+    """
+    post = first_in_shards(
+        Post.objects.only('pk', 'image', 'image_placeholder'), pk=post_id)
+    if post is None or not post.image:
+        return
+    image = open_source(post.image)
+    fields = {
+        'image_variants': ','.join(
+            map(str, build_variants(post.image.name, image))),
+    }
+    if not post.image_placeholder:
+        post.set_image_metadata(image)
+        fields['image_placeholder'] = post.image_placeholder
+    # Картинку могли сменить, пока задача ждала в очереди
+    Post.objects.using(post._state.db).filter(
+        pk=post_id, image=post.image.name).update(**fields)
+
+
+def _srcset(source_name, widths, extension):
+    return ', '.join(
+        f'{default_storage.url(variant_name(source_name, width, extension))}'
+        f' {width}w'
+        for width in widths
+    )
+
+
+def _size_attributes(post, width):
+    """Атрибуты размеров и заглушки: страница не прыгает при загрузке.
+
+    Все отдаваемые картинки обрезаны до кадра POST_IMAGE_RATIO, поэтому
+    высота считается по ширине, а размеры исходника не нужны.
+    """
+    attributes = format_html(
+        'width="{}" height="{}"', width, frame_height(width))
+    if post.image_placeholder:
+        attributes += format_html(
+            ' style="background: url({}) center / cover no-repeat"',
+            post.image_placeholder)
+    return attributes
+
+
+def _fallback_image(post, css_class):
+    try:
+        thumbnail = get_thumbnail(
+            post.image, FALLBACK_GEOMETRY, crop='center', upscale=True)
+    except Exception:
+        # Как и тег sorl, не роняем страницу из-за битой картинки
+        if sorl_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Thumbnail function failed')
+        return ''
+    return format_html(
+        '<img class="{}" src="{}" {} loading="lazy" alt="">',
+        css_class, thumbnail.url,
+        _size_attributes(post, settings.POST_IMAGE_RATIO[0]))
+
+
+def post_image(post, css_class='card-img my-2'):
+    """HTML картинки поста с srcset по готовым вариантам.
+
+    Пока варианты не готовы, отдает прежнюю миниатюру sorl. Размеры
+    считаются по кадру, заглушка берется из поля поста, картинка при
+    показе не читается.
+    """
+    if not post.image:
+        return ''
+    if not post.image_variants:
+        return _fallback_image(post, css_class)
+    name = post.image.name
+    widths = [int(width) for width in post.image_variants.split(',')]
+    sizes = settings.POST_IMAGE_SIZES
+    formats = available_formats()
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (mime_type, _srcset(name, widths, extension), sizes)
+            for extension, _, mime_type, _ in formats[1:]
+        ),
+    )
+    fallback_extension = formats[0][0]
+    return format_html(
+        '<picture>{}<img class="{}" src="{}" srcset="{}" sizes="{}" {} '
+        'loading="lazy" alt=""></picture>',
+        sources,
+        css_class,
+        default_storage.url(
+            variant_name(name, widths[-1], fallback_extension)),
+        _srcset(name, widths, fallback_extension),
+        sizes,
+        _size_attributes(post, widths[-1]),
+    )
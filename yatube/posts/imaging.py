@@ -0,0 +1,51 @@
+import base64
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# Размер превью-заглушки; браузер растянет его с размытием
+PLACEHOLDER_WIDTH = 16
+
+
+def load_image(file_):
+    """Читает картинку из открытого файла, учитывая поворот из EXIF."""
+    image = Image.open(file_)
+    image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        # JPEG не умеет прозрачность: кладем картинку на белый фон
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA'))
+        return background
+    return image.convert('RGB')
+
+
+def frame_height(width):
+    """Высота кадра POST_IMAGE_RATIO для заданной ширины."""
+    ratio_width, ratio_height = settings.POST_IMAGE_RATIO
+    return round(width * ratio_height / ratio_width)
+
+
+def crop_to_ratio(image):
+    """Обрезает картинку по центру до пропорций POST_IMAGE_RATIO."""
+    ratio_width, ratio_height = settings.POST_IMAGE_RATIO
+    width, height = image.size
+    target_height = frame_height(width)
+    if target_height <= height:
+        top = (height - target_height) // 2
+        return image.crop((0, top, width, top + target_height))
+    target_width = round(height * ratio_width / ratio_height)
+    left = (width - target_width) // 2
+    return image.crop((left, 0, left + target_width, height))
+
+
+def placeholder_data_uri(image):
+    """Крошечное PNG-превью кадра в виде data URI."""
+    preview = crop_to_ratio(image).resize(
+        (PLACEHOLDER_WIDTH, max(frame_height(PLACEHOLDER_WIDTH), 1)),
+        Image.LANCZOS)
+    buffer = BytesIO()
+    preview.save(buffer, 'PNG', optimize=True)
+    encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return f'data:image/png;base64,{encoded}'
@@ -0,0 +1,152 @@
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import pre_delete
+
+from core.jobs import job
+
+from .models import Like, PostLikeCounter, User
+from .sharding import post_shards
+
+
+def _add_to_counter(post_id, amount, using):
+    """Прибавляет amount к случайному шарду счетчика поста."""
+    shard = random.randrange(settings.POST_LIKE_SHARDS)
+    counters = PostLikeCounter.objects.using(using)
+    updated = counters.filter(
+        post_id=post_id, shard=shard
+    ).update(count=F('count') + amount)
+    if updated:
+        return
+    try:
+        with transaction.atomic(using=using):
+            counters.create(post_id=post_id, shard=shard, count=amount)
+    except IntegrityError:
+        # Шард успели создать параллельно
+        counters.filter(
+            post_id=post_id, shard=shard
+        ).update(count=F('count') + amount)
+
+
+def like_post(user, post_id, using=None):
+    """Ставит лайк; повторный вызов ничего не меняет. True, если поставлен.
+
+    using — база поста, если посты разложены по нескольким базам.
+    """
+    with transaction.atomic(using=using):
+        try:
+            with transaction.atomic(using=using):
+                Like.objects.using(using).create(user=user, post_id=post_id)
+        except IntegrityError:
+            return False
+        _add_to_counter(post_id, 1, using)
+    return True
+
+
+def unlike_post(user, post_id, using=None):
+    """Снимает лайк; повторный вызов ничего не меняет. True, если снят."""
+    with transaction.atomic(using=using):
+        deleted, _ = Like.objects.using(using).filter(
+            user=user, post_id=post_id).delete()
+        if not deleted:
+            return False
+        _add_to_counter(post_id, -1, using)
+    return True
+
+
+def like_counts(post_ids, using=None):
+    """Число лайков для набора постов одним запросом."""
+    counts = dict.fromkeys(post_ids, 0)
+    if not counts:
+        return counts
+    rows = PostLikeCounter.objects.using(using).filter(
+        post_id__in=counts
+    ).values_list('post_id').annotate(total=Sum('count')).order_by()
+    counts.update(rows)
+    return counts
+
+
+def liked_post_ids(user, post_ids, using=None):
+    """Какие из постов понравились пользователю, одним запросом."""
+    if not user.is_authenticated or not post_ids:
+        return set()
+    return set(
+        Like.objects.using(using).filter(
+            user=user, post_id__in=post_ids
+        ).values_list('post_id', flat=True)
+    )
+
+
+def attach_likes(posts, user):
+    """Проставляет постам likes_total и is_liked.
+
+    Возвращает список постов: страницу пагинатора нужно заменить им,
+    иначе шаблон заново выполнит запрос и атрибуты потеряются. Лайки
+    лежат в базе поста, поэтому запросы идут в каждую базу страницы.
+    """
+    posts = list(posts)
+    post_ids_by_db = {}
+    for post in posts:
+        if not post.is_archived:
+            post_ids_by_db.setdefault(post._state.db, []).append(post.pk)
+    counts = {}
+    liked = set()
+    for using, post_ids in post_ids_by_db.items():
+        counts.update(like_counts(post_ids, using))
+        liked |= liked_post_ids(user, post_ids, using)
+    for post in posts:
+        if post.is_archived:
+            # У архивных постов лайки заморожены числом
+            post.likes_total = post.likes_count
+            post.is_liked = False
+            continue
+        post.likes_total = counts[post.pk]
+        post.is_liked = post.pk in liked
+    return posts
+
+
+@job
+def recount_likes(post_ids, using=None):
+    """Пересчитывает счетчики лайков постов по строкам Like.
+
+    Шарды счетчика поста заменяются одним с точным числом. Строки
+    счетчиков блокируются до подсчета, поэтому лайк, поставленный во
+    время пересчета, не теряется.
+    """
+    with transaction.atomic(using=using):
+        counters = PostLikeCounter.objects.using(using).filter(
+            post_id__in=post_ids)
+        list(counters.select_for_update().values_list('pk', flat=True))
+        totals = dict(
+            Like.objects.using(using).filter(post_id__in=post_ids)
+            .values_list('post_id').annotate(total=Count('pk')).order_by()
+        )
+        counters.delete()
+        PostLikeCounter.objects.using(using).bulk_create(
+            PostLikeCounter(post_id=post_id, shard=0, count=total)
+            for post_id, total in totals.items()
+        )
+
+
+def _user_deleted(sender, instance, using, **kwargs):
+    # Лайки пользователя удаляются каскадом мимо unlike_post, а счетчики
+    # их постов остаются прежними: пересчитываем их после коммита
+    for alias in post_shards():
+        post_ids = list(
+            Like.objects.using(alias).filter(user_id=instance.pk)
+            .values_list('post_id', flat=True)
+        )
+        if post_ids:
+            transaction.on_commit(
+                lambda post_ids=post_ids, alias=alias: recount_likes.delay(
+                    post_ids, alias),
+                using=using,
+            )
+
+
+def install():
+    """Подключает пересчет счетчиков лайков после каскадных удалений."""
+    pre_delete.connect(
+        _user_deleted, sender=User, dispatch_uid='posts.likes.user_deleted')
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Group, Post, User
+from posts.moderation import BATCH_SIZE
+
+
+class ModerationCommand(BaseCommand):
+    """Общие параметры команд модерации: выборка постов и размер пачки."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--author', action='append', default=[],
+            help='Имя автора; можно указать несколько раз.')
+        parser.add_argument(
+            '--group', help='Адрес (slug) группы, из которой брать посты.')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько постов менять в одной транзакции.')
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза между пачками в секундах.')
+
+    def get_group(self, slug):
+        try:
+            return Group.objects.get(slug=slug)
+        except Group.DoesNotExist:
+            raise CommandError(f'Группа {slug} не найдена.')
+
+    def get_queryset(self, options):
+        if not options['author'] and not options['group']:
+            raise CommandError('Укажите --author и/или --group.')
+        queryset = Post.objects.all()
+        if options['author']:
+            authors = User.objects.filter(username__in=options['author'])
+            missing = set(options['author']) - set(
+                authors.values_list('username', flat=True))
+            if missing:
+                raise CommandError(
+                    'Авторы не найдены: ' + ', '.join(sorted(missing)))
+            # Список, а не подзапрос: посты могут лежать в других базах
+            queryset = queryset.filter(author__in=list(authors))
+        if options['group']:
+            queryset = queryset.filter(group=self.get_group(options['group']))
+        return queryset
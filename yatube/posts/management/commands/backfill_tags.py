@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post, PostTag
+from posts.sharding import post_shards
+from posts.tags import extract_tags
+from posts.utils import iter_pk_batches
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает хештеги в уже сохраненных постах и создает недостающие '
+        'связи с тегами. Повторный запуск ничего не дублирует.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Сколько постов обрабатывать за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        processed = linked = 0
+        queryset = Post.objects.filter(text__contains='#')
+        for using in post_shards():
+            for pks in iter_pk_batches(
+                    queryset.using(using), options['batch_size']):
+                posts = Post.objects.using(using).filter(pk__in=pks).only(
+                    'pk', 'text', 'pub_date')
+                with transaction.atomic(using=using):
+                    linked += PostTag.objects.using(using).link(
+                        (post, extract_tags(post.text)) for post in posts)
+                processed += len(pks)
+                self.stdout.write(
+                    f'Обработано постов: {processed}, '
+                    f'новых связей: {linked}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {processed} постов, {linked} связей за '
+            f'{time.perf_counter() - started:.2f} с'))
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts.images import (available_formats, open_source, render_variant,
+                          variant_widths)
+from posts.imaging import crop_to_ratio
+from posts.models import Post
+
+# Экраны для сравнения: ширина окна в CSS-пикселях и плотность пикселей
+DEFAULT_VIEWPORTS = '360x3,390x2,768x2,1280x1,1920x1'
+
+
+def parse_viewports(value):
+    viewports = []
+    for item in value.split(','):
+        width, _, dpr = item.partition('x')
+        viewports.append((int(width), float(dpr or 1)))
+    return viewports
+
+
+def pick_width(widths, viewport_width, dpr):
+    """Ширина, которую браузер выберет из srcset при sizes из настроек."""
+    display_width = min(viewport_width, settings.POST_IMAGE_RATIO[0])
+    needed = display_width * dpr
+    for width in widths:
+        if width >= needed:
+            return width
+    return widths[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает, сколько байт картинок на страницу экономят варианты '
+        'с srcset и WebP по сравнению с одной миниатюрой 960x339.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=50,
+            help='Сколько картинок постов взять для замера.')
+        parser.add_argument(
+            '--viewports', default=DEFAULT_VIEWPORTS,
+            help='Экраны через запятую в виде ширинаxплотность.')
+
+    def handle(self, *args, **options):
+        posts = list(
+            Post.objects.exclude(image='').only('pk', 'image')
+            .order_by('-pk')[:options['limit']])
+        if not posts:
+            raise CommandError('В базе нет постов с картинками.')
+        viewports = parse_viewports(options['viewports'])
+        extension, image_format, _, variant_options = available_formats()[-1]
+        baseline_width = settings.POST_IMAGE_RATIO[0]
+        baseline = 0
+        chosen = dict.fromkeys(viewports, 0)
+        for post in posts:
+            image = crop_to_ratio(open_source(post.image))
+            baseline += len(render_variant(
+                image, baseline_width, 'JPEG',
+                {'quality': sorl_settings.THUMBNAIL_QUALITY}))
+            widths = variant_widths(image.width)
+            sizes = {}
+            for viewport in viewports:
+                width = pick_width(widths, *viewport)
+                if width not in sizes:
+                    sizes[width] = len(render_variant(
+                        image, width, image_format, variant_options))
+                chosen[viewport] += sizes[width]
+        self.stdout.write(
+            f'Картинок: {len(posts)}, миниатюры 960x339 JPEG: '
+            f'{baseline / 1024:.1f} КБ')
+        for (width, dpr), total in chosen.items():
+            self.stdout.write(
+                f'Экран {width}px x{dpr:g}, {extension}: '
+                f'{total / 1024:.1f} КБ, экономия '
+                f'{(1 - total / baseline) * 100:.0f}%')
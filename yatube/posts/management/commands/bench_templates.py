@@ -0,0 +1,94 @@
+import re
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.test import RequestFactory
+
+from posts.likes import attach_likes
+from posts.models import Group, Post
+from posts.utils import paginator_util
+
+ENGINES = ('django', 'jinja2')
+
+# Маскированный CSRF-токен меняется при каждом рендере
+CSRF_VALUE_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*"')
+
+
+def normalize_html(html):
+    """Схлопывает пробельные символы: движки по-разному расставляют отступы."""
+    return CSRF_VALUE_RE.sub(r'\1"', ' '.join(html.split()))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендера лент постов движками Django и Jinja2 '
+        'на одинаковом контексте и проверяет, что HTML совпадает.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=100,
+            help='Сколько раз рендерить каждую страницу.')
+
+    def get_pages(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        post = Post.objects.select_related('author', 'group').first()
+        if post is None:
+            raise CommandError('В базе нет постов для замера.')
+        pages = [
+            ('posts/index.html', {
+                'page_obj': paginator_util(Post.objects.for_feed(), request),
+            }),
+            ('posts/profile.html', {
+                'author': post.author,
+                'page_obj': paginator_util(
+                    post.author.posts.for_feed(), request),
+            }),
+        ]
+        group = post.group or Group.objects.first()
+        if group is not None:
+            pages.append(('posts/group_list.html', {
+                'group': group,
+                'page_obj': paginator_util(group.posts.for_feed(), request),
+            }))
+        for _, context in pages:
+            page_obj = context['page_obj']
+            page_obj.object_list = attach_likes(
+                page_obj.object_list, request.user)
+        return request, pages
+
+    def render(self, engine, template_name, context, request):
+        template = engines[engine].get_template(template_name)
+        return template.render(dict(context), request)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        request, pages = self.get_pages()
+        for template_name, context in pages:
+            # Первый рендер прогревает ленивые связи объектов на странице
+            outputs = {
+                engine: self.render(engine, template_name, context, request)
+                for engine in ENGINES
+            }
+            variants = {normalize_html(html) for html in outputs.values()}
+            if len(variants) != 1:
+                raise CommandError(
+                    f'{template_name}: HTML движков отличается.')
+            timings = {}
+            for engine in ENGINES:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    self.render(engine, template_name, context, request)
+                timings[engine] = (time.perf_counter() - start) / repeat
+            self.stdout.write(
+                f'{template_name}: '
+                + ', '.join(
+                    f'{engine} {timings[engine] * 1000:.2f} мс'
+                    for engine in ENGINES
+                )
+                + f', ускорение x{timings["django"] / timings["jinja2"]:.2f}'
+            )
+        self.stdout.write(self.style.SUCCESS('HTML движков совпадает.'))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.images import generate_image_variants
+from posts.models import Post
+from posts.sharding import post_shards
+from posts.utils import iter_pk_batches
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит варианты картинок постов разной ширины в JPEG и WebP '
+        'для постов, у которых их еще нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Поставить задачи в очередь run_workers, а не делать сразу.')
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько постов выбирать за один запрос.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        queryset = Post.objects.exclude(image='').filter(image_variants='')
+        processed = 0
+        for using in post_shards():
+            for pks in iter_pk_batches(
+                    queryset.using(using), options['batch_size']):
+                for pk in pks:
+                    if options['enqueue']:
+                        generate_image_variants.delay(pk)
+                    else:
+                        generate_image_variants(pk)
+                processed += len(pks)
+                self.stdout.write(f'Обработано постов: {processed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {processed} постов за '
+            f'{time.perf_counter() - started:.2f} с'))
@@ -0,0 +1,61 @@
+import time
+
+from posts.media import (SCAN_BATCH_SIZE, delete_kv_entry,
+                         kvstore_is_scannable, scan_stale_kv_batches)
+
+from .gc_images import Command as GcImagesCommand
+
+
+class Command(GcImagesCommand):
+    help = (
+        'Потоково обходит MEDIA_ROOT/posts и удаляет картинки без постов '
+        'с их миниатюрами, затем чистит записи sorl о пропавших файлах. '
+        'Работает пачками и подходит для миллионов файлов.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--batch-size', type=int, default=SCAN_BATCH_SIZE,
+            help='Сколько файлов или записей KV проверять за раз.')
+        parser.add_argument(
+            '--skip-kv', action='store_true',
+            help='Не чистить KV-хранилище sorl.')
+
+    def report_progress(self, stats):
+        self.stdout.write(
+            f'Проверено файлов: {stats["stored"]}, '
+            f'без ссылок: {stats["deleted"]} '
+            f'({time.perf_counter() - self.started:.1f} с)')
+
+    def clean_kvstore(self, options):
+        checked = stale = 0
+        for count, images in scan_stale_kv_batches(options['batch_size']):
+            checked += count
+            stale += len(images)
+            for image in images:
+                if options['dry_run']:
+                    self.stdout.write(f'Устаревшая запись KV: {image.name}')
+                else:
+                    delete_kv_entry(image)
+            self.stdout.write(
+                f'Проверено записей KV: {checked}, устаревших: {stale}')
+        return checked, stale
+
+    def handle(self, *args, **options):
+        self.started = time.perf_counter()
+        stats = self.clean_images(options, options['batch_size'])
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {stats["stored"]}. {verb} без ссылок: '
+            f'{stats["deleted"]} ({stats["freed"] / 1024:.1f} КБ)'))
+        if options['skip_kv']:
+            return
+        if not kvstore_is_scannable():
+            self.stderr.write(
+                'KV-хранилище sorl не в базе: его чистит '
+                'manage.py thumbnail cleanup.')
+            return
+        checked, stale = self.clean_kvstore(options)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей KV: {checked}. {verb} устаревших: {stale}'))
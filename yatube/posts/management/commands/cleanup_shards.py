@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.cascades import BATCH_SIZE, delete_orphans
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из баз постов строки, которые ссылаются на удаленных '
+        'пользователей, группы и теги: между базами СУБД связи не '
+        'проверяет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько различных ссылок проверять за раз.')
+
+    def handle(self, *args, **options):
+        stats = delete_orphans(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            'Убраны ссылки на удаленные объекты: ' + ', '.join(
+                f'{name}: {count}' for name, count in stats.items())))
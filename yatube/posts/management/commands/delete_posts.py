@@ -0,0 +1,15 @@
+from posts.moderation import delete_posts
+
+from ._moderation import ModerationCommand
+
+
+class Command(ModerationCommand):
+    help = 'Удаляет посты автора и/или группы пачками.'
+
+    def handle(self, *args, **options):
+        result = delete_posts(
+            self.get_queryset(options),
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+        )
+        self.stdout.write(self.style.SUCCESS(str(result)))
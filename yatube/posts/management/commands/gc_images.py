@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.media import (SCAN_BATCH_SIZE, delete_unused_image,
+                         scan_image_batches)
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые не ссылается ни один пост, '
+        'вместе с их миниатюрами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.')
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд: пост с только '
+                 'что загруженной картинкой может быть еще не сохранен.')
+
+    def report_progress(self, stats):
+        """Вызывается после каждой пачки файлов."""
+
+    def clean_images(self, options, batch_size=SCAN_BATCH_SIZE):
+        threshold = (
+            timezone.now() - timedelta(seconds=options['min_age'])
+        ).timestamp()
+        stats = dict.fromkeys(
+            ('stored', 'used', 'shared', 'deleted', 'freed'), 0)
+        for batch in scan_image_batches(batch_size):
+            for name, stat, refs in batch:
+                stats['stored'] += 1
+                if refs:
+                    stats['used'] += 1
+                    stats['shared'] += refs > 1
+                    continue
+                if stat.st_mtime > threshold:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(f'Будет удален: {name}')
+                elif not delete_unused_image(name, threshold):
+                    continue
+                stats['deleted'] += 1
+                stats['freed'] += stat.st_size
+            self.report_progress(stats)
+        return stats
+
+    def handle(self, *args, **options):
+        stats = self.clean_images(options)
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {stats["stored"]}, используемых: {stats["used"]}, '
+            f'общих для нескольких постов: {stats["shared"]}. '
+            f'{verb}: {stats["deleted"]} ({stats["freed"] / 1024:.1f} КБ)'))
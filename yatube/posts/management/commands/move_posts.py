@@ -0,0 +1,32 @@
+from django.core.management.base import CommandError
+
+from posts.moderation import move_to_group
+
+from ._moderation import ModerationCommand
+
+
+class Command(ModerationCommand):
+    help = 'Переносит посты автора и/или группы в другую группу пачками.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument(
+            '--to-group', help='Адрес (slug) группы, куда перенести посты.')
+        target.add_argument(
+            '--no-group', action='store_true',
+            help='Убрать посты из групп.')
+
+    def handle(self, *args, **options):
+        if not options['to_group'] and not options['no_group']:
+            raise CommandError('Укажите --to-group или --no-group.')
+        group = None
+        if options['to_group']:
+            group = self.get_group(options['to_group'])
+        result = move_to_group(
+            self.get_queryset(options),
+            group,
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+        )
+        self.stdout.write(self.style.SUCCESS(str(result)))
@@ -0,0 +1,114 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from posts.models import ArchivedPost, Like, Post, PostLikeCounter, PostTag
+from posts.sharding import (
+    last_post_id, post_shards, reserve_post_ids, shard_for_author,
+)
+from posts.utils import bump_archive_generation, iter_pk_batches
+
+# Строки, которые переезжают вместе с постом; id у них свой в каждой базе
+POST_ROWS = (Like, PostLikeCounter, PostTag)
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты авторов в базы, которые им назначает POST_SHARDS, '
+        'вместе с лайками, счетчиками и тегами. Запускать после изменения '
+        'POST_SHARDS; повторный запуск ничего не дублирует.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drain', action='append', default=[],
+            help='База, убранная из POST_SHARDS, из которой нужно забрать '
+                 'посты; можно указать несколько раз.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов переносить в одной транзакции.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько постов куда переедет.')
+
+    def handle(self, *args, **options):
+        sources = post_shards()
+        for alias in options['drain']:
+            if alias not in connections:
+                raise CommandError(f'База {alias} не описана в DATABASES.')
+            if alias not in sources:
+                sources.append(alias)
+        started = time.perf_counter()
+        if not options['dry_run']:
+            reserve_post_ids(last_post_id(sources))
+        moved = moved_archived = 0
+        for source in sources:
+            for author_id in self.author_ids(source):
+                target = shard_for_author(author_id)
+                if target == source:
+                    continue
+                if options['dry_run']:
+                    count = Post.objects.using(source).filter(
+                        author_id=author_id).count()
+                    self.stdout.write(
+                        f'Автор {author_id}: {source} → {target}, '
+                        f'постов: {count}')
+                    continue
+                posts, archived = self.move_author(
+                    author_id, source, target, options['batch_size'])
+                moved += posts
+                moved_archived += archived
+                self.stdout.write(
+                    f'Автор {author_id}: {source} → {target}, постов: '
+                    f'{posts}, архивных: {archived}')
+        if moved_archived:
+            bump_archive_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: перенесено постов {moved}, архивных {moved_archived} '
+            f'за {time.perf_counter() - started:.2f} с'))
+
+    def author_ids(self, alias):
+        author_ids = set()
+        for model in (Post, ArchivedPost):
+            author_ids.update(
+                model.objects.using(alias).order_by().values_list(
+                    'author_id', flat=True).distinct())
+        return sorted(author_ids)
+
+    def move_author(self, author_id, source, target, batch_size):
+        """Копирует посты автора в target и удаляет их из source.
+
+        Сначала копия, потом удаление: при сбое между ними пост окажется
+        в двух базах, а не потеряется, и повторный запуск доведет перенос.
+        """
+        moved = 0
+        queryset = Post.objects.using(source).filter(author_id=author_id)
+        for pks in iter_pk_batches(queryset, batch_size):
+            with transaction.atomic(using=target):
+                Post.objects.using(target).bulk_create(
+                    Post.objects.using(source).filter(pk__in=pks),
+                    ignore_conflicts=True)
+                for model in POST_ROWS:
+                    rows = list(
+                        model.objects.using(source).filter(post_id__in=pks))
+                    for row in rows:
+                        row.pk = None
+                    model.objects.using(target).bulk_create(
+                        rows, ignore_conflicts=True)
+            with transaction.atomic(using=source):
+                Post.objects.using(source).filter(pk__in=pks).delete()
+            moved += len(pks)
+        archived = 0
+        queryset = ArchivedPost.objects.using(source).filter(
+            author_id=author_id)
+        for pks in iter_pk_batches(queryset, batch_size):
+            with transaction.atomic(using=target):
+                ArchivedPost.objects.using(target).bulk_create(
+                    ArchivedPost.objects.using(source).filter(pk__in=pks),
+                    ignore_conflicts=True)
+            with transaction.atomic(using=source):
+                ArchivedPost.objects.using(source).filter(
+                    pk__in=pks).delete()
+            archived += len(pks)
+        return moved, archived
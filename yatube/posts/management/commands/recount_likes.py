@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts.likes import recount_likes
+from posts.models import Post, User
+from posts.sharding import post_shards
+from posts.utils import iter_pk_batches
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики лайков постов по отметкам «нравится».'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--author', action='append', default=[],
+            help='Имя автора; можно указать несколько раз. '
+                 'Без него — все посты.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов пересчитывать в одной транзакции.')
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.all()
+        if options['author']:
+            # Список, а не подзапрос: посты могут лежать в других базах
+            queryset = queryset.filter(author_id__in=list(
+                User.objects.filter(username__in=options['author'])
+                .values_list('pk', flat=True)))
+        recounted = 0
+        for using in post_shards():
+            for post_ids in iter_pk_batches(
+                    queryset.using(using), options['batch_size']):
+                recount_likes(post_ids, using)
+                recounted += len(post_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитаны счетчики лайков постов: {recounted}'))
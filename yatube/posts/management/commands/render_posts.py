@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.sharding import post_shards
+from posts.utils import iter_pk_batches
+
+RENDERED_FIELDS = ('text_html', 'excerpt_html')
+
+
+class Command(BaseCommand):
+    help = 'Заполняет HTML текста и анонса у постов, сохраненных без него.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать HTML у всех постов, а не только у пустых.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов обновлять за один запрос.')
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(text_html='')
+        started = time.perf_counter()
+        rendered = 0
+        for using in post_shards():
+            posts_in_db = Post.objects.using(using)
+            for pks in iter_pk_batches(
+                    queryset.using(using), options['batch_size']):
+                posts = list(
+                    posts_in_db.filter(pk__in=pks).only('pk', 'text'))
+                for post in posts:
+                    post.render_text()
+                posts_in_db.bulk_update(posts, RENDERED_FIELDS)
+                rendered += len(posts)
+                self.stdout.write(f'Обработано постов: {rendered}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {rendered} постов за '
+            f'{time.perf_counter() - started:.2f} с'))
@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import is_shared
+from posts.warmup import hot_feed_urls, warm_urls
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогревает кэш лент после деплоя или сброса кэша: рендерит '
+        'первые страницы главной, самых больших групп и самых читаемых '
+        'авторов через обычный стек middleware в несколько потоков. '
+        'Нужен кэш, общий с воркерами сайта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=settings.WARM_CACHE_PAGES,
+            help='Сколько первых страниц каждой ленты прогревать.')
+        parser.add_argument(
+            '--groups', type=int, default=settings.WARM_CACHE_GROUPS,
+            help='Сколько групп с наибольшим числом постов прогревать.')
+        parser.add_argument(
+            '--profiles', type=int, default=settings.WARM_CACHE_PROFILES,
+            help='Сколько авторов с наибольшим числом просмотров прогревать.')
+        parser.add_argument(
+            '--workers', type=int, default=settings.WARM_CACHE_WORKERS,
+            help='Сколько страниц рендерить одновременно.')
+
+    def handle(self, *args, **options):
+        if not is_shared():
+            # Кэш в памяти этой команды пропадет вместе с ней
+            raise CommandError(
+                'Кэш в памяти процесса не виден воркерам сайта: настройте '
+                'общий кэш (YATUBE_CACHE_BACKEND) или включите '
+                'WARM_CACHE_ON_STARTUP.')
+        started = time.perf_counter()
+        urls = hot_feed_urls(
+            options['pages'], options['groups'], options['profiles'])
+        statuses = warm_urls(urls, options['workers'])
+        for url, status in statuses.items():
+            self.stdout.write(f'{status} {url}')
+        failed = sum(status != 200 for status in statuses.values())
+        message = (
+            f'Прогрето адресов: {len(statuses) - failed} из {len(statuses)} '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(message))
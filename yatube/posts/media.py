@@ -0,0 +1,139 @@
+import os
+import posixpath
+from itertools import islice
+
+from django.db.models import Count
+from django.utils.module_loading import import_string
+from sorl.thumbnail import default
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from .images import delete_variants
+from .models import ArchivedPost, Post
+from .sharding import post_shards
+
+IMAGE_FIELD = Post._meta.get_field('image')
+
+SCAN_BATCH_SIZE = 1000
+
+# Только это KV-хранилище sorl (и его наследники) лежит в таблице, которую
+# можно читать пачками
+DB_KVSTORE = 'sorl.thumbnail.kvstores.cached_db_kvstore.KVStore'
+
+
+def batched(iterable, size):
+    """Делит поток на списки по size элементов."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def image_file(name):
+    """Файл поля Post.image по имени, с хранилищем этого поля."""
+    return IMAGE_FIELD.attr_class(None, IMAGE_FIELD, name)
+
+
+def image_refcounts(names):
+    """Сколько постов, в том числе архивных, ссылается на каждый из файлов."""
+    counts = dict.fromkeys(names, 0)
+    for using in post_shards():
+        for model in (Post, ArchivedPost):
+            rows = model.objects.using(using).filter(
+                image__in=list(counts)
+            ).values_list('image').annotate(refs=Count('pk')).order_by()
+            for name, refs in rows:
+                counts[name] += refs
+    return counts
+
+
+def scan_images(directory=None):
+    """Потоково обходит каталог картинок постов через os.scandir.
+
+    Отдает пары (имя в хранилище, stat) и не держит в памяти список
+    всех файлов: только стек еще не открытых каталогов.
+    """
+    storage = IMAGE_FIELD.storage
+    pending = [directory or IMAGE_FIELD.upload_to.rstrip('/')]
+    while pending:
+        current = pending.pop()
+        try:
+            entries = os.scandir(storage.path(current))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = posixpath.join(current, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name, entry.stat(follow_symlinks=False)
+
+
+def scan_image_batches(batch_size=SCAN_BATCH_SIZE):
+    """Пачки [(имя, stat, число ссылок)]: по два запроса на базу постов."""
+    for batch in batched(scan_images(), batch_size):
+        refcounts = image_refcounts(name for name, _ in batch)
+        yield [(name, stat, refcounts[name]) for name, stat in batch]
+
+
+def delete_unused_image(name, threshold):
+    """Удаляет картинку, если ссылок все еще нет и она не новее threshold.
+
+    Между пачкой проверок и удалением файл мог снова понадобиться:
+    загрузка того же содержимого обновляет его время изменения, а пост
+    мог уже сохранить ссылку. Возвращает True, если файл удален.
+    """
+    storage = IMAGE_FIELD.storage
+    try:
+        if os.stat(storage.path(name)).st_mtime > threshold:
+            return False
+    except FileNotFoundError:
+        return False
+    if image_refcounts([name])[name]:
+        return False
+    delete_image(name)
+    return True
+
+
+def delete_image(name):
+    """Удаляет файл картинки, ее варианты, миниатюры и записи sorl о них."""
+    delete_with_thumbnails(image_file(name), delete_file=True)
+    delete_variants(name)
+
+
+def kvstore_is_scannable():
+    return issubclass(
+        import_string(sorl_settings.THUMBNAIL_KVSTORE),
+        import_string(DB_KVSTORE))
+
+
+def scan_stale_kv_batches(batch_size=SCAN_BATCH_SIZE):
+    """Пачки записей sorl о картинках и миниатюрах, которых нет на диске.
+
+    Таблица KV читается по ключу пачками, поэтому удаление найденных
+    записей между пачками обход не сбивает. Отдает пары
+    (сколько записей проверено, [ImageFile без файла]).
+    """
+    prefix = add_prefix('', 'image')
+    last_key = ''
+    while True:
+        rows = list(
+            KVStore.objects.filter(key__startswith=prefix, key__gt=last_key)
+            .order_by('key').values_list('key', 'value')[:batch_size]
+        )
+        if not rows:
+            return
+        last_key = rows[-1][0]
+        images = [deserialize_image_file(value) for _, value in rows]
+        yield len(rows), [image for image in images if not image.exists()]
+
+
+def delete_kv_entry(image):
+    """Удаляет запись sorl вместе со ссылками на миниатюры и их файлами."""
+    default.kvstore.delete(image)
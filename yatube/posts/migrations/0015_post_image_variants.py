@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_image_content_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.CharField(blank=True, editable=False, help_text='Через запятую; заполняет фоновая задача', max_length=50, verbose_name='Ширины вариантов картинки'),
+        ),
+    ]
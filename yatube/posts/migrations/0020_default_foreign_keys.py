@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, migrations
+
+# Ссылки из таблиц постов на общие таблицы. В модели они объявлены без
+# ограничений СУБД: в других базах постов нет таблиц пользователей,
+# групп и тегов. Но в default все они есть, и там ограничения остаются.
+# SQLite пересоздает таблицу при многих изменениях схемы по состоянию
+# модели, поэтому такие миграции этих таблиц должны повторять
+# add_constraints
+FOREIGN_KEYS = (
+    ('post', 'author'),
+    ('post', 'group'),
+    ('archivedpost', 'author'),
+    ('archivedpost', 'group'),
+    ('like', 'user'),
+    ('posttag', 'tag'),
+)
+
+
+def _fields(apps):
+    for model_name, field_name in FOREIGN_KEYS:
+        model = apps.get_model('posts', model_name)
+        yield model, model._meta.get_field(field_name)
+
+
+def _set_constraint(schema_editor, model, field, db_constraint):
+    new_field = field.clone()
+    new_field.db_constraint = db_constraint
+    new_field.set_attributes_from_name(field.name)
+    new_field.model = model
+    new_field.remote_field.model = field.remote_field.model
+    new_field.remote_field.field_name = field.remote_field.field_name
+    schema_editor.alter_field(model, field, new_field)
+    # SQLite пересоздает таблицу по полям модели: следующее поле той же
+    # таблицы не должно потерять уже добавленное ограничение
+    field.db_constraint = db_constraint
+
+
+def _delete_orphans(apps):
+    # Без этого ограничение не добавится к таблице со старыми сиротами
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Group = apps.get_model('posts', 'Group')
+    Tag = apps.get_model('posts', 'Tag')
+    users = User.objects.values('pk')
+    for name in ('Post', 'ArchivedPost'):
+        model = apps.get_model('posts', name)
+        model.objects.exclude(author_id__in=users).delete()
+        model.objects.exclude(group_id=None).exclude(
+            group_id__in=Group.objects.values('pk')).update(group_id=None)
+    apps.get_model('posts', 'Like').objects.exclude(
+        user_id__in=users).delete()
+    apps.get_model('posts', 'PostTag').objects.exclude(
+        tag_id__in=Tag.objects.values('pk')).delete()
+
+
+def add_constraints(apps, schema_editor):
+    if schema_editor.connection.alias != DEFAULT_DB_ALIAS:
+        return
+    _delete_orphans(apps)
+    for model, field in _fields(apps):
+        _set_constraint(schema_editor, model, field, True)
+
+
+def remove_constraints(apps, schema_editor):
+    if schema_editor.connection.alias != DEFAULT_DB_ALIAS:
+        return
+    fields = list(_fields(apps))
+    for _, field in fields:
+        field.db_constraint = True
+    for model, field in fields:
+        _set_constraint(schema_editor, model, field, False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0019_drop_image_size'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_constraints, remove_constraints),
+    ]
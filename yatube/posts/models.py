@@ -1,8 +1,22 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction
+from django.template.defaultfilters import linebreaks_filter
+from django.utils.html import linebreaks
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from core.jobs import enqueue
+
+from .imaging import load_image, placeholder_data_uri
+from .sharding import allocate_post_id, is_sharded, shard_for_author
+from .storage import ContentAddressedStorage
+from .tags import add_log_scores, extract_tags, link_tags, use_weight
 
 User = get_user_model()
 
+IMAGE_METADATA_FIELDS = ('image_variants', 'image_placeholder')
+
 
 class Group(models.Model):
     """Задает название, описание группы, ссылку в адресной строке"""
@@ -18,23 +32,86 @@ class Group(models.Model):
         return f' {self.title}'
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: без полного текста, с автором и группой.
+
+        При равной дате порядок задает id: иначе курсор подгрузки ленты
+        мог бы пропустить или повторить посты одной секунды. Постам без
+        готового анонса (до render_posts) начало текста для анонса
+        приходит тем же запросом.
+        """
+        table = self.model._meta.db_table
+        # extra, а не annotate: с аннотацией count() пагинатора стал бы
+        # подзапросом с полным обходом таблицы
+        queryset = self.defer('text', 'text_html').extra(select={
+            'excerpt_text': (
+                f"CASE WHEN {table}.excerpt_html = '' "
+                f'THEN SUBSTR({table}.text, 1, %s) ELSE NULL END'
+            ),
+        }, select_params=[settings.POST_EXCERPT_LENGTH + 1]).order_by(
+            '-pub_date', '-pk')
+        if self.db == DEFAULT_DB_ALIAS:
+            return queryset.select_related('author', 'group')
+        # В других базах нет таблиц пользователей и групп
+        return queryset.prefetch_related('author', 'group')
+
+
+class RenderedTextMixin:
+    """Готовый HTML текста для постов и архивных постов."""
+    # Архивный пост только для чтения: без лайков и редактирования
+    is_archived = False
+
+    @property
+    def rendered_text(self):
+        if self.text_html:
+            return mark_safe(self.text_html)
+        return linebreaks_filter(self.text)
+
+    @property
+    def rendered_excerpt(self):
+        if self.excerpt_html:
+            return mark_safe(self.excerpt_html)
+        # В лентах текст отложен, а его начало лежит в excerpt_text
+        text = self.__dict__.get('excerpt_text')
+        if text is None:
+            text = self.text
+        return linebreaks_filter(
+            Truncator(text).chars(settings.POST_EXCERPT_LENGTH))
+
+
+class Post(RenderedTextMixin, models.Model):
     """Задает текст поста, дату публикации, автора и группу"""
     text = models.TextField(
         verbose_name='Содержание записи',
         help_text='Введите текст поста')
+    text_html = models.TextField(
+        'HTML записи',
+        blank=True,
+        editable=False
+    )
+    excerpt_html = models.TextField(
+        'HTML анонса',
+        blank=True,
+        editable=False
+    )
     pub_date = models.DateTimeField(
         auto_now_add=True,
+        db_index=True,
         verbose_name='Дата публикации')
+    # Пост может лежать не в той базе, что автор и группа (см. sharding);
+    # в default ограничения СУБД добавляет миграция 0020
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name='posts',
         verbose_name='Автор публикации'
     )
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
+        db_constraint=False,
         related_name='posts',
         blank=True,
         null=True,
@@ -44,10 +121,32 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_variants = models.CharField(
+        'Ширины вариантов картинки',
+        max_length=50,
+        blank=True,
+        editable=False,
+        help_text='Через запятую; заполняет фоновая задача'
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        editable=False,
+        help_text='Крошечное превью в data URI, видно до загрузки картинки'
+    )
     # Аргумент upload_to указывает директорию,
     # в которую будут загружаться пользовательские файлы.
+    views = models.PositiveIntegerField(
+        'Просмотры',
+        default=0,
+        db_index=True,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = 'Посты'
@@ -56,3 +155,308 @@ class Post(models.Model):
 
     def __str__(self):
         return self.text[:15]
+
+    @property
+    def db_alias(self):
+        """База, из которой загружен пост: в шаблонах _state недоступен."""
+        return self._state.db
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        text_changed = update_fields is None or 'text' in update_fields
+        if text_changed:
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'text_html', 'excerpt_html'}
+        # Новая загрузка еще не записана в хранилище
+        image_uploaded = bool(self.image) and not self.image._committed
+        if image_uploaded:
+            self.read_image_metadata()
+        elif not self.image:
+            self.set_image_metadata(None)
+        if image_uploaded and update_fields is not None:
+            kwargs['update_fields'] = {
+                *kwargs['update_fields'], *IMAGE_METADATA_FIELDS}
+        if self._state.adding and is_sharded():
+            # Новый пост пишется в базу автора, id общий для всех баз
+            kwargs['using'] = shard_for_author(self.author_id)
+            if self.pk is None:
+                self.pk = allocate_post_id()
+        using = kwargs.get('using') or router.db_for_write(
+            Post, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if text_changed:
+                self.sync_tags()
+            if image_uploaded:
+                transaction.on_commit(lambda: enqueue(
+                    'posts.images.generate_image_variants', [self.pk]),
+                    using=using)
+
+    def read_image_metadata(self):
+        """Считает заглушку новой картинки один раз, при записи."""
+        upload = self.image.file
+        upload.seek(0)
+        try:
+            image = load_image(upload)
+        except (OSError, ValueError):
+            # Не картинка: форма ImageField такое не пропустит
+            image = None
+        finally:
+            upload.seek(0)
+        self.set_image_metadata(image)
+
+    def set_image_metadata(self, image):
+        self.image_variants = ''
+        self.image_placeholder = (
+            '' if image is None else placeholder_data_uri(image))
+
+    def render_text(self):
+        """Готовит HTML текста и анонса, чтобы не считать их при показе."""
+        excerpt = Truncator(self.text).chars(settings.POST_EXCERPT_LENGTH)
+        self.text_html = link_tags(linebreaks(self.text, autoescape=True))
+        self.excerpt_html = link_tags(linebreaks(excerpt, autoescape=True))
+
+    def sync_tags(self):
+        """Приводит связи с тегами в соответствие с текстом."""
+        names = extract_tags(self.text)
+        post_tags = PostTag.objects.using(self._state.db)
+        tag_ids = Tag.objects.filter(name__in=names).values_list(
+            'pk', flat=True)
+        post_tags.filter(post=self).exclude(tag_id__in=list(tag_ids)).delete()
+        post_tags.link([(self, names)])
+
+
+class Like(models.Model):
+    """Отметка «нравится» пользователя на посте"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name='likes',
+        verbose_name='Пользователь'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        verbose_name='Пост'
+    )
+    created = models.DateTimeField('Дата', auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'Отметки «нравится»'
+        verbose_name = 'Отметка «нравится»'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_like'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} → {self.post_id}'
+
+
+class PostLikeCounter(models.Model):
+    """Часть счетчика лайков поста.
+
+    Лайки популярного поста пишутся в разные строки-шарды, чтобы
+    обновления не ждали блокировку одной строки. Итог — сумма шардов;
+    отдельный шард может уйти в минус, если снятие попало не в тот шард,
+    где лайк считался.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='like_counters',
+        verbose_name='Пост'
+    )
+    shard = models.PositiveSmallIntegerField('Шард')
+    count = models.IntegerField('Лайков', default=0)
+
+    class Meta:
+        verbose_name_plural = 'Счетчики лайков'
+        verbose_name = 'Счетчик лайков'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'shard'], name='unique_like_counter_shard'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}/{self.shard}: {self.count}'
+
+
+class TagQuerySet(models.QuerySet):
+    def for_names(self, names):
+        """Теги по именам; недостающие создаются."""
+        names = set(names)
+        self.bulk_create(
+            [Tag(name=name) for name in names], ignore_conflicts=True)
+        return {tag.name: tag for tag in self.filter(name__in=names)}
+
+    def record_uses(self, uses):
+        """Добавляет к оценкам трендов использования {id тега: [даты]}."""
+        with transaction.atomic():
+            tags = list(self.select_for_update().filter(pk__in=uses))
+            for tag in tags:
+                tag.score = add_log_scores(
+                    tag.score, map(use_weight, uses[tag.pk]))
+            self.bulk_update(tags, ['score'])
+
+    def trending(self, limit=None):
+        """Теги, которые чаще всего использовали в последнее время."""
+        return self.filter(score__isnull=False).order_by('-score')[
+            :limit or settings.TRENDING_TAGS_COUNT]
+
+
+class Tag(models.Model):
+    """Хештег из текста постов, в нижнем регистре"""
+    name = models.CharField('Тег', max_length=50, unique=True)
+    score = models.FloatField(
+        'Оценка популярности',
+        null=True,
+        db_index=True,
+        editable=False,
+        help_text='Логарифм суммы весов использований, '
+                  'вес удваивается за TAGS_TRENDING_HALF_LIFE'
+    )
+
+    objects = TagQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'Теги'
+        verbose_name = 'Тег'
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostTagQuerySet(models.QuerySet):
+    def link(self, posts_with_names):
+        """Создает недостающие связи для пар (пост, имена тегов).
+
+        Новые связи учитываются в трендах по дате публикации поста,
+        поэтому заполнение старых постов почти не влияет на тренды.
+        """
+        posts_with_names = [
+            (post, names) for post, names in posts_with_names if names]
+        if not posts_with_names:
+            return 0
+        tags = Tag.objects.for_names(
+            name for _, names in posts_with_names for name in names)
+        existing = set(self.filter(
+            post__in=[post for post, _ in posts_with_names]
+        ).values_list('post_id', 'tag_id'))
+        new_links = []
+        uses = {}
+        for post, names in posts_with_names:
+            for name in names:
+                tag = tags[name]
+                if (post.pk, tag.pk) in existing:
+                    continue
+                new_links.append(
+                    PostTag(post=post, tag=tag, pub_date=post.pub_date))
+                uses.setdefault(tag.pk, []).append(post.pub_date)
+        self.bulk_create(new_links, ignore_conflicts=True)
+        if uses:
+            Tag.objects.record_uses(uses)
+        return len(new_links)
+
+
+class PostTag(models.Model):
+    """Тег поста; дата публикации скопирована для ленты тега по индексу"""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='Пост'
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name='post_tags',
+        verbose_name='Тег'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    objects = PostTagQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'Теги постов'
+        verbose_name = 'Тег поста'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'tag'], name='unique_post_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-pub_date']),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} #{self.tag_id}'
+
+
+class PostId(models.Model):
+    """Счетчик id постов, когда они лежат в нескольких базах.
+
+    У каждой базы свой автоинкремент, а id поста должен быть общим:
+    по нему строятся ссылки и ищется пост.
+    """
+
+    class Meta:
+        verbose_name_plural = 'Счетчик id постов'
+        verbose_name = 'id поста'
+
+
+class ArchivedPost(RenderedTextMixin, models.Model):
+    """Старый пост, перенесенный из posts_post командой archive_posts.
+
+    Хранит копию поста с тем же id, поэтому ссылки на пост не меняются.
+    Лайки замораживаются числом, связи с тегами не переносятся.
+    """
+    is_archived = True
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField('Содержание записи')
+    text_html = models.TextField('HTML записи', blank=True)
+    excerpt_html = models.TextField('HTML анонса', blank=True)
+    pub_date = models.DateTimeField('Дата публикации', db_index=True)
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name='archived_posts',
+        verbose_name='Автор публикации'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        related_name='archived_posts',
+        blank=True,
+        null=True,
+        verbose_name='Название группы'
+    )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        storage=ContentAddressedStorage(),
+        blank=True
+    )
+    image_variants = models.CharField(
+        'Ширины вариантов картинки', max_length=50, blank=True)
+    image_placeholder = models.TextField('Заглушка картинки', blank=True)
+    views = models.PositiveIntegerField('Просмотры', default=0)
+    likes_count = models.IntegerField('Лайков при переносе', default=0)
+    archived_at = models.DateTimeField('Перенесен в архив', auto_now_add=True)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'Архивные посты'
+        verbose_name = 'Архивный пост'
+        ordering = ['-pub_date']
+
+    def __str__(self):
+        return self.text[:15]
@@ -0,0 +1,117 @@
+import time
+
+from django.db import transaction
+
+from .likes import like_counts
+from .models import ArchivedPost, Post
+from .sharding import post_shards
+from .signals import posts_bulk_changed
+from .utils import bump_archive_generation, iter_pk_batches
+
+# Поля, которые копируются в архив как есть
+ARCHIVED_FIELDS = (
+    'id', 'text', 'text_html', 'excerpt_html', 'pub_date', 'author_id',
+    'group_id', 'image', 'image_variants', 'image_placeholder', 'views',
+)
+
+BATCH_SIZE = 500
+
+
+class ModerationResult:
+    """Итог массовой операции: сколько постов и за сколько секунд."""
+
+    def __init__(self, action):
+        self.action = action
+        self.rows = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.author_ids = set()
+        self.group_ids = set()
+
+    @property
+    def rate(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (
+            f'{self.action}: {self.rows} постов за {self.seconds:.2f} с '
+            f'({self.rate:.0f} постов/с, пачек: {self.batches})'
+        )
+
+
+def _run_in_batches(action, queryset, apply, batch_size, pause,
+                    target_group=None):
+    result = ModerationResult(action)
+    if target_group is not None:
+        result.group_ids.add(target_group.pk)
+    # Выборка применяется к каждой базе постов по очереди
+    for using in post_shards():
+        for pks in iter_pk_batches(queryset.using(using), batch_size):
+            # Короткая транзакция на пачку: между пачками пишут другие
+            with transaction.atomic(using=using):
+                batch = Post.objects.using(using).filter(pk__in=pks)
+                for author_id, group_id in batch.values_list(
+                        'author_id', 'group_id'):
+                    result.author_ids.add(author_id)
+                    result.group_ids.add(group_id)
+                result.rows += apply(batch)
+            result.batches += 1
+            if pause:
+                time.sleep(pause)
+    result.group_ids.discard(None)
+    result.seconds = time.perf_counter() - result.started
+    if result.rows:
+        posts_bulk_changed.send(
+            sender=Post,
+            author_ids=result.author_ids,
+            group_ids=result.group_ids,
+        )
+    return result
+
+
+def move_to_group(queryset, group, batch_size=BATCH_SIZE, pause=0):
+    """Переносит посты в группу (или убирает из групп, если group=None)."""
+    return _run_in_batches(
+        'Перенос в группу',
+        queryset,
+        lambda batch: batch.update(group=group),
+        batch_size,
+        pause,
+        target_group=group,
+    )
+
+
+def delete_posts(queryset, batch_size=BATCH_SIZE, pause=0):
+    """Удаляет посты пачками вместе со связанными строками."""
+    def apply(batch):
+        _, deleted = batch.delete()
+        return deleted.get(Post._meta.label, 0)
+    return _run_in_batches('Удаление', queryset, apply, batch_size, pause)
+
+
+def delete_by_authors(author_ids, batch_size=BATCH_SIZE, pause=0):
+    """Удаляет все посты указанных авторов."""
+    return delete_posts(
+        Post.objects.filter(author_id__in=author_ids), batch_size, pause)
+
+
+def archive_posts(queryset, batch_size=BATCH_SIZE, pause=0):
+    """Переносит посты в архивную таблицу пачками.
+
+    Лайки сохраняются числом, связи с тегами и отметки удаляются вместе
+    с исходными постами.
+    """
+    def apply(batch):
+        rows = list(batch.values(*ARCHIVED_FIELDS))
+        likes = like_counts([row['id'] for row in rows], batch.db)
+        ArchivedPost.objects.using(batch.db).bulk_create(
+            ArchivedPost(likes_count=likes[row['id']], **row)
+            for row in rows
+        )
+        batch.delete()
+        return len(rows)
+    result = _run_in_batches('Архивация', queryset, apply, batch_size, pause)
+    if result.rows:
+        bump_archive_generation()
+    return result
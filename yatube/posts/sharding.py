@@ -0,0 +1,150 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import (
+    DEFAULT_DB_ALIAS, IntegrityError, connections, transaction,
+)
+from django.db.models import Max
+
+# Модели, строки которых лежат в базе автора поста. Пользователи, группы
+# и теги общие и хранятся в default
+SHARDED_MODELS = {'post', 'like', 'postlikecounter', 'posttag', 'archivedpost'}
+
+# Модели со ссылкой author: их база определяется по автору
+AUTHOR_MODELS = {'post', 'archivedpost'}
+
+
+def post_shards():
+    return list(settings.POST_SHARDS)
+
+
+def is_sharded():
+    """Лежат ли посты больше чем в одной базе."""
+    return len(settings.POST_SHARDS) > 1
+
+
+def _weight(alias, author_id):
+    digest = hashlib.blake2b(
+        f'{alias}:{author_id}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def shard_for_author(author_id):
+    """База, в которой лежат посты автора.
+
+    Rendezvous-хеширование: при добавлении базы к ней переезжает лишь
+    ее доля авторов, остальные остаются на месте.
+    """
+    shards = post_shards()
+    if len(shards) == 1:
+        return shards[0]
+    return max(shards, key=lambda alias: _weight(alias, author_id))
+
+
+def is_sharded_model(model):
+    return (
+        model._meta.app_label == 'posts'
+        and model._meta.model_name in SHARDED_MODELS
+    )
+
+
+def first_in_shards(queryset, **lookup):
+    """Первый объект по условию, с обходом всех баз постов по очереди."""
+    for alias in post_shards():
+        obj = queryset.using(alias).filter(**lookup).first()
+        if obj is not None:
+            return obj
+    return None
+
+
+def last_post_id(aliases=None):
+    """Наибольший id поста, в том числе архивного, по базам постов."""
+    from .models import ArchivedPost, Post
+    last_id = 0
+    for alias in post_shards() if aliases is None else aliases:
+        for model in (Post, ArchivedPost):
+            value = model.objects.using(alias).aggregate(
+                last=Max('pk'))['last']
+            last_id = max(last_id, value or 0)
+    return last_id
+
+
+def allocate_post_id():
+    """Общий для всех баз id нового поста.
+
+    Пустой счетчик, например сразу после включения шардинга, сначала
+    сдвигается за id уже существующих постов.
+    """
+    from .models import PostId
+    if not PostId.objects.exists():
+        last_id = last_post_id()
+        if last_id:
+            try:
+                with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                    reserve_post_ids(last_id)
+            except IntegrityError:
+                # Счетчик одновременно сдвинул другой процесс
+                pass
+    ticket = PostId.objects.create()
+    PostId.objects.filter(pk__lt=ticket.pk).delete()
+    return ticket.pk
+
+
+def reserve_post_ids(last_id):
+    """Сдвигает счетчик id постов, чтобы он не выдал уже занятые id."""
+    from .models import PostId
+    current = PostId.objects.order_by('-pk').values_list(
+        'pk', flat=True).first()
+    if current is not None and current >= last_id:
+        return
+    PostId.objects.create(pk=last_id)
+    # SQLite сдвигает счетчик сам, другим СУБД нужен сброс последовательности
+    connection = connections[DEFAULT_DB_ALIAS]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [PostId]):
+            cursor.execute(sql)
+    PostId.objects.filter(pk__lt=last_id).delete()
+
+
+class PostShardRouter:
+    """Раскладывает посты и их лайки, счетчики и теги по базам авторов.
+
+    Остальные модели живут в default. Внешние ключи на общие таблицы
+    объявлены без ограничений СУБД: в других базах этих таблиц нет.
+    В default ограничения добавляет миграция 0020, а удаление
+    пользователей, групп и тегов в другие базы переносит posts.cascades.
+    """
+
+    def _db_for(self, model, hints):
+        if not is_sharded_model(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if instance._state.db and is_sharded_model(instance.__class__):
+            return instance._state.db
+        name = model._meta.model_name
+        if name in AUTHOR_MODELS:
+            if isinstance(instance, get_user_model()):
+                return shard_for_author(instance.pk)
+            if instance.__class__ is model and instance.author_id:
+                return shard_for_author(instance.author_id)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if any(is_sharded_model(obj.__class__) for obj in (obj1, obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS:
+            return None
+        return app_label == 'posts' and model_name in SHARDED_MODELS
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Отправляется после массовых UPDATE/DELETE постов, которые обходят
+# сигналы отдельных объектов: получатели сбрасывают кэши и пересчитывают
+# счетчики для затронутых авторов и групп.
+posts_bulk_changed = Signal(providing_args=['author_ids', 'group_ids'])
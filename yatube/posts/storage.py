@@ -0,0 +1,77 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+UPLOAD_PREFIX = '.upload-'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — sha256 его содержимого.
+
+    Файл пишется во временный, хеш считается по ходу записи; затем файл
+    переименовывается в <каталог>/<2 символа хеша>/<хеш><расширение>.
+    Одинаковые загрузки попадают в один файл, поэтому у них общие и
+    миниатюры sorl. Файлы удаляет только команда gc_images.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя выбирает _save, совпадение имен означает дубликат
+        return name
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is None:
+            os.makedirs(directory, exist_ok=True)
+            return
+        old_umask = os.umask(0)
+        try:
+            os.makedirs(
+                directory, self.directory_permissions_mode, exist_ok=True)
+        finally:
+            os.umask(old_umask)
+
+    def _touch(self, path):
+        """Обновляет время изменения дубликата; False, если файла нет.
+
+        Старый файл без ссылок мог стать кандидатом gc_images, а сейчас
+        на него сошлется новый пост: свежее время защищает его --min-age.
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        temp_directory = self.path(directory)
+        self._makedirs(temp_directory)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(
+            dir=temp_directory, prefix=UPLOAD_PREFIX, suffix=extension)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:2], hexdigest + extension)
+            full_path = self.path(name)
+            if self._touch(full_path):
+                os.remove(temp_path)
+            else:
+                self._makedirs(os.path.dirname(full_path))
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
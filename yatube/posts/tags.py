@@ -0,0 +1,63 @@
+import math
+import re
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.urls import reverse
+
+TAG_MAX_LENGTH = 50
+
+TAG_RE = re.compile(r'(?<![\w&#])#(\w+)')
+
+# Точка отсчета для весов трендов; менять нельзя, иначе сравнятся
+# несопоставимые оценки
+SCORE_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def normalize_tag(name):
+    return name.casefold()
+
+
+def is_valid_tag(name):
+    return len(name) <= TAG_MAX_LENGTH and not name.replace('_', '').isdigit()
+
+
+def extract_tags(text):
+    """Нормализованные хештеги текста в порядке появления, без повторов."""
+    names = {}
+    for match in TAG_RE.finditer(text):
+        name = normalize_tag(match.group(1))
+        if is_valid_tag(name):
+            names.setdefault(name, None)
+    return list(names)
+
+
+def link_tags(html):
+    """Превращает хештеги в готовом HTML в ссылки на ленту тега."""
+    def replace(match):
+        name = normalize_tag(match.group(1))
+        if not is_valid_tag(name):
+            return match.group(0)
+        url = reverse('posts:tag_posts', kwargs={'name': name})
+        return f'<a href="{url}">{match.group(0)}</a>'
+    return TAG_RE.sub(replace, html)
+
+
+def use_weight(when):
+    """Логарифм веса использования тега в момент when.
+
+    Вес растет вдвое за TAGS_TRENDING_HALF_LIFE. Это то же самое, что
+    затухание старых использований, но хранимые оценки не нужно
+    пересчитывать со временем: свежие использования просто весят больше.
+    """
+    seconds = (when - SCORE_EPOCH).total_seconds()
+    return seconds / settings.TAGS_TRENDING_HALF_LIFE * math.log(2)
+
+
+def add_log_scores(score, weights):
+    """Логарифм суммы exp(score) и exp(weight) без переполнения."""
+    values = list(weights)
+    if score is not None:
+        values.append(score)
+    top = max(values)
+    return top + math.log(sum(math.exp(value - top) for value in values))
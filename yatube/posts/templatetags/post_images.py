@@ -0,0 +1,11 @@
+from django import template
+
+from ..images import post_image as render_post_image
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image(post, css_class='card-img my-2'):
+    """Картинка поста с srcset, sizes и loading="lazy"."""
+    return render_post_image(post, css_class)
@@ -0,0 +1,65 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='Behemoth',
+            email='behemoth@yatube.ru',
+            password='primus',
+        )
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {number}',
+                slug=f'group-{number}',
+                description='Тестовое описание',
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def create_posts(self, count):
+        for number in range(count):
+            author = User.objects.create_user(
+                username=f'author-{Post.objects.count()}')
+            Post.objects.create(
+                text=f'Тестовый пост {number}',
+                author=author,
+                group=self.groups[number % len(self.groups)],
+            )
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(
+                reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_depend_on_rows(self):
+        """Число запросов списка постов не растет с числом строк."""
+        self.create_posts(2)
+        few_rows = self.changelist_queries()
+        self.create_posts(10)
+        many_rows = self.changelist_queries()
+        self.assertEqual(many_rows, few_rows)
+
+    def test_change_form_does_not_list_all_users_and_groups(self):
+        """В форме поста автор и группа выбираются без полного списка."""
+        self.create_posts(1)
+        post = Post.objects.get()
+        response = self.admin_client.get(
+            reverse('admin:posts_post_change', args=(post.pk,)))
+        content = response.content.decode()
+        self.assertIn('vForeignKeyRawIdAdminField', content)
+        self.assertIn('admin-autocomplete', content)
+        self.assertNotIn(self.groups[-1].title, content)
@@ -0,0 +1,116 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..likes import like_post
+from ..models import ArchivedPost, Group, Like, Post, PostTag, User
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Annushka')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Архив',
+            slug='archive',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        now = timezone.now()
+        for number in range(15):
+            post = Post.objects.create(
+                text=f'Пост {number} #масло',
+                author=self.author,
+                group=self.group,
+            )
+            # Первые восемь постов старые
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(days=400 - number))
+            if number >= 8:
+                Post.objects.filter(pk=post.pk).update(
+                    pub_date=now - timedelta(days=15 - number))
+        self.old_post = Post.objects.order_by('pub_date').first()
+        like_post(self.reader, self.old_post.pk)
+        self.feed_order = list(Post.objects.values_list('pk', flat=True))
+
+    def archive(self):
+        call_command('archive_posts', older_than=180, stdout=StringIO())
+
+    def feed_ids(self, url):
+        ids = []
+        for page in (1, 2):
+            response = self.reader_client.get(url, {'page': page})
+            ids.extend(post.pk for post in response.context['page_obj'])
+        return ids
+
+    def test_old_posts_move_to_archive(self):
+        """Старые посты переносятся с тем же id, лайки замораживаются."""
+        self.archive()
+        self.assertEqual(Post.objects.count(), 7)
+        self.assertEqual(ArchivedPost.objects.count(), 8)
+        archived = ArchivedPost.objects.get(pk=self.old_post.pk)
+        self.assertEqual(archived.text, self.old_post.text)
+        self.assertEqual(archived.likes_count, 1)
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(PostTag.objects.count(), 7)
+
+    def test_feeds_continue_into_archive(self):
+        """Ленты после архивации показывают посты в прежнем порядке."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}),
+        )
+        before = {url: self.feed_ids(url) for url in urls}
+        self.archive()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.feed_ids(url), before[url])
+                self.assertEqual(before[url], self.feed_order)
+
+    def test_first_page_does_not_read_archive_rows(self):
+        """Пока хватает горячих постов, из архива берется только число."""
+        old_ids = list(
+            Post.objects.order_by('pub_date').values_list('pk', flat=True))
+        Post.objects.filter(pk__in=old_ids[:3]).update(
+            pub_date=timezone.now())
+        self.archive()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, 15)
+        self.assertFalse(any(post.is_archived for post in page))
+        archive_queries = [
+            query['sql'] for query in queries
+            if ArchivedPost._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(archive_queries), 1)
+        self.assertIn('COUNT(', archive_queries[0])
+
+    def test_post_detail_resolves_archived_post(self):
+        """Архивный пост открывается по старому адресу, но без лайков."""
+        self.archive()
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.old_post.pk})
+        response = self.reader_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['post'].is_archived)
+        self.assertEqual(response.context['post'].likes_total, 1)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        like_url = reverse(
+            'posts:post_like', kwargs={'post_id': self.old_post.pk})
+        self.assertEqual(self.reader_client.post(like_url).status_code, 404)
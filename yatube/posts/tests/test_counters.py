@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import ViewCounter
+from ..models import Post, User
+
+
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Koroviev')
+        cls.post = Post.objects.create(text='Первый пост', author=cls.user)
+        cls.post_2 = Post.objects.create(text='Второй пост', author=cls.user)
+
+    def setUp(self):
+        self.counter = ViewCounter()
+        patcher = mock.patch('posts.views.view_counter', self.counter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def view(self, post, times=1):
+        for _ in range(times):
+            self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+
+    def test_views_are_buffered_until_flush(self):
+        """Просмотры копятся в памяти и пишутся в базу одной пачкой."""
+        self.view(self.post, 3)
+        self.view(self.post_2, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.counter.flush(), 4)
+        updates = [
+            query for query in queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 2)
+        self.post.refresh_from_db()
+        self.post_2.refresh_from_db()
+        self.assertEqual((self.post.views, self.post_2.views), (3, 1))
+
+    @override_settings(POST_VIEWS_FLUSH_INTERVAL=0)
+    def test_views_are_flushed_after_interval(self):
+        """По истечении интервала просмотры записываются сами."""
+        self.view(self.post, 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 2)
+
+    def test_post_detail_shows_pending_views(self):
+        """На странице поста учтены еще не записанные просмотры."""
+        self.view(self.post, 2)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(response.context['views'], 3)
+
+    def test_popular_orders_by_views(self):
+        """Популярные посты отсортированы по числу просмотров."""
+        self.view(self.post, 1)
+        self.view(self.post_2, 2)
+        self.counter.flush()
+        response = self.client.get(reverse('posts:popular'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.post_2, self.post])
+        self.assertContains(response, 'Просмотров: 2')
+
+    @override_settings(POSTS_TEMPLATE_ENGINE='jinja2')
+    def test_popular_in_jinja(self):
+        """Популярные посты рендерятся выбранным движком шаблонов."""
+        self.view(self.post, 1)
+        self.counter.flush()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:popular'))
+        self.assertContains(response, 'Просмотров: 1')
+        self.assertContains(
+            response, reverse('posts:post_like', args=[self.post.pk]))
@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..existence import BloomFilter, group_slugs, post_ids, usernames
+from ..models import Group, Post, User
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+class BloomFilterTests(TestCase):
+    def test_no_false_negatives(self):
+        """Добавленные ключи всегда найдены, ложных «есть» мало."""
+        bloom = BloomFilter(1000, 0.01)
+        for number in range(1000):
+            bloom.add(f'user{number}')
+        self.assertTrue(
+            all(f'user{number}' in bloom for number in range(1000)))
+        false_positives = sum(
+            f'other{number}' in bloom for number in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class ExistenceFilterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Annushka')
+        cls.group = Group.objects.create(
+            title='Масло',
+            slug='oil',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(text='Разлила', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        for existence in (usernames, group_slugs, post_ids):
+            existence.rebuild()
+
+    def test_missing_objects_cost_no_queries(self):
+        """Заведомо несуществующие адреса отвечают 404 без запросов."""
+        for url in (
+            reverse('posts:profile', args=['nobody']),
+            reverse('posts:profile_feed', args=['nobody']),
+            reverse('posts:group_list', args=['no-such-group']),
+            reverse('posts:post_detail', args=[10 ** 9]),
+        ):
+            with self.subTest(url=url), self.assertNumQueries(0):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertTemplateUsed(response, 'core/404.html')
+
+    def test_existing_objects_are_found(self):
+        """Существующие объекты открываются как раньше."""
+        for url in (
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_new_objects_are_found(self):
+        """Созданные после сборки фильтра объекты не теряются."""
+        User.objects.create_user(username='Berlioz')
+        url = reverse('posts:profile', args=['Berlioz'])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Фильтр другого воркера, собранный до создания: помогает метка
+        with mock.patch.object(usernames, '_bloom', BloomFilter(10, 0.01)):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_filters_are_not_built_in_requests(self):
+        """Без собранного фильтра ключи проверяются в базе."""
+        with mock.patch.object(usernames, '_bloom', None):
+            url = reverse('posts:profile', args=['nobody'])
+            with self.assertNumQueries(1):
+                self.assertEqual(self.client.get(url).status_code, 404)
+            self.assertIsNone(usernames._bloom)
+
+    @override_settings(CACHES=LOCAL_CACHES)
+    def test_process_local_cache(self):
+        """С кэшем в памяти процесса фильтр не отказывает без базы."""
+        User.objects.create_user(username='Berlioz')
+        url = reverse('posts:profile', args=['Berlioz'])
+        # Фильтр и метки другого воркера не знают о новом пользователе
+        with mock.patch.object(usernames, '_bloom', BloomFilter(10, 0.01)):
+            cache.clear()
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_misses_are_cached(self):
+        """Промах из базы запоминается, пока объект не создадут снова."""
+        url = reverse('posts:profile', args=['Woland'])
+        user = User.objects.create_user(username='Woland')
+        user.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        User.objects.create_user(username='Woland')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_username_check(self):
+        """Проверка логина при регистрации отвечает из фильтра."""
+        url = reverse('users:username_check')
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'username': 'Margarita'})
+        self.assertEqual(response.json(), {'available': True})
+        response = self.client.get(url, {'username': self.user.username})
+        self.assertEqual(response.json(), {'available': False})
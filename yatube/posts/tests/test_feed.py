@@ -0,0 +1,119 @@
+import re
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from yatube.settings import POSTS_PER_PAGE
+
+from ..models import Group, Post, User
+from ..utils import decode_cursor, encode_cursor
+
+CURSOR = re.compile(r'data-next-cursor="([^"]+)"')
+
+
+class FeedFragmentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Annushka')
+        cls.group = Group.objects.create(
+            title='Масло',
+            slug='oil',
+            description='Тестовое описание',
+        )
+        now = timezone.now()
+        for number in range(POSTS_PER_PAGE * 2 + 5):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group)
+            # Пары постов с одинаковой датой проверяют сравнение по id
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(days=300 - number // 2))
+        cls.feed_order = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def walk(self, page_url, fragment_url):
+        """id постов первой страницы и всех подгруженных фрагментов."""
+        response = self.client.get(page_url)
+        ids = [post.pk for post in response.context['page_obj']]
+        cursor = CURSOR.search(response.content.decode()).group(1)
+        fragments = 0
+        while cursor:
+            response = self.client.get(fragment_url, {'after': cursor})
+            self.assertEqual(response.status_code, 200)
+            ids.extend(post.pk for post in response.context['posts'])
+            cursor = response.get('X-Next-Cursor')
+            fragments += 1
+        self.assertEqual(fragments, 2)
+        return ids
+
+    def test_fragments_continue_feeds(self):
+        """Фрагменты продолжают ленты без пропусков и повторов."""
+        username = self.author.username
+        for page_url, fragment_url in (
+            (reverse('posts:index'), reverse('posts:index_feed')),
+            (
+                reverse('posts:group_list', args=[self.group.slug]),
+                reverse('posts:group_feed', args=[self.group.slug]),
+            ),
+            (
+                reverse('posts:profile', args=[username]),
+                reverse('posts:profile_feed', args=[username]),
+            ),
+        ):
+            with self.subTest(page_url=page_url):
+                self.assertEqual(
+                    self.walk(page_url, fragment_url), self.feed_order)
+
+    def test_fragments_reach_archive(self):
+        """После горячих постов фрагменты отдают архивные."""
+        call_command('archive_posts', older_than=295, stdout=StringIO())
+        self.assertEqual(
+            self.walk(reverse('posts:index'), reverse('posts:index_feed')),
+            self.feed_order)
+
+    def test_fragment_renders_only_cards(self):
+        """Фрагмент содержит только карточки из общего шаблона."""
+        cursor = encode_cursor(Post.objects.get(pk=self.feed_order[0]))
+        for engine in ('django', 'jinja2'):
+            with self.subTest(engine=engine), override_settings(
+                    POSTS_TEMPLATE_ENGINE=engine):
+                response = self.client.get(
+                    reverse('posts:profile_feed', args=['Annushka']),
+                    {'after': cursor})
+                content = response.content.decode()
+                self.assertNotIn('<html', content)
+                self.assertEqual(
+                    content.count('<article>'), POSTS_PER_PAGE)
+                self.assertTrue(content.lstrip().startswith('<hr>'))
+                self.assertIn('Все записи группы', content)
+                self.assertNotIn('Автор:', content)
+                self.assertIn(
+                    'name="next" value="/profile/Annushka/"', content)
+
+    def test_bad_cursor(self):
+        """Испорченный курсор — ошибка 400."""
+        response = self.client.get(
+            reverse('posts:index_feed'), {'after': 'абв_1'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_round_trip(self):
+        """Курсор точно восстанавливает дату и id поста."""
+        post = Post.objects.get(pk=self.feed_order[-1])
+        self.assertEqual(
+            decode_cursor(encode_cursor(post)), (post.pub_date, post.pk))
+
+    def test_last_page_has_no_cursor(self):
+        """На последней странице подгружать нечего."""
+        response = self.client.get(reverse('posts:index'), {'page': 3})
+        self.assertNotIn('data-next-cursor', response.content.decode())
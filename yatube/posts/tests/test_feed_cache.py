@@ -0,0 +1,154 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+
+from ..feed_cache import single_flight
+from ..likes import like_post
+from ..models import Group, Post, User
+
+
+class FeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Annushka')
+        cls.reader = User.objects.create_user(username='Berlioz')
+        cls.post = Post.objects.create(
+            text='Разлила масло', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_guest_pages_are_cached(self):
+        """Повторная страница ленты для гостя не ходит в базу."""
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+
+    def test_post_changes_reset_cache(self):
+        """Новый пост сразу виден в ленте."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(text='Трамвай', author=self.user)
+        self.assertContains(self.client.get(url), 'Трамвай')
+
+    def test_logged_in_pages_share_cache(self):
+        """Пользователи получают общую страницу со своими фрагментами."""
+        url = reverse('posts:index')
+        like_post(self.reader, self.post.pk)
+        reader = Client()
+        reader.force_login(self.reader)
+        author = Client()
+        author.force_login(self.user)
+        reader.get(url)
+        # Сессия, пользователь, счетчики и лайки пользователя
+        with self.assertNumQueries(4):
+            response = reader.get(url)
+        self.assertContains(response, 'Пользователь: Berlioz')
+        self.assertContains(
+            response, reverse('posts:post_unlike', args=[self.post.pk]))
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, '<!--hole:')
+        response = author.get(url)
+        self.assertContains(response, 'Пользователь: Annushka')
+        self.assertContains(
+            response, reverse('posts:post_like', args=[self.post.pk]))
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Войти')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, '<!--hole:')
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_logged_in_pages_without_shared_cache(self):
+        """С кэшем в памяти процесса пользователь видит свежую ленту."""
+        url = reverse('posts:index')
+        author = Client()
+        author.force_login(self.user)
+        author.get(url)
+        # Пост, созданный в другом воркере: поколение здесь не сменилось
+        with mock.patch('posts.feed_cache.bump_generation'):
+            Post.objects.create(text='Трамвай', author=self.user)
+        self.assertContains(author.get(url), 'Трамвай')
+
+    @override_settings(POSTS_TEMPLATE_ENGINE='jinja2')
+    def test_jinja_holes(self):
+        """Места для фрагментов работают и в шаблонах Jinja."""
+        reader = Client()
+        reader.force_login(self.reader)
+        url = reverse('posts:profile', args=['Annushka'])
+        self.client.get(url)
+        response = reader.get(url)
+        self.assertContains(response, 'Пользователь: Berlioz')
+        self.assertContains(
+            response, reverse('posts:post_like', args=[self.post.pk]))
+        self.assertNotContains(response, '<!--hole:')
+
+    def test_single_flight(self):
+        """Одновременные промахи по ключу вычисляют значение один раз."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            cache.set('flight', 'готово')
+            return 'готово'
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    single_flight('flight', compute, 5)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['готово'] * 5)
+
+
+class WarmCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='Annushka')
+        group = Group.objects.create(
+            title='Масло', slug='oil', description='Тестовое описание')
+        for number in range(15):
+            Post.objects.create(
+                text=f'Пост {number}', author=author, group=group,
+                views=number)
+
+    def test_warm_cache(self):
+        """Команда прогревает первые страницы горячих лент."""
+        out = StringIO()
+        call_command(
+            'warm_cache', pages=2, groups=1, profiles=1, workers=3,
+            stdout=out)
+        self.assertIn('Прогрето адресов: 6 из 6', out.getvalue())
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['oil']) + '?page=2',
+            reverse('posts:profile', args=['Annushka']),
+        ):
+            with self.subTest(url=url), self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_warm_cache_needs_shared_cache(self):
+        """Без общего кэша команде нечего прогревать."""
+        with self.assertRaises(CommandError):
+            call_command('warm_cache', stdout=StringIO())
@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.models import Job
+
+from ..images import generate_image_variants, post_image, variant_name
+from ..media import delete_image
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_jpeg(size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_WIDTHS=(320, 640, 960))
+class ImageVariantsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Frieda')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, size=(1200, 800)):
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile('photo.jpg', make_jpeg(size)),
+        )
+
+    def test_variants_are_generated(self):
+        """Задача готовит варианты всех ширин в JPEG и WebP."""
+        post = self.create_post()
+        self.assertEqual(post.image_variants, '')
+        generate_image_variants(post.pk)
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '320,640,960')
+        for width in (320, 640, 960):
+            for extension in ('jpg', 'webp'):
+                path = os.path.join(
+                    TEMP_MEDIA_ROOT,
+                    variant_name(post.image.name, width, extension))
+                self.assertTrue(os.path.exists(path))
+        with Image.open(path) as variant:
+            self.assertEqual(variant.size, (960, 339))
+        delete_image(post.image.name)
+        self.assertFalse(os.path.exists(path))
+
+    def test_small_image_is_not_upscaled(self):
+        """Ширины больше исходной не создаются."""
+        post = self.create_post(size=(700, 500))
+        generate_image_variants(post.pk)
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '320,640')
+
+    def test_feed_renders_srcset(self):
+        """Лента отдает picture с WebP, srcset, sizes и ленивой загрузкой."""
+        post = self.create_post()
+        generate_image_variants(post.pk)
+        post.refresh_from_db()
+        html = post_image(post)
+        self.assertIn('<source type="image/webp" srcset=', html)
+        self.assertIn(' 320w, ', html)
+        self.assertIn(f'sizes="{settings.POST_IMAGE_SIZES}"', html)
+        self.assertIn('loading="lazy"', html)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, html, html=False)
+        self.assertEqual(post_image(Post(text='Без картинки')), '')
+
+    def test_new_upload_resets_variants(self):
+        """Новая картинка сбрасывает варианты старой."""
+        post = self.create_post()
+        generate_image_variants(post.pk)
+        post.refresh_from_db()
+        post.image = SimpleUploadedFile('new.jpg', make_jpeg((900, 900)))
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '')
+
+    def test_commands(self):
+        """Команды ставят задачи в очередь и замеряют экономию байт."""
+        self.create_post()
+        call_command('build_image_variants', enqueue=True, stdout=StringIO())
+        self.assertEqual(
+            Job.objects.get().name, 'posts.images.generate_image_variants')
+        out = StringIO()
+        call_command('bench_images', stdout=out)
+        self.assertIn('экономия', out.getvalue())
+
+    def test_metadata_is_stored_on_save(self):
+        """Заглушка считается при записи новой картинки."""
+        post = self.create_post(size=(1200, 800))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/png;base64,'))
+        self.assertLess(len(post.image_placeholder), 1000)
+        post.refresh_from_db()
+        self.assertTrue(post.image_placeholder)
+        post.image = None
+        post.save()
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_image_has_size_and_placeholder(self):
+        """Картинка выводится с размерами и заглушкой без чтения файла."""
+        post = self.create_post()
+        generate_image_variants(post.pk)
+        post = Post.objects.for_feed().get(pk=post.pk)
+        with self.assertNumQueries(0):
+            html = post_image(post)
+        self.assertIn('width="960" height="339"', html)
+        self.assertIn(
+            f'style="background: url({post.image_placeholder})', html)
+
+    def test_job_backfills_metadata(self):
+        """Задача заполняет заглушку у постов, сохраненных до нее."""
+        post = self.create_post(size=(800, 600))
+        Post.objects.filter(pk=post.pk).update(image_placeholder='')
+        generate_image_variants(post.pk)
+        post.refresh_from_db()
+        self.assertNotEqual(post.image_placeholder, '')
+        self.assertEqual(post.image_variants, '320,640')
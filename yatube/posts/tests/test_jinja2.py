@@ -0,0 +1,59 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..management.commands.bench_templates import normalize_html
+from ..models import Group, Post, User
+
+
+class Jinja2TemplatesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='Azazello',
+            first_name='Азазелло',
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое\n\nописание',
+        )
+        Post.objects.bulk_create([
+            Post(
+                text=f'Тестовый <b>текст</b> #тест\n{number}',
+                author=cls.user,
+                group=cls.group,
+            )
+            for number in range(12)
+        ])
+        call_command('backfill_tags', stdout=StringIO())
+        call_command('render_posts', stdout=StringIO())
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feeds_render_the_same_html(self):
+        """Ленты в Jinja2 и в шаблонах Django дают одинаковый HTML."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': self.user.username}
+            ),
+            reverse('posts:tag_posts', kwargs={'name': 'тест'}),
+        )
+        for client in (self.client, self.authorized_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    django_html = client.get(url).content.decode()
+                    with override_settings(POSTS_TEMPLATE_ENGINE='jinja2'):
+                        jinja2_html = client.get(url).content.decode()
+                    self.assertEqual(
+                        normalize_html(jinja2_html),
+                        normalize_html(django_html),
+                    )
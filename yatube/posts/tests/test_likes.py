@@ -0,0 +1,129 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..likes import attach_likes, like_counts, like_post, unlike_post
+from ..models import Like, Post, PostLikeCounter, User
+
+
+@override_settings(POST_LIKE_SHARDS=4)
+class LikeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Behemoth')
+        cls.users = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(10)
+        ]
+        cls.post = Post.objects.create(
+            text='Кот с примусом', author=cls.author)
+        cls.post_2 = Post.objects.create(text='Второй пост', author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.users[0])
+
+    def test_like_and_unlike_are_idempotent(self):
+        """Повторный лайк и повторное снятие ничего не меняют."""
+        user = self.users[0]
+        self.assertTrue(like_post(user, self.post.pk))
+        self.assertFalse(like_post(user, self.post.pk))
+        self.assertEqual(like_counts([self.post.pk]), {self.post.pk: 1})
+        self.assertTrue(unlike_post(user, self.post.pk))
+        self.assertFalse(unlike_post(user, self.post.pk))
+        self.assertEqual(like_counts([self.post.pk]), {self.post.pk: 0})
+        self.assertFalse(Like.objects.exists())
+
+    def test_counter_is_sum_of_shards(self):
+        """Лайки расходятся по шардам, а сумма совпадает с числом лайков."""
+        for user in self.users:
+            like_post(user, self.post.pk)
+        for user in self.users[:3]:
+            unlike_post(user, self.post.pk)
+        counters = PostLikeCounter.objects.filter(post=self.post)
+        self.assertLessEqual(counters.count(), 4)
+        self.assertEqual(
+            like_counts([self.post.pk, self.post_2.pk]),
+            {self.post.pk: 7, self.post_2.pk: 0},
+        )
+
+    def test_page_flags_in_one_query_each(self):
+        """Счетчики и отметки для страницы берутся двумя запросами."""
+        like_post(self.users[0], self.post.pk)
+        like_post(self.users[1], self.post_2.pk)
+        with self.assertNumQueries(3):
+            posts = attach_likes(Post.objects.all(), self.users[0])
+        marks = {
+            post.pk: (post.likes_total, post.is_liked) for post in posts
+        }
+        self.assertEqual(marks, {
+            self.post.pk: (1, True),
+            self.post_2.pk: (1, False),
+        })
+        with self.assertNumQueries(2):
+            attach_likes(Post.objects.all(), AnonymousUser())
+
+    def test_counters_follow_user_deletion(self):
+        """Счетчики пересчитываются после удаления лайкнувшего."""
+        reader = User.objects.create_user(username='Azazello')
+        like_post(reader, self.post.pk)
+        like_post(self.users[1], self.post.pk)
+        # В TestCase коммита нет: выполняем отложенное сразу
+        with mock.patch.object(
+                transaction, 'on_commit', lambda func, using=None: func()):
+            reader.delete()
+        call_command('run_workers', processes=0, burst=True, stdout=StringIO())
+        self.assertEqual(like_counts([self.post.pk]), {self.post.pk: 1})
+
+    def test_recount_likes_command(self):
+        """Команда recount_likes приводит счетчики к числу лайков."""
+        for user in self.users[:3]:
+            like_post(user, self.post.pk)
+        PostLikeCounter.objects.update(count=100)
+        call_command('recount_likes', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(
+            like_counts([self.post.pk, self.post_2.pk]),
+            {self.post.pk: 3, self.post_2.pk: 0},
+        )
+        self.assertEqual(PostLikeCounter.objects.count(), 1)
+
+    def test_like_endpoints(self):
+        """Лайк ставится и снимается POST-запросом с возвратом на страницу."""
+        like_url = reverse('posts:post_like', kwargs={'post_id': self.post.pk})
+        unlike_url = reverse(
+            'posts:post_unlike', kwargs={'post_id': self.post.pk})
+        index_url = reverse('posts:index')
+        self.assertEqual(self.authorized_client.get(like_url).status_code, 405)
+        response = self.client.post(like_url)
+        self.assertRedirects(response, f'/auth/login/?next={like_url}')
+        response = self.authorized_client.post(like_url, {'next': index_url})
+        self.assertRedirects(response, index_url)
+        response = self.authorized_client.post(
+            like_url, {'next': 'https://evil.example/'})
+        self.assertRedirects(
+            response,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        response = self.authorized_client.post(
+            unlike_url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json(), {'liked': False, 'likes': 0})
+
+    def test_feed_shows_likes(self):
+        """Лента показывает число лайков и кнопку по отметке пользователя."""
+        like_post(self.users[0], self.post.pk)
+        response = self.authorized_client.get(reverse('posts:index'))
+        # Отметки пользователя дописываются в общую страницу из кэша
+        self.assertContains(
+            response,
+            reverse('posts:post_unlike', kwargs={'post_id': self.post.pk}))
+        self.assertContains(
+            response,
+            reverse('posts:post_like', kwargs={'post_id': self.post_2.pk}))
+        self.assertContains(response, 'Нравится: 1', count=1)
+        anonymous = self.client.get(reverse('posts:index'))
+        self.assertNotContains(anonymous, 'csrfmiddlewaretoken')
@@ -1,4 +1,7 @@
-from django.test import TestCase
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 
 from ..models import Group, Post, User
 
@@ -49,3 +52,59 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
+
+
+@override_settings(POST_EXCERPT_LENGTH=20)
+class RenderedTextTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Hella')
+
+    def test_html_is_rendered_on_save(self):
+        """HTML текста и анонса считаются при сохранении поста."""
+        post = Post.objects.create(
+            author=self.user,
+            text='<b>Первый</b> абзац\n\nВторой абзац длиннее анонса',
+        )
+        self.assertEqual(
+            post.text_html,
+            '<p>&lt;b&gt;Первый&lt;/b&gt; абзац</p>\n\n'
+            '<p>Второй абзац длиннее анонса</p>',
+        )
+        self.assertNotIn('Второй', post.excerpt_html)
+        self.assertTrue(post.excerpt_html.endswith('…</p>'))
+
+    def test_feed_does_not_load_full_text(self):
+        """Ленты не загружают полный текст поста."""
+        Post.objects.create(author=self.user, text='Тест')
+        post = Post.objects.for_feed().get()
+        self.assertEqual(
+            post.get_deferred_fields(), {'text', 'text_html'})
+        self.assertEqual(str(post.rendered_excerpt), '<p>Тест</p>')
+
+    def test_feed_excerpt_without_rendered_html(self):
+        """Анонс поста без готового HTML не стоит ленте запроса."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Старый пост {number} ' * 5)
+            for number in range(3)
+        )
+        with self.assertNumQueries(1):
+            excerpts = [
+                str(post.rendered_excerpt)
+                for post in Post.objects.for_feed()
+            ]
+        self.assertIn('<p>Старый пост 0 Стары…</p>', excerpts)
+
+    def test_render_posts_command(self):
+        """Команда render_posts заполняет HTML старых постов."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Старый пост {number}')
+            for number in range(3)
+        )
+        call_command('render_posts', '--batch-size', '2', stdout=StringIO())
+        self.assertFalse(Post.objects.filter(text_html='').exists())
+        self.assertEqual(
+            Post.objects.filter(excerpt_html='<p>Старый пост 0</p>').count(),
+            1,
+        )
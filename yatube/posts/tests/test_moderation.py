@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..signals import posts_bulk_changed
+
+
+class ModerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='Woland',
+            email='woland@yatube.ru',
+            password='messire',
+        )
+        cls.spammer = User.objects.create_user(username='Spammer')
+        cls.author = User.objects.create_user(username='Master')
+        cls.group = Group.objects.create(
+            title='Спам',
+            slug='spam',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Карантин',
+            slug='quarantine',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+        Post.objects.bulk_create(
+            [
+                Post(text=f'Спам {number}', author=self.spammer,
+                     group=self.group)
+                for number in range(7)
+            ] + [Post(text='Роман', author=self.author)]
+        )
+        self.signals = []
+        posts_bulk_changed.connect(self.receiver)
+        self.addCleanup(posts_bulk_changed.disconnect, self.receiver)
+
+    def receiver(self, sender, author_ids, group_ids, **kwargs):
+        self.signals.append((author_ids, group_ids))
+
+    def run_action(self, action, posts, **data):
+        return self.admin_client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'action': action,
+                '_selected_action': [post.pk for post in posts],
+                **data,
+            },
+            follow=True,
+        )
+
+    def test_move_to_group_action(self):
+        """Действие админки переносит выбранные посты в группу."""
+        posts = Post.objects.filter(author=self.spammer)[:3]
+        self.run_action('move_to_group', posts, group=self.group_2.pk)
+        self.assertEqual(Post.objects.filter(group=self.group_2).count(), 3)
+        self.assertEqual(
+            self.signals,
+            [({self.spammer.pk}, {self.group.pk, self.group_2.pk})],
+        )
+
+    def test_delete_by_author_action(self):
+        """Действие админки удаляет все посты автора выбранного поста."""
+        post = Post.objects.filter(author=self.spammer).first()
+        response = self.run_action('delete_by_author', [post])
+        self.assertContains(response, 'будет удалено постов — 7')
+        self.assertContains(response, '<li>Spammer</li>', html=True)
+        self.assertEqual(Post.objects.filter(author=self.spammer).count(), 7)
+        self.run_action('delete_by_author', [post], post='yes')
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertTrue(Post.objects.filter(author=self.author).exists())
+
+    def test_delete_posts_action_asks_confirmation(self):
+        """Удаление выбранных постов сначала показывает подтверждение."""
+        posts = list(Post.objects.filter(author=self.spammer)[:2])
+        response = self.run_action('delete_posts', posts)
+        self.assertTemplateUsed(
+            response, 'admin/posts/post/bulk_delete_confirmation.html')
+        self.assertContains(response, 'будет удалено постов — 2')
+        self.assertEqual(Post.objects.count(), 8)
+        self.run_action('delete_posts', posts, post='yes')
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(len(self.signals), 1)
+
+    def test_default_delete_action_is_replaced(self):
+        """Стандартного удаления с загрузкой объектов в админке нет."""
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'))
+        self.assertNotContains(response, 'value="delete_selected"')
+        self.assertContains(response, 'value="delete_posts"')
+
+    def test_commands_work_in_batches(self):
+        """Команды модерации обрабатывают посты пачками."""
+        out = StringIO()
+        call_command(
+            'move_posts', '--group', self.group.slug, '--no-group',
+            '--batch-size', '3', stdout=out,
+        )
+        self.assertIn('7 постов', out.getvalue())
+        self.assertIn('пачек: 3', out.getvalue())
+        self.assertFalse(Post.objects.filter(group=self.group).exists())
+        call_command(
+            'delete_posts', '--author', self.spammer.username,
+            '--batch-size', '2', stdout=out,
+        )
+        self.assertEqual(
+            list(Post.objects.values_list('author', flat=True)),
+            [self.author.pk],
+        )
+        self.assertEqual(len(self.signals), 2)
@@ -0,0 +1,242 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connections, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..likes import like_counts, like_post
+from ..models import ArchivedPost, Group, Like, Post, PostTag, Tag, User
+from ..sharding import shard_for_author
+
+SHARDS = ['default', 'posts_1']
+
+
+def users_for_each_shard():
+    """Создает по автору на каждую базу: {база: автор}."""
+    authors = {}
+    number = 0
+    while len(authors) < len(SHARDS):
+        user = User.objects.create_user(username=f'author{number}')
+        authors.setdefault(shard_for_author(user.pk), user)
+        number += 1
+    return authors
+
+
+@override_settings(POST_SHARDS=SHARDS)
+class ShardingTests(TestCase):
+    databases = {'default', 'posts_1'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        authors = users_for_each_shard()
+        cls.local_author = authors['default']
+        cls.remote_author = authors['posts_1']
+        cls.reader = User.objects.create_user(username='Reader')
+        now = timezone.now()
+        for number in range(12):
+            author = (cls.local_author, cls.remote_author)[number % 2]
+            post = Post.objects.create(
+                text=f'Пост {number} #шард', author=author)
+            # Посты баз перемешаны по времени
+            Post.objects.using(post._state.db).filter(pk=post.pk).update(
+                pub_date=now - timedelta(hours=number))
+        cls.remote_post = Post.objects.using('posts_1').first()
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.remote_author)
+
+    def test_posts_are_stored_in_author_database(self):
+        """Посты и их теги лежат в базе автора, id общие для всех баз."""
+        self.assertEqual(Post.objects.using('default').count(), 6)
+        self.assertEqual(Post.objects.using('posts_1').count(), 6)
+        self.assertFalse(Post.objects.using('default').filter(
+            author=self.remote_author).exists())
+        ids = [
+            pk for alias in SHARDS
+            for pk in Post.objects.using(alias).values_list('pk', flat=True)
+        ]
+        self.assertEqual(len(set(ids)), 12)
+        self.assertEqual(
+            PostTag.objects.using('posts_1').filter(
+                post=self.remote_post).count(), 1)
+
+    def test_feeds_merge_databases_by_date(self):
+        """Главная страница сливает базы в одну ленту по дате."""
+        response = self.reader_client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 12)
+        dates = [post.pub_date for post in page_obj]
+        self.assertEqual(len(dates), 10)
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        authors = {post.author for post in page_obj}
+        self.assertEqual(authors, {self.local_author, self.remote_author})
+        response = self.reader_client.get(
+            reverse('posts:index'), {'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_profile_reads_one_database(self):
+        """Профиль автора читает посты только из его базы."""
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.reader_client.get(reverse(
+                'posts:profile', kwargs={'username': self.remote_author}))
+        self.assertEqual(len(response.context['page_obj']), 6)
+        self.assertFalse([
+            query for query in queries if 'posts_post' in query['sql']])
+
+    def test_detail_edit_and_like_find_post(self):
+        """Страница, правка и лайк работают с постом из другой базы."""
+        post_id = self.remote_post.pk
+        response = self.reader_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post_id}))
+        self.assertEqual(response.context['post'], self.remote_post)
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': post_id})
+        response = self.reader_client.get(edit_url)
+        self.assertRedirects(response, reverse(
+            'posts:post_detail', kwargs={'post_id': post_id}))
+        self.author_client.post(edit_url, {'text': 'Новый текст'})
+        self.remote_post.refresh_from_db()
+        self.assertEqual(self.remote_post.text, 'Новый текст')
+        self.reader_client.post(
+            reverse('posts:post_like', kwargs={'post_id': post_id}))
+        self.assertTrue(
+            Like.objects.using('posts_1').filter(post_id=post_id).exists())
+        self.assertEqual(
+            like_counts([post_id], 'posts_1'), {post_id: 1})
+
+
+class RebalanceTests(TestCase):
+    databases = {'default', 'posts_1'}
+
+    def test_rebalance_moves_posts_with_likes(self):
+        """После добавления базы посты ее авторов переезжают с лайками."""
+        with override_settings(POST_SHARDS=SHARDS):
+            authors = users_for_each_shard()
+        reader = User.objects.create_user(username='Reader')
+        posts = [
+            Post.objects.create(
+                text=f'Пост #тег{number}', author=authors[alias])
+            for number, alias in enumerate(SHARDS)
+        ]
+        for post in posts:
+            like_post(reader, post.pk)
+        remote_post = posts[1]
+        with override_settings(POST_SHARDS=SHARDS):
+            call_command('rebalance_shards', stdout=StringIO())
+            self.assertEqual(
+                list(Post.objects.using('default').all()), [posts[0]])
+            moved = Post.objects.using('posts_1').get()
+            self.assertEqual(moved.pk, remote_post.pk)
+            self.assertEqual(
+                like_counts([moved.pk], 'posts_1'), {moved.pk: 1})
+            self.assertEqual(
+                PostTag.objects.using('posts_1').filter(post=moved).count(),
+                1)
+            new_post = Post.objects.create(
+                text='После переноса', author=authors['posts_1'])
+            self.assertGreater(new_post.pk, remote_post.pk)
+            call_command('rebalance_shards', stdout=StringIO())
+            self.assertEqual(Post.objects.using('posts_1').count(), 2)
+
+    def test_enable_sharding_over_existing_posts(self):
+        """Первые id после включения шардинга идут за существующими."""
+        with override_settings(POST_SHARDS=SHARDS):
+            authors = users_for_each_shard()
+        existing = [
+            Post.objects.create(text=f'Пост {number}', author=authors[alias])
+            for number in range(5)
+            for alias in SHARDS
+        ]
+        last_id = max(post.pk for post in existing)
+        with override_settings(POST_SHARDS=SHARDS):
+            new_posts = [
+                Post.objects.create(text='Новый', author=authors[alias])
+                for alias in SHARDS
+            ]
+        self.assertEqual(
+            [post._state.db for post in new_posts], SHARDS)
+        for post in new_posts:
+            self.assertGreater(post.pk, last_id)
+
+
+@override_settings(POST_SHARDS=SHARDS)
+class CrossShardCascadeTests(TestCase):
+    databases = {'default', 'posts_1'}
+
+    def setUp(self):
+        authors = users_for_each_shard()
+        self.local_author = authors['default']
+        self.remote_author = authors['posts_1']
+        self.reader = User.objects.create_user(username='Reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.local_post = Post.objects.create(
+            text='Здесь', author=self.local_author)
+        self.remote_post = Post.objects.create(
+            text='Там #тег', author=self.remote_author, group=self.group)
+        like_post(self.reader, self.remote_post.pk, 'posts_1')
+        like_post(self.local_author, self.remote_post.pk, 'posts_1')
+
+    def delete_now(self, obj):
+        # В TestCase коммита нет: выполняем отложенное сразу
+        with mock.patch.object(
+                transaction, 'on_commit', lambda func, using=None: func()):
+            obj.delete()
+
+    def test_user_delete_cascades_to_other_shards(self):
+        """Удаление пользователя убирает его посты и лайки во всех базах."""
+        self.delete_now(self.remote_author)
+        self.assertFalse(Post.objects.using('posts_1').exists())
+        self.assertFalse(Like.objects.using('posts_1').exists())
+        self.delete_now(self.reader)
+        self.assertTrue(Post.objects.using('default').exists())
+
+    def test_likes_recount_after_liker_delete(self):
+        """Лайки удаленного пользователя уходят и из счетчика."""
+        self.delete_now(self.reader)
+        self.assertEqual(
+            like_counts([self.remote_post.pk], 'posts_1'),
+            {self.remote_post.pk: 1})
+
+    def test_group_and_tag_delete_cascade(self):
+        """Удаление группы и тега доходит до других баз."""
+        self.delete_now(self.group)
+        self.remote_post.refresh_from_db()
+        self.assertIsNone(self.remote_post.group_id)
+        self.delete_now(Tag.objects.get(name='тег'))
+        self.assertFalse(PostTag.objects.using('posts_1').exists())
+
+    def test_cleanup_shards_removes_orphans(self):
+        """cleanup_shards дочищает то, что не удалил каскад."""
+        ArchivedPost.objects.using('posts_1').create(
+            id=10 ** 6, text='Архив', author_id=self.remote_author.pk,
+            pub_date=timezone.now())
+        # Без каскада: как если бы процесс упал до коммита
+        self.remote_author.delete()
+        self.assertTrue(Post.objects.using('posts_1').exists())
+        out = StringIO()
+        call_command('cleanup_shards', '--batch-size', '1', stdout=out)
+        self.assertFalse(Post.objects.using('posts_1').exists())
+        self.assertFalse(ArchivedPost.objects.using('posts_1').exists())
+        self.assertFalse(Like.objects.using('posts_1').exists())
+        self.assertTrue(Post.objects.using('default').exists())
+        self.assertIn('Пользователи: 1', out.getvalue())
+
+
+class DefaultConstraintTests(TestCase):
+    def test_default_database_keeps_foreign_keys(self):
+        """В базе default ссылки постов на пользователей проверяет СУБД."""
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Post.objects.create(text='Сирота', author_id=10 ** 6)
+                connections['default'].check_constraints()
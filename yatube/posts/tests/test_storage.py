@@ -0,0 +1,125 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.models import KVStore
+
+from ..media import scan_image_batches
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Abadonna')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, filename='meme.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            text='Картинка',
+            author=self.user,
+            image=SimpleUploadedFile(filename, content, 'image/gif'),
+        )
+
+    def test_same_upload_is_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом с именем по хешу."""
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        first = self.create_post('meme.GIF')
+        second = self.create_post('copy.gif')
+        self.assertEqual(first.image.name, f'posts/{digest[:2]}/{digest}.gif')
+        self.assertEqual(second.image.name, first.image.name)
+        directory = os.path.join(TEMP_MEDIA_ROOT, 'posts', digest[:2])
+        self.assertEqual(os.listdir(directory), [f'{digest}.gif'])
+        # Миниатюры sorl ищутся по ключу исходника, поэтому общие
+        self.assertEqual(
+            ImageFile(first.image).key, ImageFile(second.image).key)
+
+    def test_duplicate_upload_refreshes_mtime(self):
+        """Повторная загрузка старого файла защищает его от сборки мусора."""
+        orphan = self.create_post()
+        path = orphan.image.path
+        orphan.delete()
+        os.utime(path, (0, 0))
+        self.create_post()
+        call_command('gc_images', stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+
+    def test_gc_rechecks_references_before_delete(self):
+        """Файл, получивший ссылку после проверки пачки, не удаляется."""
+        orphan = self.create_post()
+        orphan.delete()
+        batch = list(scan_image_batches())
+        self.assertEqual(batch[0][0][2], 0)
+        post = self.create_post()
+        with mock.patch(
+                'posts.management.commands.gc_images.scan_image_batches',
+                return_value=batch):
+            call_command('gc_images', min_age=0, stdout=StringIO())
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_gc_keeps_referenced_files(self):
+        """Сборка мусора удаляет только файлы без ссылок из постов."""
+        shared = self.create_post()
+        self.create_post()
+        orphan = self.create_post(content=SMALL_GIF + b'\x00')
+        orphan_path = orphan.image.path
+        orphan.delete()
+        call_command(
+            'gc_images', min_age=0, dry_run=True, stdout=StringIO())
+        self.assertTrue(os.path.exists(orphan_path))
+        call_command('gc_images', stdout=StringIO())
+        self.assertTrue(os.path.exists(orphan_path))
+        call_command('gc_images', min_age=0, stdout=StringIO())
+        self.assertFalse(os.path.exists(orphan_path))
+        self.assertTrue(os.path.exists(shared.image.path))
+
+    def test_cleanup_media_streams_files_and_kvstore(self):
+        """cleanup_media удаляет сирот и записи sorl о пропавших файлах."""
+        kept = self.create_post()
+        orphan = self.create_post(content=SMALL_GIF + b'\x01')
+        orphan_path = orphan.image.path
+        orphan.delete()
+        missing = self.create_post(content=SMALL_GIF + b'\x02')
+        default.kvstore.set(ImageFile(missing.image))
+        default.kvstore.set(ImageFile(kept.image))
+        os.remove(missing.image.path)
+        out = StringIO()
+        call_command(
+            'cleanup_media', min_age=0, batch_size=1, dry_run=True,
+            stdout=out)
+        self.assertTrue(os.path.exists(orphan_path))
+        self.assertEqual(KVStore.objects.count(), 2)
+        self.assertIn('Проверено файлов: 2', out.getvalue())
+        call_command('cleanup_media', min_age=0, batch_size=1, stdout=out)
+        self.assertFalse(os.path.exists(orphan_path))
+        self.assertTrue(os.path.exists(kept.image.path))
+        self.assertEqual(
+            default.kvstore.get(ImageFile(kept.image)).name, kept.image.name)
+        self.assertIsNone(default.kvstore.get(ImageFile(missing.image)))
+        self.assertEqual(KVStore.objects.count(), 1)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post, PostTag, Tag, User
+from ..tags import extract_tags
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Hella')
+
+    def test_extract_tags(self):
+        """Теги нормализуются, повторы и числа отбрасываются."""
+        self.assertEqual(
+            extract_tags('#Бал у #сатаны, #бал! #42 a#b &#39; #x_1'),
+            ['бал', 'сатаны', 'x_1'],
+        )
+
+    def test_tags_follow_post_text(self):
+        """Связи с тегами обновляются вместе с текстом поста."""
+        post = Post.objects.create(text='#бал #луна', author=self.user)
+        self.assertEqual(
+            set(post.post_tags.values_list('tag__name', flat=True)),
+            {'бал', 'луна'},
+        )
+        link = reverse('posts:tag_posts', kwargs={'name': 'бал'})
+        self.assertIn(f'<a href="{link}">#бал</a>', post.text_html)
+        post.text = '#бал #примус'
+        post.save()
+        self.assertEqual(
+            set(post.post_tags.values_list('tag__name', flat=True)),
+            {'бал', 'примус'},
+        )
+        self.assertEqual(
+            post.post_tags.get(tag__name='бал').pub_date, post.pub_date)
+
+    def test_tag_feed(self):
+        """Лента тега показывает только посты с этим тегом."""
+        tagged = Post.objects.create(text='Пост про #Бал', author=self.user)
+        Post.objects.create(text='Пост без тега', author=self.user)
+        response = self.client.get(
+            reverse('posts:tag_posts', kwargs={'name': 'БАЛ'}))
+        self.assertEqual(list(response.context['page_obj']), [tagged])
+        self.assertEqual(response.context['tag'].name, 'бал')
+        missing = self.client.get(
+            reverse('posts:tag_posts', kwargs={'name': 'нет'}))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_trending_prefers_recent_uses(self):
+        """Свежие использования весят больше старых."""
+        Post.objects.create(text='#свежий', author=self.user)
+        Post.objects.bulk_create([
+            Post(text='#старый', author=self.user) for _ in range(3)
+        ])
+        Post.objects.filter(text='#старый').update(
+            pub_date=timezone.now() - timedelta(days=7))
+        call_command('backfill_tags', stdout=StringIO())
+        self.assertEqual(
+            [tag.name for tag in Tag.objects.trending()],
+            ['свежий', 'старый'],
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            list(response.context['trending_tags']),
+            list(Tag.objects.trending()),
+        )
+
+    def test_backfill_is_idempotent(self):
+        """Повторное заполнение не создает связи и не меняет оценки."""
+        Post.objects.bulk_create([
+            Post(text=f'#воланд пост {number}', author=self.user)
+            for number in range(5)
+        ])
+        call_command('backfill_tags', batch_size=2, stdout=StringIO())
+        score = Tag.objects.get(name='воланд').score
+        call_command('backfill_tags', batch_size=2, stdout=StringIO())
+        self.assertEqual(PostTag.objects.count(), 5)
+        self.assertEqual(Tag.objects.get(name='воланд').score, score)
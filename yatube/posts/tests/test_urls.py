@@ -1,5 +1,6 @@
 from http import HTTPStatus
 
+from django.core.cache import cache
 from django.test import Client, TestCase
 
 from ..models import Group, Post, User
@@ -66,6 +67,10 @@ class PostsURLTests(TestCase):
             ),
         }
 
+    def setUp(self):
+        # Страницы лент из кэша не рендерят шаблоны заново
+        cache.clear()
+
     def test_guest_client(self):
         """
         Страницы index, group_list, profile, posts_detail
@@ -1,4 +1,5 @@
 from django import forms
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -28,6 +29,8 @@ class PostPagesTests(TestCase):
         )
 
     def setUp(self):
+        # Страницы лент из кэша не рендерят шаблоны заново
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
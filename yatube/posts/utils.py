@@ -1,10 +1,234 @@
+import datetime
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from yatube.settings import POSTS_PER_PAGE
 
+# Ниже этого порога статистика СУБД неточна, а точный COUNT дешев
+ESTIMATED_COUNT_MIN = 10000
+
+ESTIMATE_QUERIES = {
+    'postgresql': 'SELECT reltuples FROM pg_class WHERE relname = %s',
+    'mysql': (
+        'SELECT table_rows FROM information_schema.tables '
+        'WHERE table_schema = DATABASE() AND table_name = %s'
+    ),
+    'sqlite': 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+}
+
 
 def paginator_util(queryset, request):
     paginator = Paginator(queryset, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def estimate_row_count(model, using='default'):
+    """Примерное число строк таблицы по статистике СУБД или None."""
+    connection = connections[using]
+    sql = ESTIMATE_QUERIES.get(connection.vendor)
+    if sql is None:
+        return None
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(sql, [model._meta.db_table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # В SQLite таблицы sqlite_stat1 нет, пока не выполнен ANALYZE
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(float(str(row[0]).split()[0]))
+    return estimate if estimate >= 0 else None
+
+
+def iter_pk_batches(queryset, batch_size):
+    """Отдает pk строк пачками по возрастанию, без OFFSET."""
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(
+            pk__gt=last_pk)
+        pks = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который для больших таблиц без фильтров не делает COUNT."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_MIN:
+                return estimate
+        return super().count
+
+
+ARCHIVE_GENERATION_KEY = 'posts:archive:generation'
+
+
+def bump_archive_generation():
+    """Сбрасывает закэшированные размеры архива после переноса постов."""
+    try:
+        cache.incr(ARCHIVE_GENERATION_KEY)
+    except ValueError:
+        cache.set(ARCHIVE_GENERATION_KEY, 1, None)
+
+
+class ArchiveChain:
+    """Лента для Paginator: сначала посты из posts_post, затем из архива.
+
+    В архив попадают посты старше порога, поэтому при сортировке по дате
+    все горячие посты идут раньше архивных и ленту можно склеить по
+    смещению. Архив запрашивается только на глубоких страницах, а его
+    размер берется из кэша до следующего переноса.
+    """
+    ordered = True
+
+    def __init__(self, hot, archived, count_key):
+        self.hot = hot
+        self.archived = archived
+        self.count_key = count_key
+
+    @cached_property
+    def hot_count(self):
+        return self.hot.count()
+
+    @cached_property
+    def archived_count(self):
+        generation = cache.get_or_set(ARCHIVE_GENERATION_KEY, 1, None)
+        return cache.get_or_set(
+            f'posts:archive:{generation}:count:{self.count_key}',
+            self.archived.count,
+            settings.POSTS_ARCHIVE_COUNT_TIMEOUT,
+        )
+
+    def count(self):
+        return self.hot_count + self.archived_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        items = []
+        if start < self.hot_count:
+            items.extend(self.hot[start:min(stop, self.hot_count)])
+        if stop > self.hot_count:
+            items.extend(self.archived[
+                max(start - self.hot_count, 0):stop - self.hot_count])
+        return items
+
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def feed_key(post):
+    """Позиция поста в ленте: новые первыми, при равной дате — больший id."""
+    return post.pub_date, post.pk
+
+
+class ShardedFeed:
+    """Лента для Paginator из нескольких баз постов.
+
+    Каждый поток (QuerySet или ArchiveChain одной базы) упорядочен по
+    убыванию key; страница собирается слиянием k потоков через
+    heapq.merge. Для страницы, кончающейся на позиции stop, каждая база
+    отдает не больше stop первых записей: глубже их в общей ленте нет.
+    """
+    ordered = True
+
+    def __init__(self, streams, key=feed_key):
+        self.streams = list(streams)
+        self.key = key
+
+    @cached_property
+    def counts(self):
+        return [stream.count() for stream in self.streams]
+
+    def count(self):
+        return sum(self.counts)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if len(self.streams) == 1:
+            return list(self.streams[0][start:stop])
+        heads = [
+            list(stream[:stop])
+            for stream, count in zip(self.streams, self.counts) if count
+        ]
+        merged = heapq.merge(*heads, key=self.key, reverse=True)
+        return list(islice(merged, start, stop))
+
+
+def encode_cursor(post):
+    """Курсор после поста: микросекунды pub_date и id через «_»."""
+    delta = post.pub_date - EPOCH
+    microseconds = (
+        (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds)
+    return f'{microseconds}_{post.pk}'
+
+
+def decode_cursor(value):
+    """(pub_date, id) из курсора; ValueError для испорченного курсора."""
+    microseconds, _, pk = value.partition('_')
+    return (
+        EPOCH + datetime.timedelta(microseconds=int(microseconds)),
+        int(pk),
+    )
+
+
+def after_cursor(queryset, cursor):
+    """Записи строго после курсора, от новых к старым.
+
+    Условие по (pub_date, id) идет по индексу даты без OFFSET, поэтому
+    глубина прокрутки не влияет на стоимость запроса.
+    """
+    queryset = queryset.order_by('-pub_date', '-pk')
+    if cursor is None:
+        return queryset
+    pub_date, pk = cursor
+    return queryset.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+
+
+def cursor_page(chains, cursor, size):
+    """Следующие size постов после курсора и признак продолжения.
+
+    chains — пары (горячие посты, архив) каждой базы. Архив базы
+    читается, только если горячих постов после курсора не хватило.
+    """
+    heads = []
+    for hot, archived in chains:
+        items = list(after_cursor(hot, cursor)[:size + 1])
+        if len(items) <= size:
+            items.extend(
+                after_cursor(archived, cursor)[:size + 1 - len(items)])
+        heads.append(items)
+    merged = list(islice(
+        heapq.merge(*heads, key=feed_key, reverse=True), size + 1))
+    return merged[:size], len(merged) > size
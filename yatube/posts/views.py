@@ -1,54 +1,239 @@
+from operator import attrgetter
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.http import is_safe_url
+from django.views.decorators.http import require_POST
 
+from .counters import view_counter
+from .existence import group_slugs, post_ids, usernames
+from .feed_cache import cache_feed_page
 from .forms import PostForm
-from .models import Group, Post
-from .utils import paginator_util
+from .likes import attach_likes, like_counts, like_post, unlike_post
+from .models import ArchivedPost, Group, Post, Tag
+from .sharding import first_in_shards, post_shards, shard_for_author
+from .utils import (
+    ArchiveChain, ShardedFeed, cursor_page, decode_cursor, encode_cursor,
+    paginator_util,
+)
 
 User = get_user_model()
 
 
+def _feed_chains(aliases, **lookup):
+    """Горячие и архивные посты ленты в каждой из баз aliases."""
+    return [
+        (
+            alias,
+            Post.objects.using(alias).filter(**lookup).for_feed(),
+            ArchivedPost.objects.using(alias).filter(**lookup).for_feed(),
+        )
+        for alias in aliases
+    ]
+
+
+def _sharded_feed(name, **lookup):
+    """Лента по всем базам постов: горячие посты и архив каждой базы."""
+    return ShardedFeed(
+        ArchiveChain(hot, archived, f'{alias}:{name}')
+        for alias, hot, archived in _feed_chains(post_shards(), **lookup)
+    )
+
+
+def _feed_context(page_obj, fragment_url):
+    """Адрес и курсор для подгрузки постов после текущей страницы."""
+    if not page_obj.has_next():
+        return {}
+    return {
+        'fragment_url': fragment_url,
+        'next_cursor': encode_cursor(page_obj.object_list[-1]),
+    }
+
+
+def _feed_fragment(request, chains, like_next, **flags):
+    """Карточки постов после курсора ?after= для бесконечной ленты.
+
+    Курсор следующей порции отдается в заголовке X-Next-Cursor; его нет,
+    когда лента кончилась.
+    """
+    cursor = request.GET.get('after')
+    try:
+        cursor = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return HttpResponseBadRequest()
+    posts, has_more = cursor_page(
+        [(hot, archived) for _, hot, archived in chains],
+        cursor, settings.POSTS_PER_PAGE,
+    )
+    context = {
+        'posts': attach_likes(posts, request.user),
+        'like_next': like_next,
+        **flags,
+    }
+    response = render(
+        request, 'posts/feed_fragment.html', context,
+        using=settings.POSTS_TEMPLATE_ENGINE)
+    if has_more:
+        response['X-Next-Cursor'] = encode_cursor(posts[-1])
+    return response
+
+
+def _get_post_or_404(queryset, post_id):
+    post = first_in_shards(queryset, pk=post_id)
+    if post is None:
+        raise Http404
+    return post
+
+
+def _find_post(post_id):
+    """Пост или архивный пост с этим id из любой базы."""
+    post = first_in_shards(Post.objects.all(), pk=post_id)
+    if post is None:
+        post = _get_post_or_404(ArchivedPost.objects.all(), post_id)
+    return post
+
+
+@cache_feed_page
 def index(request):
     """Шаблон главной страницы"""
     template = 'posts/index.html'
-    page_obj = paginator_util(Post.objects.all(), request)
+    page_obj = paginator_util(_sharded_feed('index'), request)
+    page_obj.object_list = attach_likes(page_obj.object_list, request.user)
     context = {
         'page_obj': page_obj,
+        'trending_tags': Tag.objects.trending(),
+        **_feed_context(page_obj, reverse('posts:index_feed')),
     }
-    return render(request, template, context)
+    return render(
+        request, template, context, using=settings.POSTS_TEMPLATE_ENGINE)
+
+
+def index_feed(request):
+    """Следующие посты главной страницы"""
+    return _feed_fragment(
+        request, _feed_chains(post_shards()), reverse('posts:index'),
+        show_author=True, show_group=True,
+    )
 
 
+@cache_feed_page
 def group_posts(request, slug):
     """Шаблон страницы группы"""
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    page_obj = paginator_util(group.posts.all(), request)
+    group = group_slugs.get_or_404(
+        slug, get_object_or_404, Group, slug=slug)
+    page_obj = paginator_util(
+        _sharded_feed(f'group:{group.pk}', group=group), request)
+    page_obj.object_list = attach_likes(page_obj.object_list, request.user)
     context = {
         'page_obj': page_obj,
         'group': group,
+        **_feed_context(
+            page_obj, reverse('posts:group_feed', args=[group.slug])),
     }
-    return render(request, template, context)
+    return render(
+        request, template, context, using=settings.POSTS_TEMPLATE_ENGINE)
+
+
+def group_feed(request, slug):
+    """Следующие посты группы"""
+    group = group_slugs.get_or_404(
+        slug, get_object_or_404, Group, slug=slug)
+    return _feed_fragment(
+        request, _feed_chains(post_shards(), group=group),
+        reverse('posts:group_list', args=[group.slug]),
+        show_author=True, show_group=False,
+    )
 
 
+@cache_feed_page
 def profile(request, username):
     """Шаблон страницы пользователя"""
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    page_obj = paginator_util(author.posts.all(), request)
+    author = usernames.get_or_404(
+        username, get_object_or_404, User, username=username)
+    [(alias, hot, archived)] = _feed_chains(
+        [shard_for_author(author.pk)], author=author)
+    page_obj = paginator_util(
+        ArchiveChain(hot, archived, f'{alias}:author:{author.pk}'), request)
+    page_obj.object_list = attach_likes(page_obj.object_list, request.user)
     context = {
         'author': author,
         'page_obj': page_obj,
+        **_feed_context(
+            page_obj, reverse('posts:profile_feed', args=[author.username])),
     }
-    return render(request, template, context)
+    return render(
+        request, template, context, using=settings.POSTS_TEMPLATE_ENGINE)
+
+
+def profile_feed(request, username):
+    """Следующие посты пользователя"""
+    author = usernames.get_or_404(
+        username, get_object_or_404, User, username=username)
+    return _feed_fragment(
+        request,
+        _feed_chains([shard_for_author(author.pk)], author=author),
+        reverse('posts:profile', args=[author.username]),
+        show_author=False, show_group=True,
+    )
+
+
+def tag_posts(request, name):
+    """Шаблон страницы хештега"""
+    template = 'posts/tag_list.html'
+    tag = get_object_or_404(Tag, name=name.casefold())
+    page_obj = paginator_util(ShardedFeed(
+        Post.objects.using(alias).for_feed().filter(
+            post_tags__tag=tag).order_by('-post_tags__pub_date')
+        for alias in post_shards()
+    ), request)
+    page_obj.object_list = attach_likes(page_obj.object_list, request.user)
+    context = {
+        'page_obj': page_obj,
+        'tag': tag,
+        'trending_tags': Tag.objects.trending(),
+    }
+    return render(
+        request, template, context, using=settings.POSTS_TEMPLATE_ENGINE)
+
+
+def popular(request):
+    """Шаблон страницы самых просматриваемых постов"""
+    template = 'posts/popular.html'
+    page_obj = paginator_util(ShardedFeed(
+        (
+            Post.objects.using(alias).for_feed().filter(
+                views__gt=0).order_by('-views', '-pk')
+            for alias in post_shards()
+        ),
+        key=attrgetter('views', 'pk'),
+    ), request)
+    page_obj.object_list = attach_likes(page_obj.object_list, request.user)
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(
+        request, template, context, using=settings.POSTS_TEMPLATE_ENGINE)
 
 
 def post_detail(request, post_id):
     """Шаблон страницы поста"""
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = post_ids.get_or_404(post_id, _find_post, post_id)
+    if post.is_archived:
+        views = post.views
+    else:
+        view_counter.incr(post.pk)
+        views = post.views + view_counter.pending(post.pk)
+    attach_likes([post], request.user)
     context = {
         'post': post,
+        'views': views,
     }
     return render(request, template, context)
 
@@ -75,7 +260,13 @@ def post_create(request):
 def post_edit(request, post_id):
     """Шаблон страницы редактирования записи"""
     template = 'posts/create_post.html'
-    post = get_object_or_404(Post, pk=post_id)
+    # Свой пост лежит в базе автора, искать по остальным нужно для чужих
+    post = Post.objects.using(
+        shard_for_author(request.user.pk)).filter(pk=post_id).first()
+    if post is None:
+        post = post_ids.get_or_404(
+            post_id, _get_post_or_404, Post.objects.only('pk'), post_id)
+        return redirect('posts:post_detail', post.pk)
     if request.user != post.author:
         return redirect('posts:post_detail', post.pk)
     form = PostForm(
@@ -87,3 +278,40 @@ def post_edit(request, post_id):
         return redirect('posts:post_detail', post_id)
     context = {'form': form, 'is_edit': True, 'post': post}
     return render(request, template, context)
+
+
+def _like_response(request, post, liked):
+    """Ответ на лайк: JSON для скрипта, иначе возврат на страницу."""
+    if request.is_ajax():
+        return JsonResponse({
+            'liked': liked,
+            'likes': like_counts([post.pk], post._state.db)[post.pk],
+        })
+    next_url = request.POST.get('next')
+    if next_url and is_safe_url(
+        next_url,
+        allowed_hosts={request.get_host()},
+        require_https=request.is_secure(),
+    ):
+        return redirect(next_url)
+    return redirect('posts:post_detail', post.pk)
+
+
+@require_POST
+@login_required
+def post_like(request, post_id):
+    """Ставит лайк посту"""
+    post = post_ids.get_or_404(
+        post_id, _get_post_or_404, Post.objects.only('pk'), post_id)
+    like_post(request.user, post.pk, post._state.db)
+    return _like_response(request, post, True)
+
+
+@require_POST
+@login_required
+def post_unlike(request, post_id):
+    """Снимает лайк с поста"""
+    post = post_ids.get_or_404(
+        post_id, _get_post_or_404, Post.objects.only('pk'), post_id)
+    unlike_post(request.user, post.pk, post._state.db)
+    return _like_response(request, post, False)
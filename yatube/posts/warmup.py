@@ -0,0 +1,117 @@
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.base import BaseHandler
+from django.db import connections
+from django.db.models import Count, Sum
+from django.test import RequestFactory
+from django.urls import reverse
+
+from .models import Group, Post
+from .sharding import post_shards
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def _top(field, aggregate, limit):
+    """Самые частые значения field по всем базам постов."""
+    totals = Counter()
+    for alias in post_shards():
+        rows = (
+            Post.objects.using(alias)
+            .exclude(**{field: None})
+            .values(field)
+            .annotate(total=aggregate)
+            .order_by('-total')[:limit]
+        )
+        for row in rows:
+            totals[row[field]] += row['total'] or 0
+    return [value for value, _ in totals.most_common(limit)]
+
+
+def hot_feed_urls(pages, groups, profiles):
+    """Первые страницы главной, самых больших групп и читаемых авторов."""
+    feeds = [reverse('posts:index')]
+    group_ids = _top('group', Count('pk'), groups)
+    slugs = dict(
+        Group.objects.filter(pk__in=group_ids).values_list('pk', 'slug'))
+    feeds.extend(
+        reverse('posts:group_list', args=[slugs[pk]])
+        for pk in group_ids if pk in slugs
+    )
+    author_ids = _top('author', Sum('views'), profiles)
+    names = dict(
+        User.objects.filter(pk__in=author_ids).values_list('pk', 'username'))
+    feeds.extend(
+        reverse('posts:profile', args=[names[pk]])
+        for pk in author_ids if pk in names
+    )
+    return [
+        feed if page == 1 else f'{feed}?page={page}'
+        for feed in feeds
+        for page in range(1, pages + 1)
+    ]
+
+
+def _host():
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def warm_urls(urls, workers):
+    """Запрашивает адреса гостем через все middleware в пуле потоков.
+
+    Возвращает {адрес: код ответа}. Страницы лент при этом попадают в
+    кэш, а одинаковые адреса рендерятся один раз (single_flight).
+    """
+    handler = BaseHandler()
+    handler.load_middleware()
+    factory = RequestFactory(HTTP_HOST=_host(), REMOTE_ADDR='127.0.0.1')
+
+    def fetch(url):
+        try:
+            response = handler.get_response(factory.get(url))
+            response.close()
+            return url, response.status_code
+        finally:
+            # Соединения потока пула сами не закроются
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(fetch, urls))
+
+
+def warm_feeds(pages=None, groups=None, profiles=None, workers=None):
+    """Прогревает кэш горячих лент; параметры по умолчанию из WARM_CACHE_*."""
+    urls = hot_feed_urls(
+        settings.WARM_CACHE_PAGES if pages is None else pages,
+        settings.WARM_CACHE_GROUPS if groups is None else groups,
+        settings.WARM_CACHE_PROFILES if profiles is None else profiles,
+    )
+    return warm_urls(
+        urls, settings.WARM_CACHE_WORKERS if workers is None else workers)
+
+
+def warm_in_background():
+    """Прогрев при старте воркера, не задерживая первые запросы.
+
+    С общим кэшем страницы достаются всем воркерам, с кэшем в памяти
+    процесса — только этому.
+    """
+    def run():
+        try:
+            warm_feeds()
+        except Exception:
+            logger.exception('Прогрев кэша лент не удался')
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name='warm-cache', daemon=True).start()
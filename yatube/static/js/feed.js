@@ -0,0 +1,67 @@
+// Бесконечная лента: когда конец ленты близко, дописывает следующие
+// посты из фрагмента. Без JS или при ошибке работает обычная пагинация.
+(function () {
+  'use strict';
+
+  var feed = document.querySelector('.post-feed[data-next-cursor]');
+  if (!feed || !window.fetch || !('IntersectionObserver' in window)) {
+    return;
+  }
+  var pagination = document.querySelector('nav[aria-label="Page navigation"]');
+  var sentinel = document.createElement('div');
+  var loading = false;
+  var observer;
+
+  function finish() {
+    observer.disconnect();
+    sentinel.remove();
+  }
+
+  function load() {
+    var cursor = feed.dataset.nextCursor;
+    if (loading || !cursor) {
+      return;
+    }
+    loading = true;
+    var url = feed.dataset.fragmentUrl + '?after=' + encodeURIComponent(cursor);
+    fetch(url, {
+      credentials: 'same-origin',
+      headers: {'X-Requested-With': 'XMLHttpRequest'}
+    }).then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      var next = response.headers.get('X-Next-Cursor');
+      return response.text().then(function (html) {
+        feed.insertAdjacentHTML('beforeend', html);
+        loading = false;
+        if (!next) {
+          delete feed.dataset.nextCursor;
+          finish();
+          return;
+        }
+        feed.dataset.nextCursor = next;
+        // Если конец ленты все еще виден, observe сразу вызовет load
+        observer.unobserve(sentinel);
+        observer.observe(sentinel);
+      });
+    }).catch(function () {
+      loading = false;
+      finish();
+      if (pagination) {
+        pagination.hidden = false;
+      }
+    });
+  }
+
+  observer = new IntersectionObserver(function (entries) {
+    if (entries[0].isIntersecting) {
+      load();
+    }
+  }, {rootMargin: '600px 0px'});
+  feed.parentNode.insertBefore(sentinel, feed.nextSibling);
+  if (pagination) {
+    pagination.hidden = true;
+  }
+  observer.observe(sentinel);
+})();
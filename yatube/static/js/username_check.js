@@ -0,0 +1,42 @@
+// Подсказка о занятом логине при регистрации, до отправки формы.
+(function () {
+  'use strict';
+
+  var form = document.querySelector('form[data-username-check]');
+  var input = form && form.querySelector('input[name="username"]');
+  if (!input || !window.fetch) {
+    return;
+  }
+  var hint = document.createElement('small');
+  hint.className = 'form-text';
+  input.parentNode.appendChild(hint);
+  var timer;
+  var checked = '';
+
+  function check() {
+    var username = input.value.trim();
+    if (!username || username === checked) {
+      return;
+    }
+    checked = username;
+    var url = form.dataset.usernameCheck + '?username=' +
+      encodeURIComponent(username);
+    fetch(url, {credentials: 'same-origin'}).then(function (response) {
+      return response.ok ? response.json() : null;
+    }).then(function (data) {
+      if (!data || input.value.trim() !== username) {
+        return;
+      }
+      hint.textContent = data.available ? 'Логин свободен' : 'Логин занят';
+      hint.classList.toggle('text-success', data.available);
+      hint.classList.toggle('text-danger', !data.available);
+    }).catch(function () {
+      checked = '';
+    });
+  }
+
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(check, 300);
+  });
+})();
@@ -7,6 +7,11 @@ app_name = 'users'
 
 urlpatterns = [
     path('signup/', views.SignUp.as_view(), name='signup'),
+    path(
+        'signup/check/',
+        views.username_check,
+        name='username_check'
+    ),
     path(
         'logout/',
         LogoutView.as_view(template_name='users/logged_out.html'),
@@ -1,10 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 
+from posts.existence import usernames
+
 from .forms import CreationForm
 
+User = get_user_model()
+
 
 class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:main_page')
     template_name = 'users/signup.html'
+
+
+def username_check(request):
+    """Свободен ли логин: подсказка форме регистрации до отправки.
+
+    Логин, которого нет в фильтре существования, свободен без запроса
+    к базе. Окончательно уникальность проверяет сама форма.
+    """
+    username = User.normalize_username(request.GET.get('username', ''))
+    if not username:
+        return JsonResponse({'available': False})
+    taken = False
+    if usernames.might_exist(username):
+        taken = User.objects.filter(username=username).exists()
+        if not taken:
+            usernames.missing(username)
+    return JsonResponse({'available': not taken})
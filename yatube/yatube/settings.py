@@ -10,11 +10,20 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import hashlib
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Рабочие файлы этой копии проекта во временном каталоге системы: у
+# каждой копии на машине свой каталог, и они не мешают друг другу
+INSTANCE_DIR = os.path.join(
+    tempfile.gettempdir(),
+    'yatube-' + hashlib.blake2b(BASE_DIR.encode(), digest_size=4).hexdigest(),
+)
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -51,10 +60,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.metrics.MetricsMiddleware',
+    'core.middleware.throttling.ThrottlingMiddleware',
+    'core.middleware.slow_queries.SlowQueryMiddleware',
+    'core.middleware.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,8 +90,23 @@ TEMPLATES = [
             ],
         },
     },
+    {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [os.path.join(BASE_DIR, 'jinja2')],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'core.jinja2.environment',
+            'context_processors': [
+                'django.contrib.auth.context_processors.auth',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
 ]
 
+# Движок для шаблонов лент постов: 'django' или 'jinja2'
+POSTS_TEMPLATE_ENGINE = 'django'
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -88,7 +117,36 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Вторая база для постов: используется, только если указана в
+    # POST_SHARDS. В базах, кроме default, есть лишь таблицы постов
+    'posts_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db-posts-1.sqlite3'),
+    },
+}
+
+DATABASE_ROUTERS = ['posts.sharding.PostShardRouter']
+
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Кэш, общий для всех воркеров: на нем держатся сброс кэша лент,
+# фильтры существования, лимиты запросов и прогрев. По умолчанию это
+# файлы в INSTANCE_DIR; если воркеры работают на нескольких серверах,
+# укажите Redis или memcached в YATUBE_CACHE_BACKEND и
+# YATUBE_CACHE_LOCATION. Кэш default передает вызовы кэшу shared и
+# считает попадания для /metrics. Тесты получают свой кэш (core.testing).
+CACHES = {
+    'default': {
+        'BACKEND': 'core.metrics.InstrumentedCache',
+        'LOCATION': 'shared',
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'YATUBE_CACHE_BACKEND', 'core.cache.FileCache'),
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', os.path.join(INSTANCE_DIR, 'cache')),
+    },
 }
 
 
@@ -136,12 +194,177 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма складываются в очередь и уходят командой send_outbox через
+# OUTBOX_DELIVERY_BACKEND. Для SMTP укажите
+# 'django.core.mail.backends.smtp.EmailBackend' и EMAIL_HOST/EMAIL_PORT;
+# локально подойдет python -m smtpd -n -c DebuggingServer localhost:1025
+EMAIL_BACKEND = 'core.mail.OutboxBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 6
+# Пауза перед повтором удваивается с каждой попыткой, сек
+OUTBOX_RETRY_DELAY = 60
+OUTBOX_RETRY_MAX_DELAY = 60 * 60
+# Сколько письмо считается взятым обработчиком, сек
+OUTBOX_LEASE = 5 * 60
+
+# Фоновые задачи (core.jobs) выполняет команда run_workers
+JOBS_MAX_ATTEMPTS = 3
+# Пауза перед повтором удваивается с каждой попыткой, сек
+JOBS_RETRY_DELAY = 30
+# Через сколько секунд задача зависшего обработчика возвращается в очередь;
+# работающий обработчик продлевает аренду каждую треть этого срока
+JOBS_LEASE = 10 * 60
+# Пауза обработчика при пустой очереди, сек
+JOBS_POLL_INTERVAL = 1
 
 POSTS_PER_PAGE = 10
 
+# Длина анонса поста в лентах, символов
+POST_EXCERPT_LENGTH = 500
+
+# На сколько строк делится счетчик лайков поста, чтобы лайки популярного
+# поста не ждали друг друга на блокировке одной строки
+POST_LIKE_SHARDS = 8
+
+# За сколько секунд вдвое устаревает использование хештега в трендах
+TAGS_TRENDING_HALF_LIFE = 24 * 60 * 60
+TRENDING_TAGS_COUNT = 10
+
+# Ширины вариантов картинок постов (JPEG и WebP), пропорции кадра и
+# атрибут sizes: в ленте картинка занимает всю ширину колонки до 960px
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_RATIO = (960, 339)
+POST_IMAGE_SIZES = '(max-width: 992px) 100vw, 960px'
+
+# Посты старше этого числа дней команда archive_posts переносит в архив
+POSTS_ARCHIVE_AFTER_DAYS = 180
+# Сколько кэшировать число архивных постов в лентах, сек
+POSTS_ARCHIVE_COUNT_TIMEOUT = 24 * 60 * 60
+
+# Фильтры существования логинов, групп и постов: доля ложных «есть»,
+# как часто пересобирать фильтр из базы, сек, и сколько помнить промах, сек
+EXISTENCE_FILTER_ERROR_RATE = 0.01
+EXISTENCE_FILTER_MAX_AGE = 60 * 60
+EXISTENCE_NEGATIVE_TIMEOUT = 60
+
+# Кэш страниц лент для гостей: сколько хранить страницу, сек (посты и
+# группы сбрасывают кэш сразу, лайки и просмотры обновятся по времени),
+# сколько ждать чужого рендера той же страницы и как часто проверять, сек
+FEED_CACHE_TIMEOUT = 60
+FEED_CACHE_LOCK_TIMEOUT = 10
+FEED_CACHE_POLL_INTERVAL = 0.05
+# Прогрев кэша лент (команда warm_cache и старт воркера): первые страницы
+# главной, самых больших групп и самых читаемых авторов, число потоков
+WARM_CACHE_ON_STARTUP = False
+WARM_CACHE_PAGES = 3
+WARM_CACHE_GROUPS = 10
+WARM_CACHE_PROFILES = 10
+WARM_CACHE_WORKERS = 4
+
+# Как часто просмотры постов из памяти процесса записываются в базу, сек
+POST_VIEWS_FLUSH_INTERVAL = 10
+
+# Базы, по которым посты раскладываются по авторам. Чтобы включить
+# шардинг, добавьте сюда, например, 'posts_1' и выполните rebalance_shards
+POST_SHARDS = ['default']
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Каталог журналов и профилей вне исходников; на сервере укажите
+# постоянный каталог в переменной окружения YATUBE_LOG_DIR
+LOG_DIR = os.environ.get(
+    'YATUBE_LOG_DIR', os.path.join(tempfile.gettempdir(), 'yatube'))
+os.makedirs(LOG_DIR, exist_ok=True)
+
+# Журнал медленных SQL-запросов: порог в секундах (None — выключен), доля
+# сохраняемых запросов, размер буфера в памяти и глубина стека в записи
+SLOW_QUERY_THRESHOLD = 0.5
+SLOW_QUERY_SAMPLE_RATE = 1.0
+SLOW_QUERY_BUFFER_SIZE = 200
+SLOW_QUERY_STACK_DEPTH = 6
+
+# Профили запросов сотрудников (?profile=1 или заголовок X-Profile: 1),
+# сколько последних профилей хранить и сколько функций показывать в
+# сводке на странице
+PROFILING_DIR = os.path.join(LOG_DIR, 'profiles')
+PROFILING_KEEP = 100
+PROFILING_TOP = 25
+
+# Метрики воркеров для Prometheus (/metrics): общий каталог файлов
+# воркеров, как часто воркер обновляет свой файл и через сколько секунд
+# файл считается брошенным
+METRICS_DIR = os.environ.get(
+    'YATUBE_METRICS_DIR', os.path.join(INSTANCE_DIR, 'metrics'))
+METRICS_WRITE_INTERVAL = 5
+METRICS_STALE_AFTER = 5 * 60
+# Токен для /metrics (заголовок Authorization: Bearer <токен>); без
+# токена метрики отдаются только из сетей METRICS_ALLOWED_NETWORKS
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+METRICS_ALLOWED_NETWORKS = [
+    '127.0.0.0/8',
+    '::1/128',
+    '10.0.0.0/8',
+    '172.16.0.0/12',
+    '192.168.0.0/16',
+]
+
+# Сети обратных прокси перед приложением, например ['127.0.0.1/32']:
+# для запросов от них адрес клиента берется из X-Forwarded-For
+TRUSTED_PROXIES = []
+
+# Ограничение дорогих запросов. POST на эти адреса получает класс:
+THROTTLE_VIEW_CLASSES = {
+    'users:login': 'auth',
+    'users:signup': 'auth',
+    'posts:post_create': 'write',
+    'posts:post_edit': 'write',
+}
+# страницы лент глубже этой — класс deep_page
+THROTTLE_DEEP_PAGE = 5
+# Для класса: rate — запросов в секунду с одного адреса, burst — сколько
+# можно подряд, concurrency — одновременных запросов в одном воркере
+THROTTLE_LIMITS = {
+    'auth': {'rate': 10 / 60, 'burst': 10, 'concurrency': 4},
+    'write': {'rate': 0.5, 'burst': 20, 'concurrency': 8},
+    'deep_page': {'rate': 1, 'burst': 30, 'concurrency': 4},
+}
+# Retry-After для запросов, отброшенных по concurrency, сек
+THROTTLE_SHED_RETRY_AFTER = 1
+
+# KV-хранилище sorl с подсчетом попаданий для /metrics
+THUMBNAIL_KVSTORE = 'core.metrics.InstrumentedKVStore'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(LOG_DIR, 'slow_queries.log'),
+            'maxBytes': 5 * 1024 * 1024,
+            'backupCount': 3,
+            'encoding': 'utf-8',
+            # Файл создается при первой записи
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core.middleware.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Сжатие ответов: минимальный размер тела, уровни сжатия и объем кэша
+# уже сжатых тел в каждом процессе. Brotli включается, если установлен
+# пакет Brotli
+COMPRESSION_MIN_LENGTH = 200
+COMPRESSION_BROTLI_LEVEL = 5
+COMPRESSION_CACHE_BYTES = 4 * 1024 * 1024
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
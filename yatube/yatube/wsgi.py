@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 """
 
+import atexit
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +15,19 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from posts.counters import view_counter  # noqa: E402
+from posts.existence import refresh_in_background  # noqa: E402
+from posts.warmup import warm_in_background  # noqa: E402
+
+# Просмотры, накопленные в памяти воркера, записываются при его остановке
+atexit.register(view_counter.flush)
+
+# Фильтры существования собираются в фоне, а не в первых запросах
+refresh_in_background()
+
+# Кэш лент воркер прогревает в фоне, пока принимает запросы
+if settings.WARM_CACHE_ON_STARTUP:
+    warm_in_background()